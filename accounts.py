@@ -0,0 +1,123 @@
+import os
+import re
+import threading
+import contextlib
+from collections import OrderedDict
+from flashcard_deck import FlashcardDeck
+from storage import SQLiteStore
+
+_NAME = re.compile(r"[A-Za-z0-9_-][A-Za-z0-9_.-]*")
+
+
+class _Entry:
+    __slots__ = ("deck", "lock", "users")
+
+    def __init__(self):
+        self.deck = None
+        self.lock = threading.Lock()
+        self.users = 0
+
+
+# Decks for many users, each saved as <directory>/<user>/<deck>.db.
+# A deck is opened the first time it is used and stays open until more than
+# max_open decks are, when the least recently used idle one is closed again.
+# Each deck has its own lock, so different users (or different decks of one
+# user) are served in parallel while a single deck sees one caller at a time:
+#
+#     with registry.deck("alice", "chemistry") as deck:
+#         deck.add_flashcard("H2O?", "Water")
+class DeckRegistry:
+
+    def __init__(self, directory, max_open=64, max_size=FlashcardDeck.MAX_DECK_SIZE):
+        self.directory = directory
+        self.max_open = max_open
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @contextlib.contextmanager
+    def deck(self, user, name="default"):
+        key = (self._check_name(user), self._check_name(name))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry()
+            entry.users += 1
+            self._entries.move_to_end(key)
+        try:
+            with entry.lock:
+                if entry.deck is None:
+                    entry.deck = self._load(*key)
+                yield entry.deck
+        finally:
+            with self._lock:
+                entry.users -= 1
+                self._evict()
+
+    def users(self):
+        return sorted(user for user in os.listdir(self.directory)
+                      if os.path.isdir(os.path.join(self.directory, user)))
+
+    def decks(self, user):
+        folder = os.path.join(self.directory, self._check_name(user))
+        if not os.path.isdir(folder):
+            return []
+        return sorted(name[:-3] for name in os.listdir(folder) if name.endswith(".db"))
+
+    # number of decks currently open
+    def open_count(self):
+        with self._lock:
+            return sum(entry.deck is not None for entry in self._entries.values())
+
+    def remove_deck(self, user, name="default"):
+        key = (self._check_name(user), self._check_name(name))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.users:
+                raise RuntimeError(f"Deck '{name}' of '{user}' is in use")
+            if entry is not None:
+                self._close(key)
+        path = self._path(*key)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def close(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._close(key)
+
+    # Helper functions
+
+    @staticmethod
+    def _check_name(name):
+        if not _NAME.fullmatch(name):
+            raise ValueError(f"Invalid name '{name}'")
+        return name
+
+    def _path(self, user, name):
+        return os.path.join(self.directory, user, f"{name}.db")
+
+    def _load(self, user, name):
+        os.makedirs(os.path.join(self.directory, user), exist_ok=True)
+        storage = SQLiteStore(self._path(user, name), shared=True)
+        return FlashcardDeck(max_size=self.max_size, storage=storage)
+
+    def _close(self, key):
+        entry = self._entries.pop(key)
+        if entry.deck is not None:
+            entry.deck.close()
+
+    # closes least recently used idle decks until at most max_open are open
+    def _evict(self):
+        open_count = sum(entry.deck is not None for entry in self._entries.values())
+        for key, entry in list(self._entries.items()):
+            if open_count <= self.max_open:
+                break
+            if entry.users == 0:
+                if entry.deck is not None:
+                    open_count -= 1
+                self._close(key)
+        for key, entry in list(self._entries.items()):
+            if entry.users == 0 and entry.deck is None:
+                del self._entries[key]
@@ -0,0 +1,176 @@
+import re
+import functools
+import unicodedata
+from search import strip_punctuation
+
+# a card's answer may list several accepted answers separated by this
+ANSWER_SEPARATOR = " | "
+
+
+# str.translate table that deletes punctuation, filled in one character at a
+# time as characters are first seen
+class _PunctuationTable(dict):
+    def __missing__(self, code):
+        self[code] = None if unicodedata.category(chr(code)).startswith("P") else code
+        return self[code]
+
+
+_PUNCTUATION = _PunctuationTable()
+_DIGIT = re.compile(r"\d")
+
+
+# the form answers are compared in: NFKC, casefolded, punctuation removed
+# and whitespace collapsed, so " Who's  there? " matches "whos there".
+# Answers with digits keep the punctuation that belongs to their numbers
+# (see search.strip_punctuation), so "-3", "3.5" and "1/2" are not read as
+# "3", "35" and "12"
+def normalize_answer(text):
+    text = unicodedata.normalize("NFKC", text).casefold()
+    if _DIGIT.search(text):
+        text = strip_punctuation(text)
+    else:
+        text = text.translate(_PUNCTUATION)
+    return " ".join(text.split())
+
+
+def join_answers(answers):
+    return ANSWER_SEPARATOR.join(answers)
+
+
+# normalized accepted answers for a stored answer. Cached on the answer
+# text itself, so each card's answer is normalized once however often it is
+# asked, and an updated answer simply gets a new entry.
+@functools.lru_cache(maxsize=65536)
+def accepted_answers(answer):
+    return frozenset(normalize_answer(part) for part in answer.split(ANSWER_SEPARATOR))
+
+
+# True if a and b are at most max_edits insertions, deletions or
+# substitutions apart. Only the diagonal band of width 2 * max_edits + 1 is
+# computed, and it stops as soon as a whole row exceeds max_edits.
+def within_edits(a, b, max_edits):
+    if abs(len(a) - len(b)) > max_edits:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    too_far = max_edits + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        low = max(1, i - max_edits)
+        high = min(len(b), i + max_edits)
+        current = [too_far] * (len(b) + 1)
+        current[0] = i if i <= max_edits else too_far
+        for j in range(low, high + 1):
+            cost = 0 if char_a == b[j - 1] else 1
+            current[j] = min(previous[j - 1] + cost, previous[j] + 1, current[j - 1] + 1, too_far)
+        if min(current[low - 1:high + 1]) > max_edits:
+            return False
+        previous = current
+    return previous[len(b)] <= max_edits
+
+
+# grades one submission. The exact lookup in the accepted set is the common
+# case; with max_edits each accepted answer may also be that many edits away,
+# but never more than a quarter of its length so "4" does not accept "5"
+def is_correct_answer(user_answer, answer, max_edits=0):
+    accepted = accepted_answers(answer)
+    submitted = normalize_answer(user_answer)
+    if submitted in accepted:
+        return True
+    if max_edits:
+        return any(within_edits(submitted, candidate, min(max_edits, len(candidate) // 4))
+                   for candidate in accepted)
+    return False
+
+
+_NUMBER = re.compile(r"[-+]?(?:\d[\d,]*(?:\.\d+)?|\.\d+)\s*%?")
+
+
+# what sort of answer a card has, so that wrong options look like the right
+# one: "number" ("42", "-3.5", "1,000", "15%"), "name" (one to four words that
+# all start with a capital, like "Marie Curie"), "short" (up to three words)
+# or "long". Judged on the first accepted answer, as shown
+def answer_kind(answer):
+    text = answer.split(ANSWER_SEPARATOR)[0].strip()
+    if _NUMBER.fullmatch(text):
+        return "number"
+    words = text.split()
+    if len(words) <= 4 and all(word[:1].isupper() for word in words):
+        return "name"
+    return "short" if len(words) <= 3 else "long"
+
+
+# kinds tried, in order, when an answer's own kind has too few others
+_KIND_FALLBACKS = {
+    "number": ("number", "short", "name", "long"),
+    "name": ("name", "short", "long", "number"),
+    "short": ("short", "name", "long", "number"),
+    "long": ("long", "short", "name", "number"),
+}
+
+
+# Wrong options for multiple choice questions. The deck's answers are kept
+# grouped by answer_kind, each group a list of distinct answers (by their
+# normalized form) with a position map, so an answer is added or removed in
+# O(1) and k options are drawn from its group with a handful of random
+# picks, whatever the size of the deck. Answers shared by several cards are
+# reference counted.
+class DistractorIndex:
+
+    def __init__(self, answers=()):
+        self._groups = {kind: [] for kind in _KIND_FALLBACKS}
+        self._entries = {}
+        for answer in answers:
+            self.add(answer)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, answer):
+        shown = answer.split(ANSWER_SEPARATOR)[0].strip()
+        key = normalize_answer(shown)
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry[2] += 1
+            return
+        kind = answer_kind(shown)
+        group = self._groups[kind]
+        # entry: [answer shown, kind, cards using it, position in its group]
+        self._entries[key] = [shown, kind, 1, len(group)]
+        group.append(key)
+
+    def remove(self, answer):
+        key = normalize_answer(answer.split(ANSWER_SEPARATOR)[0].strip())
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        entry[2] -= 1
+        if entry[2]:
+            return
+        del self._entries[key]
+        group = self._groups[entry[1]]
+        last = group.pop()
+        if last != key:
+            group[entry[3]] = last
+            self._entries[last][3] = entry[3]
+
+    def clear(self):
+        for group in self._groups.values():
+            group.clear()
+        self._entries.clear()
+
+    # up to k answers unlike every accepted answer of `answer`, preferring
+    # its own kind; picks that hit the answer itself or repeat are redrawn,
+    # a bounded number of times per group
+    def distractors(self, answer, k, rng):
+        accepted = accepted_answers(answer)
+        chosen = {}
+        for kind in _KIND_FALLBACKS[answer_kind(answer)]:
+            group = self._groups[kind]
+            for _ in range(4 * k if len(group) > 2 * k else len(group) * 3):
+                if len(chosen) == k:
+                    return list(chosen.values())
+                key = group[rng.randrange(len(group))]
+                if key not in accepted and key not in chosen:
+                    chosen[key] = self._entries[key][0]
+        return list(chosen.values())
@@ -0,0 +1,613 @@
+import os
+import sys
+import json
+import random
+import argparse
+import itertools
+import platform
+import subprocess
+import time
+import tempfile
+import tracemalloc
+from project import FlashcardDeck, parse_cards
+from storage import SQLiteStore, CompactStore, JournalStore, write_binary_deck
+from scheduler import Scheduler, DAY
+from session import QuizSession, Timers
+from collection import Collection
+import metrics
+
+
+_WORDS = ("capital", "river", "element", "theorem", "symphony", "enzyme", "glacier", "verb",
+          "treaty", "orbit", "protein", "canal", "sonnet", "vector", "empire", "reactor")
+_UNICODE_WORDS = ("café", "naïve", "Straße", "δέλτα", "東京", "résumé", "数学", "Ωmega",
+                  "señor", "Ärger", "кошка", "ﬁnance")
+
+# results of this run by "<name> <count>", as saved by --save
+RESULTS = {}
+
+
+# synthetic cards for the benchmarks. "short" cards are numbered one-liners;
+# the other kinds come from a seeded generator so every run sees the same
+# deck: "long" questions and answers are sentences of 8 to 30 words,
+# "unicode" mixes accented, Greek, Cyrillic and CJK words, and "multi" cards
+# have two to four accepted answers
+def make_cards(count, kind="short", seed=0):
+    if kind == "short":
+        return {f"Question {i}": f"Answer {i}" for i in range(count)}
+    rng = random.Random(seed)
+    words = _UNICODE_WORDS if kind == "unicode" else _WORDS
+    cards = {}
+    for i in range(count):
+        if kind == "long":
+            question = " ".join(rng.choices(words, k=rng.randint(8, 30)))
+            answer = " ".join(rng.choices(words, k=rng.randint(8, 30)))
+        elif kind == "unicode":
+            question = " ".join(rng.choices(words, k=4))
+            answer = " ".join(rng.choices(words, k=2))
+        elif kind == "multi":
+            question = " ".join(rng.choices(words, k=5))
+            answer = [f"{word} {i}" for word in rng.sample(words, rng.randint(2, 4))]
+        else:
+            raise ValueError(f"Unknown card kind '{kind}'")
+        cards[f"{question} #{i}"] = answer
+    return cards
+
+
+def report(name, count, elapsed, unit="card"):
+    print(f"{name:<20} {count:>9} {unit}s  {elapsed * 1000:10.1f} ms  {elapsed / count * 1e9:8.0f} ns/{unit}")
+    RESULTS[f"{name} {count}"] = {"time": elapsed / count, "unit": unit, "count": count}
+
+
+def percentile(timings, fraction):
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+# times operation(argument) runs times, with argument = setup() made fresh
+# and untimed before each run, then once more under tracemalloc for the peak
+# memory it allocates (a separate run, since tracing slows everything down).
+# per is how many units (cards, questions) one run handles
+def measure(name, count, operation, runs, setup=None, per=1, unit="op"):
+    timings = []
+    for _ in range(runs):
+        argument = setup() if setup else None
+        start = time.perf_counter()
+        operation(argument)
+        timings.append(time.perf_counter() - start)
+    argument = setup() if setup else None
+    tracemalloc.start()
+    operation(argument)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    result = {"time": percentile(timings, 0.5), "p90": percentile(timings, 0.9),
+              "p99": percentile(timings, 0.99), "throughput": per * runs / sum(timings),
+              "peak": peak, "unit": unit, "count": count, "runs": runs}
+    RESULTS[f"{name} {count}"] = result
+    print(f"{name:<20} {count:>9} cards  {result['throughput']:12,.0f} {unit}/s  "
+          f"p50 {result['time'] * 1e6:10.1f} us  p90 {result['p90'] * 1e6:10.1f} us  "
+          f"p99 {result['p99'] * 1e6:10.1f} us  peak {peak / 2**20:8.2f} MB")
+
+
+# the deck engine end to end: bulk loading, quizzes, grading, viewing and
+# deleting, on decks of the --kind of cards at each size
+def bench_engine(sizes, kind="short"):
+    for count in sizes:
+        cards = make_cards(count, kind)
+        bulk_runs = 3 if count < 1_000_000 else 1
+
+        def fresh_deck():
+            return FlashcardDeck(max_size=count, seed=0)
+
+        measure("add_deck", count, lambda deck: deck.add_deck(cards), bulk_runs,
+                setup=fresh_deck, per=count, unit="card")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cards.json")
+            with open(path, "w", encoding="utf-8") as file:
+                json.dump(cards, file, ensure_ascii=False)
+            measure("upload_deck", count, lambda deck: deck.upload_deck(path), bulk_runs,
+                    setup=fresh_deck, per=count, unit="card")
+            measure("upload_deck stream", count, lambda deck: deck.upload_deck(path, stream=True),
+                    bulk_runs, setup=fresh_deck, per=count, unit="card")
+
+        deck = fresh_deck()
+        deck.add_cards(cards)
+        runs = 1000
+        measure("quiz pro", count, lambda _: deck.quiz('pro'), runs, unit="quiz")
+
+        questions = deck.quiz('pro')["questions"]
+        answers = itertools.cycle(enumerate(answer for _, answer in questions))
+        measure("check_answer", count, lambda _: deck.check_answer(*next(answers), questions),
+                runs, unit="answer")
+        measure("page 50", count, lambda _: deck.page(count // 2, 50), runs, unit="page")
+        # the first view renders every card; after that only edited chunks are
+        # rendered again, so a view costs one join of the cached chunks
+        measure("view_deck", count, lambda _: deck.view_deck(), bulk_runs,
+                setup=lambda: setattr(deck, "_rendered", None), per=count, unit="card")
+        measure("view_deck cached", count, lambda _: deck.view_deck(), runs, unit="view")
+        edited = itertools.cycle(question for question, _ in deck.sample(min(count, 100)))
+        measure("view_deck 1 edit", count,
+                lambda _: (deck.update_flashcard(next(edited), "edited"), deck.view_deck()),
+                bulk_runs * 10, unit="view")
+        measure("render_page 50", count, lambda _: deck.render_page(count // 2, 50), runs, unit="page")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cards.txt")
+            measure("export_text", count, lambda _: deck.export_text(path), bulk_runs,
+                    per=count, unit="card")
+
+        targets = iter(question for question, _ in deck.sample(min(count // 2, runs + 1)))
+        measure("delete_card", count, lambda _: deck.delete_card(next(targets)),
+                min(count // 2, runs + 1) - 1, unit="delete")
+        deck.close()
+
+
+# bulk insert should cost the same per card at every deck size
+def bench_add_cards(sizes):
+    for count in sizes:
+        cards = make_cards(count)
+        deck = FlashcardDeck(max_size=count)
+        start = time.perf_counter()
+        deck.add_cards(cards)
+        report("add_cards", count, time.perf_counter() - start)
+
+
+# batched inserts into SQLite, then reopening the deck (which reads nothing up front)
+def bench_sqlite(sizes):
+    for count in sizes:
+        cards = make_cards(count)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cards.db")
+            deck = FlashcardDeck(max_size=count, storage=SQLiteStore(path))
+            start = time.perf_counter()
+            deck.add_cards(cards)
+            report("sqlite add_cards", count, time.perf_counter() - start)
+            deck.close()
+
+            start = time.perf_counter()
+            deck = FlashcardDeck(max_size=count, storage=SQLiteStore(path))
+            deck.card_count
+            deck.deck[f"Question {count - 1}"]
+            report("sqlite open", count, time.perf_counter() - start)
+            # the duplicate check of the first add goes to the qkey index
+            # instead of reading every question
+            start = time.perf_counter()
+            deck.add_flashcard("A new question?", "Answer")
+            print(f"{'sqlite first add':<20} {count:>9} cards  {(time.perf_counter() - start) * 1000:10.2f} ms")
+            deck.close()
+
+
+# memory held by the cards alone: a plain dict against the compact arena store
+def bench_memory(sizes):
+    for count in sizes:
+        if count < 10_000:
+            continue
+        for name, factory in (("dict", dict), ("compact", CompactStore)):
+            tracemalloc.start()
+            store = factory((f"Question {i}", f"Answer {i}") for i in range(count))
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"memory {name:<13} {count:>9} cards  {current / 2**20:10.1f} MB  {current / count:8.0f} B/card")
+            del store
+
+
+# a pro quiz (15 cards) should cost the same at every deck size, multiple
+# choice included
+def bench_quiz(sizes):
+    runs = 1000
+    for count in sizes:
+        deck = FlashcardDeck(max_size=count, seed=0)
+        deck.add_cards(make_cards(count))
+        start = time.perf_counter()
+        for _ in range(runs):
+            deck.quiz('pro')
+        elapsed = (time.perf_counter() - start) / runs
+        print(f"{'quiz pro':<20} {count:>9} cards  {elapsed * 1e6:10.1f} us/quiz")
+
+        # multiple choice: the distractor index is built on the first quiz
+        start = time.perf_counter()
+        deck.quiz('pro', choices=4)
+        report("distractor index", count, time.perf_counter() - start)
+        start = time.perf_counter()
+        for _ in range(runs):
+            deck.quiz('pro', choices=4)
+        elapsed = (time.perf_counter() - start) / runs
+        print(f"{'quiz pro mcq':<20} {count:>9} cards  {elapsed * 1e6:10.1f} us/quiz")
+
+
+# reviews recorded for every card, then repeated "next 15 due" lookups
+def bench_scheduler(sizes):
+    runs = 1000
+    for count in sizes:
+        scheduler = Scheduler()
+        start = time.perf_counter()
+        for i in range(count):
+            scheduler.record(f"Question {i}", i % 3 != 0, now=i)
+        report("scheduler record", count, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for _ in range(runs):
+            scheduler.due(15, now=2 * DAY)
+        elapsed = (time.perf_counter() - start) / runs
+        print(f"{'scheduler due 15':<20} {count:>9} cards  {elapsed * 1e6:10.1f} us/call")
+
+
+# building the search index on first use, then per-query latency
+def bench_search(sizes):
+    runs = 1000
+    for count in sizes:
+        deck = FlashcardDeck(max_size=count)
+        deck.add_cards(make_cards(count))
+        start = time.perf_counter()
+        deck.search("warm up")
+        report("search index build", count, time.perf_counter() - start)
+
+        target = count // 2
+        for mode, query in (("exact", f"question {target}"), ("prefix", f"Question {target}"),
+                            ("text", f"answer {target}")):
+            start = time.perf_counter()
+            for _ in range(runs):
+                deck.search(query, mode=mode, limit=10)
+            elapsed = (time.perf_counter() - start) / runs
+            print(f"{'search ' + mode:<20} {count:>9} cards  {elapsed * 1e6:10.1f} us/query")
+
+
+# grading a batch of submissions against quiz-sized sets of cards; the
+# answers repeat like they would across many learners taking the same quiz
+def bench_grading(sizes):
+    for count in sizes:
+        deck = FlashcardDeck(max_size=15)
+        questions = [(f"Question {i}", f"Answer number {i}") for i in range(15)]
+        submissions = [f"answer Number {i % 15}" if i % 4 else "wrong" for i in range(count)]
+        start = time.perf_counter()
+        for offset in range(0, count, 15):
+            deck.check_answers(submissions[offset:offset + 15], questions)
+        report("check_answers", count, time.perf_counter() - start, unit="answer")
+
+        start = time.perf_counter()
+        for offset in range(0, count, 15):
+            deck.check_answers(submissions[offset:offset + 15], questions, max_edits=2)
+        report("check_answers fuzzy", count, time.perf_counter() - start, unit="answer")
+
+
+# cold start of a fresh interpreter importing the headless engine vs the GUI
+def bench_import(sizes):
+    runs = 5
+    for module in ("flashcard_deck", "project", "flashcard_app"):
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", f"import {module}"], check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            timings.append(time.perf_counter() - start)
+        baseline = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", "pass"], check=True)
+            baseline.append(time.perf_counter() - start)
+        elapsed = min(timings) - min(baseline)
+        print(f"{'import ' + module:<28} {elapsed * 1000:10.1f} ms  (over a bare interpreter)")
+
+
+# drives a 1000 question quiz through the GUI handlers (needs a display):
+# time per submitted answer and how many widgets exist before and after
+def bench_gui_quiz(sizes):
+    import gc
+    from kivy.uix.widget import Widget
+    from flashcard_app import FlashcardApp
+
+    def count_widgets():
+        gc.collect()
+        return sum(isinstance(item, Widget) for item in gc.get_objects())
+
+    count = 1000
+    deck = FlashcardDeck(max_size=count)
+    deck.add_cards(make_cards(count))
+    app = FlashcardApp(deck=deck)
+    app.root = app.build()
+    app.session = QuizSession(deck, list(deck.deck.items()), float("inf"),
+                              on_question=app.show_quiz, on_finish=app.end_quiz).start()
+
+    widgets_before = count_widgets()
+    objects_before = len(gc.get_objects())
+    timings = []
+    for _ in range(count - 1):
+        app.quiz_answer_input.text = "Answer 1"
+        start = time.perf_counter()
+        app.submit_answer(None)
+        timings.append(time.perf_counter() - start)
+    widgets_after = count_widgets()
+    objects_after = len(gc.get_objects())
+
+    timings.sort()
+    print(f"{'gui submit_answer':<20} {count:>9} questions  p50 {timings[len(timings) // 2] * 1e6:8.1f} us"
+          f"  p99 {timings[int(len(timings) * 0.99)] * 1e6:8.1f} us")
+    print(f"{'gui widgets':<20} {widgets_before:>9} before  {widgets_after:>6} after"
+          f"  ({objects_after - objects_before:+d} gc tracked objects)")
+
+
+# parsing a pasted "question: answer" block and the same cards as CSV
+def bench_parse(sizes):
+    for count in sizes:
+        text = "\n".join(f"Question {i}: Answer {i} at 10:{i % 60:02d}" for i in range(count))
+        start = time.perf_counter()
+        parse_cards(text)
+        report("parse_cards text", count, time.perf_counter() - start, unit="line")
+
+        text = "\n".join(f"Question {i},Answer {i},Other {i}" for i in range(count))
+        start = time.perf_counter()
+        parse_cards(text, format="csv")
+        report("parse_cards csv", count, time.perf_counter() - start, unit="line")
+
+
+# loading a deck from JSON against mapping the same cards from a binary deck
+# file, then a quiz and a page from the middle. Each load runs in a fresh
+# interpreter, which reports its peak RSS and how much of its memory is its
+# own (anonymous) rather than mapped pages of the deck file (Linux only)
+_LOAD_DECK = """
+import sys, time, json
+from flashcard_deck import FlashcardDeck
+from storage import MappedStore
+start = time.perf_counter()
+if sys.argv[1] == "json":
+    deck = FlashcardDeck(max_size=10**9)
+    with open(sys.argv[2]) as file:
+        deck.add_cards(json.load(file))
+else:
+    deck = FlashcardDeck(max_size=10**9, storage=MappedStore(sys.argv[2]))
+loaded = time.perf_counter() - start
+deck.quiz("pro")
+deck.page(deck.card_count // 2, 50)
+elapsed = time.perf_counter() - start
+status = dict(line.split(":", 1) for line in open("/proc/self/status"))
+print(json.dumps([loaded, elapsed, int(status["VmHWM"].split()[0]), int(status["RssAnon"].split()[0])]))
+"""
+
+
+def bench_binary(sizes):
+    for count in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            paths = {"json": os.path.join(directory, "cards.json"), "binary": os.path.join(directory, "cards.deck")}
+            cards = make_cards(count)
+            with open(paths["json"], "w") as file:
+                json.dump(cards, file)
+            start = time.perf_counter()
+            write_binary_deck(paths["binary"], cards)
+            report("binary write", count, time.perf_counter() - start)
+            del cards
+            for name, path in paths.items():
+                result = subprocess.run([sys.executable, "-c", _LOAD_DECK, name, path],
+                                        check=True, capture_output=True, text=True)
+                loaded, total, peak, anonymous = json.loads(result.stdout)
+                print(f"{'load ' + name:<20} {count:>9} cards  {loaded * 1000:10.1f} ms  "
+                      f"quiz+page {(total - loaded) * 1000:6.1f} ms  peak RSS {peak / 1024:6.1f} MB  "
+                      f"anonymous {anonymous / 1024:6.1f} MB  file {os.path.getsize(path) / 2**20:6.1f} MB")
+
+
+# single edits to a journaled deck should cost the same at every deck size.
+# Compaction rewrites the deck once every max(compact_after, cards) edits, so
+# it adds compaction time / cards to each edit. Rewriting the whole JSON file
+# per edit is shown for comparison up to 100k cards
+def bench_journal(sizes):
+    edits = 2000
+    for count in sizes:
+        cards = make_cards(count)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cards.deck")
+            deck = FlashcardDeck(max_size=count + edits, storage=JournalStore(path))
+            deck.add_cards(cards)
+            start = time.perf_counter()
+            deck.deck.compact()
+            compaction = time.perf_counter() - start
+            start = time.perf_counter()
+            for i in range(edits):
+                deck.update_flashcard(f"Question {i * 7 % count}", f"Edited {i}")
+                deck.add_flashcard(f"New {i}", f"Answer {i}")
+            report("journal edit", 2 * edits, time.perf_counter() - start, unit="edit")
+            print(f"{'journal compact':<20} {count:>9} cards  {compaction * 1000:10.1f} ms  "
+                  f"{compaction / max(count, 10_000) * 1e9:8.0f} ns/edit amortized")
+            deck.close()
+
+            start = time.perf_counter()
+            deck = FlashcardDeck(max_size=count + edits, storage=JournalStore(path))
+            print(f"{'journal reopen':<20} {count:>9} cards  {(time.perf_counter() - start) * 1000:10.1f} ms"
+                  f"  ({2 * edits} records replayed)")
+            start = time.perf_counter()
+            deck.add_flashcard("A new question?", "Answer")
+            print(f"{'journal first add':<20} {count:>9} cards  {(time.perf_counter() - start) * 1000:10.2f} ms")
+            deck.close()
+
+            if count <= 100_000:
+                json_path = os.path.join(directory, "cards.json")
+                runs = max(1, 10_000 // count)
+                start = time.perf_counter()
+                for i in range(runs):
+                    cards[f"Question {i}"] = f"Edited {i}"
+                    with open(json_path, "w") as file:
+                        json.dump(cards, file)
+                        file.flush()
+                        os.fsync(file.fileno())
+                report("json rewrite edit", runs, time.perf_counter() - start, unit="edit")
+
+
+# many headless sessions on one deck, sharing one Timers heap: half answer
+# all five questions, the other half go idle and must be ended by their
+# timers. Reports the cost per answer and how late the timeouts fired
+def bench_sessions(sizes):
+    deck = FlashcardDeck(max_size=1000, seed=0)
+    deck.add_cards(make_cards(1000))
+    time_limit = 2.0
+    for count in sizes:
+        if count > 100_000:
+            continue
+        timers = Timers()
+        lateness = []
+
+        def finished(session):
+            if session.reason == "timeout":
+                lateness.append(time.monotonic() - session.deadline)
+
+        sessions = [QuizSession(deck, deck.sample(5), time_limit, timers.schedule_once, on_finish=finished)
+                    for _ in range(count)]
+        for session in sessions:
+            session.start()
+        start = time.perf_counter()
+        for session in sessions[::2]:
+            for question, answer in session.questions:
+                session.answer(answer)
+        report("session answer", 5 * len(sessions[::2]), time.perf_counter() - start, unit="answer")
+
+        while len(lateness) < count // 2:
+            deadline = timers.next_deadline()
+            if deadline is None:
+                break
+            time.sleep(max(0.0, deadline - time.monotonic()))
+            timers.run()
+        lateness.sort()
+        print(f"{'session timeout':<20} {len(lateness):>9} sessions  late by p50 "
+              f"{lateness[len(lateness) // 2] * 1000:6.2f} ms  p99 {lateness[int(len(lateness) * 0.99)] * 1000:6.2f} ms")
+
+
+# cost of instrumentation per call: with metrics disabled the methods are
+# the originals, enabled each call also fills a histogram
+def bench_metrics(sizes):
+    runs = 100_000
+    deck = FlashcardDeck(max_size=1000, seed=0)
+    deck.add_cards(make_cards(1000))
+    questions = deck.quiz('pro')["questions"]
+    for state in ("disabled", "enabled"):
+        if state == "enabled":
+            metrics.enable()
+        try:
+            start = time.perf_counter()
+            for i in range(runs):
+                deck.check_answer(i % 15, "Answer", questions)
+            report(f"check_answer {state}", runs, time.perf_counter() - start, unit="call")
+        finally:
+            metrics.disable()
+
+
+# a library of 300 subject decks, every card tagged with its subject and one
+# in a hundred also "hard", with a tenth of the cards mastered. Filtered
+# quizzes should cost about the size of the matching tag, not the library
+def bench_collection(sizes):
+    runs = 200
+    subjects = 300
+    for count in sizes:
+        library = Collection(max_size=count, seed=0)
+        cards = list(make_cards(count).items())
+        start = time.perf_counter()
+        for i, (question, answer) in enumerate(cards):
+            name = f"subject {i % subjects}"
+            library.add_flashcard(name, question, answer, tags=[name] + (["hard"] if i % 100 == 0 else []))
+            if i % 10 == 1:
+                for _ in range(5):
+                    library.deck(name).record_review(question, True)
+        report("collection build", count, time.perf_counter() - start)
+
+        queries = (
+            ("quiz subject", lambda: library.quiz("beginner", tags=["subject 7"], mastered=False,
+                                                  decks=["subject 7"])),
+            ("quiz hard", lambda: library.quiz("beginner", tags=["hard"])),
+            ("quiz hard unmastered", lambda: library.quiz("beginner", tags=["hard"], mastered=False)),
+        )
+        for name, query in queries:
+            start = time.perf_counter()
+            for _ in range(runs):
+                query()
+            elapsed = (time.perf_counter() - start) / runs
+            print(f"{name:<20} {count:>9} cards  {elapsed * 1e6:10.1f} us/quiz")
+
+
+BENCHMARKS = {
+    "engine": bench_engine,
+    "add_cards": bench_add_cards,
+    "sqlite": bench_sqlite,
+    "memory": bench_memory,
+    "quiz": bench_quiz,
+    "scheduler": bench_scheduler,
+    "search": bench_search,
+    "grading": bench_grading,
+    "import": bench_import,
+    "gui_quiz": bench_gui_quiz,
+    "parse": bench_parse,
+    "binary": bench_binary,
+    "journal": bench_journal,
+    "sessions": bench_sessions,
+    "metrics": bench_metrics,
+    "collection": bench_collection,
+}
+
+# needs Kivy and a display, so it only runs when asked for by name
+OPT_IN = {"gui_quiz"}
+
+
+# compares this run against a saved one; a result regresses when its time
+# (or peak memory) grew by more than threshold. Returns the regressions
+def compare(baseline, threshold):
+    with open(baseline) as file:
+        saved = json.load(file)
+    if saved["meta"]["python"] != platform.python_version() or saved["meta"]["machine"] != platform.node():
+        print(f"note: baseline is from Python {saved['meta']['python']} on {saved['meta']['machine']}")
+    regressions = []
+    print(f"\n{'benchmark':<30} {'baseline':>12} {'now':>12} {'change':>8}")
+    for key, result in RESULTS.items():
+        old = saved["results"].get(key)
+        if old is None:
+            continue
+        for metric, scale, label in (("time", 1e6, "us"), ("peak", 2**-20, "MB")):
+            if metric not in result or metric not in old or not old[metric]:
+                continue
+            change = result[metric] / old[metric] - 1
+            flag = ""
+            # a few kilobytes either way is allocator noise, not a regression
+            if change > threshold and (metric == "time" or result[metric] - old[metric] > 65536):
+                flag = "  REGRESSION"
+                regressions.append(f"{key} {metric}")
+            name = key if metric == "time" else f"{key} (peak)"
+            print(f"{name:<30} {old[metric] * scale:9.1f} {label} {result[metric] * scale:9.1f} {label} "
+                  f"{change:+7.1%}{flag}")
+    return regressions
+
+
+def save(path, sizes, kind):
+    meta = {"python": platform.python_version(), "machine": platform.node(),
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"), "sizes": sizes, "kind": kind}
+    with open(path, "w") as file:
+        json.dump({"meta": meta, "results": RESULTS}, file, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the flashcard deck engine.")
+    parser.add_argument("names", nargs="*", metavar="name",
+                        help=f"benchmarks to run (default: all but {', '.join(sorted(OPT_IN))}): "
+                             f"{', '.join(BENCHMARKS)}")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000", help="deck sizes, comma separated")
+    parser.add_argument("--kind", choices=["short", "long", "unicode", "multi"], default="short",
+                        help="synthetic cards for the engine benchmark")
+    parser.add_argument("--save", metavar="FILE", help="write the results to FILE as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare the results against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="slowdown counted as a regression (default 0.25, i.e. 25%%)")
+    options = parser.parse_args(argv)
+
+    unknown = [name for name in options.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+    sizes = [int(size) for size in options.sizes.split(",")]
+    for name in options.names or [name for name in BENCHMARKS if name not in OPT_IN]:
+        if name == "engine":
+            bench_engine(sizes, options.kind)
+        else:
+            BENCHMARKS[name](sizes)
+    if options.save:
+        save(options.save, sizes, options.kind)
+    if options.compare:
+        regressions = compare(options.compare, options.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regressions: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+import os
+import sys
+import json
+import argparse
+import functools
+import multiprocessing
+from flashcard_deck import FlashcardDeck, JSONCardStream
+from render import write_cards
+
+# Headless batch tool for deck files, built on FlashcardDeck. Every file is
+# handled by a worker in a process pool and its result is written to stdout
+# as one JSON line (NDJSON) as soon as it is ready. Exits with 1 if any file
+# failed validation.
+#
+#   python cli.py validate decks/*.json
+#   python cli.py quiz --level pro --seed 7 decks/*.json
+#   python cli.py export --format txt -o out/ decks/*.json
+#   python cli.py merge -o merged.json decks/*.json
+
+
+# loads one file into a fresh deck, counting what did not make it in
+def load_deck(path, max_size, drop=()):
+    deck = FlashcardDeck(max_size=max_size)
+    record = {"file": path, "status": "ok"}
+    try:
+        with open(path, "rb") as file:
+            reader = JSONCardStream(file)
+            counts = deck.add_cards(reader)
+    except FileNotFoundError:
+        record.update(status="error", error="File not found")
+        return deck, record
+    except (json.JSONDecodeError, UnicodeDecodeError) as error:
+        record.update(status="error", error=f"Invalid JSON format: {error}")
+        return deck, record
+    # a directory, an unreadable file, a read error: one bad path must not
+    # stop the rest of the run
+    except OSError as error:
+        record.update(status="error", error=f"Could not read file: {error.strerror or error}")
+        return deck, record
+    for question in drop:
+        if question in deck.deck:
+            deck.delete_card(question)
+    record.update(cards=deck.card_count, duplicates=counts["duplicate"],
+                  rejected=counts["rejected"], skipped=reader.skipped)
+    if reader.skipped or counts["rejected"]:
+        record.update(status="error", error="Malformed or rejected cards")
+    return deck, record
+
+
+def validate_file(path, options):
+    _, record = load_deck(path, options.max_size)
+    return record
+
+
+def quiz_file(path, options):
+    deck, record = load_deck(path, options.max_size)
+    if record["status"] != "ok":
+        return record
+    deck.random.seed(f"{options.seed}:{path}")
+    quiz = deck.quiz(options.level)
+    if isinstance(quiz, str):
+        record.update(status="error", error=quiz)
+    else:
+        record.update(questions=quiz["questions"], time_limit=quiz["time_limit"])
+    return record
+
+
+def export_file(path, options):
+    deck, record = load_deck(path, options.max_size, options.drop)
+    if record["status"] != "ok":
+        return record
+    name = os.path.splitext(os.path.basename(path))[0]
+    output = os.path.join(options.output, f"{name}.{options.format}")
+    with open(output, "w", encoding="utf-8") as file:
+        if options.format == "json":
+            json.dump(dict(deck.deck.items()), file, ensure_ascii=False, indent=4)
+        else:
+            write_cards(file, deck.deck.items())
+    record["output"] = output
+    return record
+
+
+# merge workers send their cards back so the parent can combine them
+def read_file(path, options):
+    deck, record = load_deck(path, options.max_size, options.drop)
+    return record, list(deck.deck.items())
+
+
+# results come back as workers finish them unless ordered is set
+def run(worker, paths, options, ordered=False):
+    task = functools.partial(worker, options=options)
+    if options.jobs == 1:
+        yield from map(task, paths)
+        return
+    with multiprocessing.Pool(options.jobs) as pool:
+        results = pool.imap if ordered else pool.imap_unordered
+        yield from results(task, paths, chunksize=options.chunksize)
+
+
+def emit(record):
+    sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+
+def merge(options):
+    merged = FlashcardDeck(max_size=options.max_size)
+    failed = False
+    duplicates = 0
+    for record, cards in run(read_file, options.files, options, ordered=True):
+        counts = merged.add_cards(cards, options.on_duplicate)
+        duplicates += counts["duplicate"]
+        record["merged"] = counts["added"]
+        failed = failed or record["status"] != "ok" or counts["rejected"] > 0
+        emit(record)
+    with open(options.output, "w", encoding="utf-8") as file:
+        json.dump(dict(merged.deck.items()), file, ensure_ascii=False, indent=4)
+    emit({"output": options.output, "cards": merged.card_count, "duplicates": duplicates})
+    return failed
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Batch operations on flashcard deck files.")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--chunksize", type=int, default=16, help="files handed to a worker at a time")
+    parser.add_argument("--max-size", type=int, default=FlashcardDeck.MAX_DECK_SIZE, help="deck capacity")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    validate = commands.add_parser("validate", help="check that deck files parse and fit")
+    validate.add_argument("files", nargs="+")
+
+    quiz = commands.add_parser("quiz", help="generate a quiz from every deck")
+    quiz.add_argument("--level", choices=["beginner", "mid", "pro"], default="beginner")
+    quiz.add_argument("--seed", default="0", help="makes the quizzes reproducible")
+    quiz.add_argument("files", nargs="+")
+
+    export = commands.add_parser("export", help="write every deck deduplicated to a directory")
+    export.add_argument("--format", choices=["json", "txt"], default="json")
+    export.add_argument("-o", "--output", required=True, help="output directory")
+    export.add_argument("--drop", action="append", default=[], help="question to delete (repeatable)")
+    export.add_argument("files", nargs="+")
+
+    merge = commands.add_parser("merge", help="merge all decks into one, the first file's card wins")
+    merge.add_argument("-o", "--output", required=True, help="output file")
+    merge.add_argument("--drop", action="append", default=[], help="question to delete (repeatable)")
+    merge.add_argument("--on-duplicate", choices=["skip", "overwrite", "keep-both"], default="skip",
+                       help="what to do with a card whose question is already in the merged deck")
+    merge.add_argument("files", nargs="+")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    if options.command == "merge":
+        return 1 if merge(options) else 0
+
+    worker = {"validate": validate_file, "quiz": quiz_file, "export": export_file}[options.command]
+    if options.command == "export":
+        os.makedirs(options.output, exist_ok=True)
+    failed = False
+    for record in run(worker, options.files, options):
+        failed = failed or record["status"] != "ok"
+        emit(record)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
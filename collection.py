@@ -0,0 +1,187 @@
+import json
+import bisect
+import random
+import itertools
+from flashcard_deck import FlashcardDeck
+from answers import join_answers
+
+
+# Named decks whose cards carry tags, quizzed across decks by filter:
+#
+#     library = Collection()
+#     library.upload("library.json")
+#     library.quiz("mid", tags=["chemistry"], mastered=False)
+#
+# Each deck keeps its own tag index (see search.TagIndex) in step with its
+# cards, so a filter costs about the size of its rarest tag in each deck it
+# looks at, however large the library. Quizzes sample from the matching
+# cards and remember which deck each question came from, so answers are
+# graded and scheduled in that deck.
+#
+# upload() reads a JSON file of decks, each either the usual
+# {question: answer} object or a list of cards with tags:
+#
+#     {"decks": {"chemistry": [{"question": "H2O?", "answer": "Water",
+#                               "tags": ["molecules"]}],
+#                "capitals": {"France?": "Paris"}}}
+class Collection:
+
+    def __init__(self, max_size=FlashcardDeck.MAX_DECK_SIZE, seed=None):
+        self.max_size = max_size
+        self.random = random.Random(seed)
+        self.decks = {}
+
+    def __len__(self):
+        return len(self.decks)
+
+    def __contains__(self, name):
+        return name in self.decks
+
+    @property
+    def card_count(self):
+        return sum(deck.card_count for deck in self.decks.values())
+
+    # the deck called name, created empty the first time it is asked for
+    def deck(self, name):
+        deck = self.decks.get(name)
+        if deck is None:
+            if not isinstance(name, str) or not name.strip():
+                raise ValueError(f"Invalid deck name '{name}'")
+            deck = self.decks[name] = FlashcardDeck(max_size=self.max_size,
+                                                    seed=self.random.randrange(2**32))
+        return deck
+
+    def remove_deck(self, name):
+        deck = self.decks.pop(name, None)
+        if deck is None:
+            return f"Deck '{name}' not found"
+        deck.close()
+        return f"Deck '{name}' deleted!"
+
+    def add_flashcard(self, name, question, answer, tags=()):
+        deck = self.deck(name)
+        result = deck.add_flashcard(question, answer)
+        if tags and question in deck.deck:
+            tagged = deck.tag_card(question, tags)
+            if tagged == "Invalid tag":
+                return tagged
+        return result
+
+    # every tag in the collection with how many cards have it
+    def tag_counts(self):
+        counts = {}
+        for deck in self.decks.values():
+            for tag, count in deck.tags.counts().items():
+                counts[tag] = counts.get(tag, 0) + count
+        return counts
+
+    # (deck name, question) for each card that passes the filter (see
+    # FlashcardDeck.select), from the decks named in decks or all of them
+    def select(self, tags=(), any_tags=(), exclude=(), mastered=None, decks=None):
+        matches = self._matches(tags, any_tags, exclude, mastered, decks)
+        return [(name, question) for name, questions in matches for question in questions]
+
+    # a quiz over the cards that pass the filter, as FlashcardDeck.quiz
+    # returns it, plus "decks": the deck each question came from. Positions
+    # are drawn over all the matches and looked up deck by deck, so nothing
+    # is built per matching card
+    def quiz(self, level, tags=(), any_tags=(), exclude=(), mastered=None, decks=None):
+        num_questions = FlashcardDeck.QUIZ_SIZES.get(level, FlashcardDeck.QUIZ_SIZES["pro"])
+        matches = self._matches(tags, any_tags, exclude, mastered, decks)
+        starts = list(itertools.accumulate((len(questions) for _, questions in matches), initial=0))
+        if starts[-1] < num_questions:
+            return f"error: Not enough flashcards for {level} level quiz."
+        picked = []
+        for position in self.random.sample(range(starts[-1]), num_questions):
+            number = bisect.bisect_right(starts, position) - 1
+            name, questions = matches[number]
+            picked.append((name, questions[position - starts[number]]))
+        return {
+            "questions": [(question, self.decks[name].deck[question]) for name, question in picked],
+            "decks": [name for name, _ in picked],
+            "time_limit": FlashcardDeck.QUIZ_TIME_LIMIT,
+        }
+
+    # grades one answer of a collection quiz in the deck the question came from
+    def check_answer(self, current_question_index, user_answer, quiz, max_edits=0):
+        deck = self.decks[quiz["decks"][current_question_index]]
+        return deck.check_answer(current_question_index, user_answer, quiz["questions"], max_edits)
+
+    # loads a collection file (see above); policy is passed on to add_cards
+    def upload(self, filepath, policy="skip"):
+        try:
+            with open(filepath, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return "File not found. Please check the file path and try again."
+        except json.JSONDecodeError:
+            return "Invalid JSON format. Please check the file content."
+        try:
+            decks = _read_decks(data)
+        except ValueError as error:
+            return f"Invalid collection file: {error}"
+
+        added = 0
+        for name, cards in decks.items():
+            deck = self.deck(name)
+            counts = deck.add_cards([(question, answer) for question, answer, _ in cards], policy)
+            added += counts["added"]
+            existing = dict(counts["collisions"])
+            for question, _, tags in cards:
+                target = question if question in deck.deck else existing.get(question)
+                if tags and target is not None:
+                    deck.tag_card(target, tags)
+        return f"Collection added! {added} cards in {len(decks)} decks."
+
+    # Helper functions
+
+    # (deck name, matching questions) for each deck with any matches; decks
+    # without one of the tags, or without any of any_tags, are passed over
+    # with a lookup per tag
+    def _matches(self, tags, any_tags, exclude, mastered, decks):
+        found = []
+        for name in self.decks if decks is None else decks:
+            deck = self.decks.get(name)
+            if deck is None or not all(deck.tags.cards(tag) for tag in tags):
+                continue
+            if any_tags and not any(deck.tags.cards(tag) for tag in any_tags):
+                continue
+            questions = deck.select(tags, any_tags, exclude, mastered)
+            if questions:
+                found.append((name, questions))
+        return found
+
+
+# the decks of a collection file as {name: [(question, answer, tags)]}
+def _read_decks(data):
+    if not isinstance(data, dict) or not isinstance(data.get("decks"), dict):
+        raise ValueError('expected an object with a "decks" object')
+    decks = {}
+    for name, cards in data["decks"].items():
+        if not name.strip():
+            raise ValueError("deck names cannot be empty")
+        if isinstance(cards, dict):
+            decks[name] = [(question, answer, ()) for question, answer in cards.items()]
+        elif isinstance(cards, list):
+            decks[name] = [_read_card(name, card) for card in cards]
+        else:
+            raise ValueError(f"deck '{name}' must be an object or a list of cards")
+    return decks
+
+
+def _read_card(name, card):
+    if not isinstance(card, dict) or "question" not in card or "answer" not in card:
+        raise ValueError(f"cards in deck '{name}' need a question and an answer")
+    if not isinstance(card["question"], str):
+        raise ValueError(f"questions in deck '{name}' must be strings")
+    answer = card["answer"]
+    if isinstance(answer, list):
+        if not all(isinstance(part, str) for part in answer):
+            raise ValueError(f"answers in deck '{name}' must be strings")
+        answer = join_answers(answer)
+    tags = card.get("tags", ())
+    if isinstance(tags, str):
+        tags = [tags]
+    if not isinstance(tags, list) or not all(isinstance(tag, str) and tag.strip() for tag in tags):
+        raise ValueError(f"tags in deck '{name}' must be non-empty strings")
+    return card["question"], answer, tags
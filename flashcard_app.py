@@ -0,0 +1,572 @@
+import os
+import json
+import time
+import queue
+import threading
+import metrics
+
+_IMPORT_STARTED = time.perf_counter()
+
+from kivy.app import App
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.button import Button
+from kivy.uix.togglebutton import ToggleButton
+from kivy.uix.textinput import TextInput
+from kivy.uix.label import Label
+from kivy.uix.popup import Popup
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.uix.progressbar import ProgressBar
+from kivy.uix.screenmanager import ScreenManager, Screen, NoTransition
+from kivy.animation import Animation
+from kivy.metrics import dp
+from kivy.clock import Clock
+from flashcard_deck import FlashcardDeck, StagedImport, read_deck_file, parse_cards
+from storage import SQLiteStore
+from render import render_card
+
+#  GUI part
+
+# Imports a deck file on a worker thread so the window keeps drawing while a
+# large file is parsed. The worker hands each batch of cards to the Kivy
+# thread through a short queue, and the Kivy thread adds one batch per frame,
+# so neither the parsed file nor the work of adding it piles up. The added
+# cards are staged (see StagedImport): a cancelled or failed import takes
+# them out again, so the deck ends up with the whole file or none of it.
+class DeckImport:
+
+    BATCH_SIZE = 1000
+    # batches read ahead of the ones added
+    QUEUED_BATCHES = 2
+
+    def __init__(self, deck, filepath, on_progress, on_done):
+        self.deck = deck
+        self.filepath = filepath
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.staged = StagedImport(deck)
+        self._cancelled = threading.Event()
+        self._queue = queue.Queue(maxsize=self.QUEUED_BATCHES)
+        self._event = None
+
+    def start(self):
+        self._event = Clock.schedule_interval(self._apply, 0)
+        threading.Thread(target=self._run, daemon=True).start()
+
+    # stops at once: the staged cards are taken out and on_done is called
+    # now, without waiting for the worker
+    def cancel(self):
+        if self._event is None:
+            return
+        self._end()
+        self.staged.rollback()
+        self.on_done("Import cancelled.")
+
+    def _run(self):
+        result = ("error", "Could not import the file.")
+        try:
+            parsed = read_deck_file(self.filepath, self.BATCH_SIZE, progress=self._report_progress,
+                                    cancelled=self._cancelled.is_set,
+                                    on_batch=lambda cards: self._send(("cards", cards)))
+            if parsed is not None:
+                result = ("done", parsed[1])
+        except FileNotFoundError:
+            result = ("error", "File not found. Please check the file path and try again.")
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            result = ("error", "Invalid JSON format. Please check the file content.")
+        except OSError as error:
+            result = ("error", f"Could not read file: {error.strerror}")
+        finally:
+            self._send(result)
+
+    # waits for room in the queue, giving up once the import is cancelled
+    def _send(self, item):
+        while not self._cancelled.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _report_progress(self, bytes_read, total_bytes):
+        Clock.schedule_once(lambda dt: self.on_progress(bytes_read, total_bytes))
+
+    # stops applying batches, and the worker reading them
+    def _end(self):
+        self._cancelled.set()
+        self._event.cancel()
+        self._event = None
+
+    # runs every frame on the Kivy thread and handles at most one batch
+    def _apply(self, dt):
+        try:
+            kind, value = self._queue.get_nowait()
+        except queue.Empty:
+            return
+        if kind == "cards":
+            try:
+                self.staged.add(value)
+                return
+            except Exception as error:
+                kind, value = "error", f"Could not add the cards: {error}"
+        self._end()
+        if kind == "done":
+            self.on_done(self.staged.commit(value))
+        else:
+            self.staged.rollback()
+            self.on_done(value)
+
+
+# Scrollable list of cards fed from FlashcardDeck.iter_pages. It starts with
+# one page and pulls the next when scrolled near the bottom, so opening it
+# costs the same for 10 cards or 100k. show() points it at a new deck
+# listing, so the same view is reused every time the deck is viewed.
+class DeckView(RecycleView):
+
+    LOAD_MORE_AT = 0.1
+
+    def __init__(self, pages=iter(()), **kwargs):
+        super().__init__(**kwargs)
+        self.viewclass = "Label"
+        rows = RecycleBoxLayout(orientation="vertical", size_hint_y=None,
+                                default_size=(None, dp(32)), default_size_hint=(1, None))
+        rows.bind(minimum_height=rows.setter("height"))
+        self.add_widget(rows)
+        self.show(pages)
+        self.bind(scroll_y=self.on_scroll)
+
+    def show(self, pages):
+        self.pages = pages
+        self.data = []
+        self.scroll_y = 1
+        self.load_next_page()
+
+    def load_next_page(self):
+        page = next(self.pages, None)
+        if page is None:
+            return False
+        self.data.extend({"text": render_card(question, answer)} for question, answer in page)
+        return True
+
+    def on_scroll(self, instance, scroll_y):
+        if scroll_y <= self.LOAD_MORE_AT:
+            self.load_next_page()
+
+
+# A popup that is built once and opened again for every use. Reopening it
+# while its last dismiss is still fading out would be ignored by Kivy, so
+# that fade is cancelled instead.
+class PooledPopup(Popup):
+
+    def open(self, *args, **kwargs):
+        if self._is_open:
+            Animation.cancel_all(self, "_anim_alpha")
+            self._anim_alpha = 1.
+            return
+        super().open(*args, **kwargs)
+
+
+class FlashcardApp(App):
+    # deck is the FlashcardDeck to work on; by default the one saved in the
+    # app's data directory
+    def __init__(self, deck=None, **kwargs):
+        super().__init__(**kwargs)
+        self.deck = deck
+
+    # options per multiple choice question
+    CHOICES = 4
+    # F9 starts and stops a cProfile capture, saved in the app's data directory
+    PROFILE_KEY = 290
+    # how often the FLASHCARD_METRICS file is rewritten, in seconds
+    METRICS_INTERVAL = 10
+    # capacity of the deck saved in the app's data directory, big enough for
+    # the large files DeckImport streams in; FLASHCARD_MAX_SIZE overrides it
+    MAX_DECK_SIZE = 100000
+
+    def build(self):
+        # with FLASHCARD_METRICS=<file> the deck and the handlers below are
+        # timed (see metrics.py); this has to happen before any handler is bound
+        self.metrics_path = os.environ.get("FLASHCARD_METRICS")
+        if self.metrics_path:
+            metrics.enable()
+            Clock.schedule_interval(lambda dt: metrics.METRICS.write(self.metrics_path), self.METRICS_INTERVAL)
+        from kivy.core.window import Window
+        Window.bind(on_key_down=self.on_key_down)
+
+        # cards are kept in the app's data directory between runs
+        if self.deck is None:
+            storage = SQLiteStore(os.path.join(self.user_data_dir, "flashcards.db"))
+            max_size = int(os.environ.get("FLASHCARD_MAX_SIZE", self.MAX_DECK_SIZE))
+            self.deck = FlashcardDeck(max_size=max_size, storage=storage)
+
+        # every screen and popup is built here once; navigating only switches
+        # screens and reopens popups, so no widgets are created while the app runs
+        self.screens = ScreenManager(transition=NoTransition())
+        self.screens.add_widget(self.build_menu())
+        self.forms = {}
+        self.build_form("add_flashcard", ["Enter the question", "Enter the answer"],
+                        "Submit Flashcard", self.add_flashcard)
+        self.build_form("update_flashcard", ["Enter the question to update", "Enter the new answer"],
+                        "Update Flashcard", self.update_flashcard)
+        self.build_form("delete_flashcard", ["Enter the question to delete"],
+                        "Delete Flashcard", self.delete_flashcard)
+        self.build_form("add_deck", ["Enter flashcards in format Q: A (each flashcard on a new line)"],
+                        "Submit Deck", self.add_deck, multiline=True)
+        self.build_form("upload_deck", ["Enter the JSON file path"],
+                        "Upload Deck", self.upload_deck)
+
+        self.build_message_popup()
+        self.build_view_popup()
+        self.build_upload_popup()
+        self.build_level_popup()
+        self.build_quiz_popup()
+        return self.screens
+
+    # helper funtions
+    def build_menu(self):
+        self.main_layout = BoxLayout(orientation="vertical", padding=10)
+
+        # define buttons 
+        self.add_button = Button(text="Add Flashcard", on_press=self.show_add_flashcard)
+        self.update_button = Button(text="Update Flashcard", on_press=self.show_update_flashcard)
+        self.delete_button = Button(text="Delete Flashcard", on_press=self.show_delete_flashcard)
+        self.delete_deck_button = Button(text="Delete Deck", on_press=self.delete_deck)
+        self.view_button = Button(text="View Deck", on_press=self.view_deck)
+        self.add_deck_button = Button(text="Add Deck", on_press=self.show_add_deck)
+        self.upload_button = Button(text="Upload Deck (from JSON)", on_press=self.show_upload_deck)
+        self.quiz_button = Button(text="Take Quiz", on_press=self.quiz)
+        self.deck_size_button = Button(text="View Deck Size", on_press=self.view_deck_size)
+        self.exit_button = Button(text="Exit", on_press=self.exit_app)
+
+        # add buttons 
+        self.main_layout.add_widget(self.add_button)
+        self.main_layout.add_widget(self.add_deck_button)
+        self.main_layout.add_widget(self.upload_button)
+        self.main_layout.add_widget(self.view_button)
+        self.main_layout.add_widget(self.deck_size_button)
+        self.main_layout.add_widget(self.update_button)
+        self.main_layout.add_widget(self.delete_button)
+        self.main_layout.add_widget(self.delete_deck_button)
+        self.main_layout.add_widget(self.quiz_button)
+        self.main_layout.add_widget(self.exit_button)
+
+        menu = Screen(name="menu")
+        menu.add_widget(self.main_layout)
+        return menu
+
+    # a screen of text inputs with a submit and a back button
+    def build_form(self, name, hints, submit_text, on_submit, multiline=False):
+        layout = BoxLayout(orientation="vertical", padding=10)
+        inputs = [TextInput(hint_text=hint, multiline=multiline) for hint in hints]
+        for text_input in inputs:
+            layout.add_widget(text_input)
+        layout.add_widget(Button(text=submit_text, on_press=on_submit))
+        layout.add_widget(Button(text="Back", on_press=self.reset_layout))
+
+        screen = Screen(name=name)
+        screen.add_widget(layout)
+        self.screens.add_widget(screen)
+        self.forms[name] = inputs
+
+    # switches to a form and returns its inputs
+    def show_form(self, name):
+        self.screens.current = name
+        return self.forms[name]
+
+    def reset_layout(self, *args):
+        self.screens.current = "menu"
+
+    def build_message_popup(self):
+        popup_layout = BoxLayout(orientation='vertical', padding=10)
+        self.message_label = Label()
+        dismiss_button = Button(text="OK", size_hint=(1, 0.2))
+        popup_layout.add_widget(self.message_label)
+        popup_layout.add_widget(dismiss_button)
+
+        self.message_popup = PooledPopup(title="Message", content=popup_layout, size_hint=(0.75, 0.5))
+        dismiss_button.bind(on_press=self.message_popup.dismiss)
+
+    def build_view_popup(self):
+        layout = BoxLayout(orientation='vertical', padding=10, spacing=10)
+        self.deck_view = DeckView()
+        self.empty_deck_label = Label(text="No cards to show")
+        layout.add_widget(self.deck_view)
+
+        close_button = Button(text="Close", size_hint=(1, 0.1))
+        layout.add_widget(close_button)
+
+        self.view_popup = PooledPopup(title="View Deck", content=layout, size_hint=(0.9, 0.9))
+        close_button.bind(on_press=self.view_popup.dismiss)
+
+    def build_upload_popup(self):
+        layout = BoxLayout(orientation='vertical', padding=10, spacing=10)
+        self.upload_status_label = Label()
+        self.upload_progress_bar = ProgressBar(max=100)
+        self.upload_cancel_button = Button(text="Cancel", size_hint=(1, 0.3))
+        layout.add_widget(self.upload_status_label)
+        layout.add_widget(self.upload_progress_bar)
+        layout.add_widget(self.upload_cancel_button)
+        self.upload_popup = PooledPopup(title="Uploading Deck", content=layout, size_hint=(0.75, 0.5),
+                                        auto_dismiss=False)
+        self.upload_cancel_button.bind(on_press=lambda instance: self.deck_import.cancel())
+        self.deck_import = None
+
+    def build_level_popup(self):
+        layout = BoxLayout(orientation='vertical', padding=10, spacing=10)
+
+        beginner_button = Button(text="Beginner", size_hint=(1, 0.2))
+        mid_button = Button(text="Mid", size_hint=(1, 0.2))
+        pro_button = Button(text="Pro", size_hint=(1, 0.2))
+
+        self.choices_toggle = ToggleButton(text="Multiple choice", size_hint=(1, 0.2))
+
+        layout.add_widget(beginner_button)
+        layout.add_widget(mid_button)
+        layout.add_widget(pro_button)
+        layout.add_widget(self.choices_toggle)
+
+        self.level_popup = PooledPopup(title="Choose Quiz Level", content=layout, size_hint=(0.75, 0.6))
+
+        beginner_button.bind(on_press=lambda instance: self.start_quiz('beginner', self.level_popup))
+        mid_button.bind(on_press=lambda instance: self.start_quiz('mid', self.level_popup))
+        pro_button.bind(on_press=lambda instance: self.start_quiz('pro', self.level_popup))
+
+    # one popup serves every question of every quiz; show_quiz only changes its text.
+    # Typed quizzes show the answer input, multiple choice ones a button per option
+    def build_quiz_popup(self):
+        layout = BoxLayout(orientation='vertical')
+        self.question_label = Label()
+        self.typed_answer = BoxLayout(orientation='vertical', size_hint=(1, 0.6))
+        self.quiz_answer_input = TextInput(hint_text="Enter your answer", multiline=False)
+        submit_button = Button(text="Submit Answer", size_hint=(1, 0.4))
+        submit_button.bind(on_press=self.submit_answer)
+        self.typed_answer.add_widget(self.quiz_answer_input)
+        self.typed_answer.add_widget(submit_button)
+
+        self.choice_buttons = [Button(on_press=self.submit_choice) for _ in range(self.CHOICES)]
+        self.choice_answer = BoxLayout(orientation='vertical', size_hint=(1, 0.6))
+        for button in self.choice_buttons:
+            self.choice_answer.add_widget(button)
+
+        layout.add_widget(self.question_label)
+        layout.add_widget(self.typed_answer)
+
+        self.quiz_popup = PooledPopup(content=layout, size_hint=(0.75, 0.5))
+        self.session = None
+
+
+    # Show functions
+    def show_add_flashcard(self, instance):
+        self.question_input, self.answer_input = self.show_form("add_flashcard")
+
+    def show_update_flashcard(self, instance):
+        self.question_input, self.answer_input = self.show_form("update_flashcard")
+
+    def show_delete_flashcard(self, instance):
+        self.question_input, = self.show_form("delete_flashcard")
+
+    def show_add_deck(self, instance):
+        self.add_deck_input, = self.show_form("add_deck")
+
+    def show_upload_deck(self, instance):
+        self.filepath_input, = self.show_form("upload_deck")
+    
+    def show_popup(self, message):
+        self.message_label.text = message
+        self.message_popup.open()
+
+
+   
+
+    # Do funtions
+    def add_flashcard(self, instance):
+        question = self.question_input.text
+        answer = self.answer_input.text
+        if question and answer:
+            result = self.deck.add_flashcard(question, answer)
+            self.show_popup(result)
+            self.question_input.text = ""
+            self.answer_input.text = ""
+        else:
+            result = self.deck.add_flashcard(question,answer)
+            self.show_popup(result)
+            return
+
+        # add_deck GUI
+    # the text is parsed on a worker thread (see parse_cards) and the cards
+    # are added back on the Kivy thread
+    def add_deck(self, instance):
+        deck_data = self.add_deck_input.text
+        if not deck_data.strip():
+            self.show_popup("No flashcards entered.")
+            return
+        threading.Thread(target=self.parse_pasted_deck, args=(deck_data,), daemon=True).start()
+
+    def parse_pasted_deck(self, deck_data):
+        cards, errors = parse_cards(deck_data)
+        Clock.schedule_once(lambda dt: self.apply_pasted_deck(cards, errors))
+
+    def apply_pasted_deck(self, cards, errors):
+        result = self.deck.add_deck(cards) if cards else "No flashcards added."
+        if errors:
+            lines = "\n".join(f"Line {number}: {message}" for number, message in errors[:5])
+            more = f"\n... and {len(errors) - 5} more" if len(errors) > 5 else ""
+            result = f"{result}\nSkipped {len(errors)} lines:\n{lines}{more}"
+        else:
+            self.add_deck_input.text = ""
+        self.show_popup(result)
+
+
+        # update_flashcard gui 
+    def update_flashcard(self, instance):
+        question = self.question_input.text
+        new_answer = self.answer_input.text
+        if question and new_answer:
+            result = self.deck.update_flashcard(question, new_answer)
+            self.show_popup(result)
+            self.question_input.text = ""
+            self.answer_input.text = ""
+        
+        else:
+            result = self.deck.update_flashcard(question,new_answer)
+            self.show_popup(result)
+            return
+        # delete_flashcard GUI
+    def delete_flashcard(self, instance):
+        question = self.question_input.text
+        if question:
+            result = self.deck.delete_card(question)
+            self.show_popup(result)
+            self.question_input.text = ""
+                
+        else:
+            result = self.deck.delete_card(question)
+            self.show_popup(result)
+            return
+        # delete_deck GUI
+    def delete_deck(self, instance):
+        result = self.deck.delete_deck()
+        self.show_popup(result)
+
+   # cards are shown in a RecycleView, which only creates widgets for the visible rows
+    def view_deck(self,instance):
+        layout = self.view_popup.content
+        shown = self.empty_deck_label if self.deck.card_count == 0 else self.deck_view
+        if shown.parent is None:
+            layout.remove_widget(self.deck_view if shown is self.empty_deck_label else self.empty_deck_label)
+            layout.add_widget(shown, index=1)
+        if shown is self.deck_view:
+            self.deck_view.show(self.deck.iter_pages())
+        self.view_popup.open()
+
+
+
+    # the file is read in the background (see DeckImport) behind a progress popup
+    def upload_deck(self, instance):
+        filepath = self.filepath_input.text
+        if not filepath:
+            self.show_popup("Error: No file path provided.")
+            self.reset_layout(instance)
+            return
+
+        self.upload_status_label.text = f"Reading {filepath}"
+        self.upload_progress_bar.value = 0
+
+        def on_progress(bytes_read, total_bytes):
+            self.upload_progress_bar.value = 100 * bytes_read / total_bytes if total_bytes else 100
+            self.upload_status_label.text = f"Read {bytes_read // 1024} KB of {total_bytes // 1024} KB"
+
+        def on_done(result):
+            self.upload_popup.dismiss()
+            if "Deck added!" in result:
+                self.show_popup(f"Deck loaded successfully from {filepath}\n \n Added cards: {self.deck.card_count}")
+            else:
+                self.show_popup(f"Error: {result}")
+
+        self.deck_import = DeckImport(self.deck, filepath, on_progress, on_done)
+        self.upload_popup.open()
+        self.deck_import.start()
+        self.reset_layout(instance)
+    
+
+    
+
+    def view_deck_size(self, instance):
+        size = self.deck.deck_size()
+        self.show_popup(f"Deck size: {size}")
+
+    def exit_app(self, instance):
+        self.stop()
+
+    def on_stop(self):
+        self.deck.close()
+        if self.metrics_path:
+            metrics.METRICS.write(self.metrics_path)
+
+    def on_key_down(self, window, key, *args):
+        if key != self.PROFILE_KEY:
+            return False
+        if metrics.profiling():
+            path = os.path.join(self.user_data_dir, time.strftime("profile-%Y%m%d-%H%M%S.prof"))
+            metrics.stop_profile(path)
+            self.show_popup(f"Profile saved to {path}")
+        else:
+            metrics.start_profile()
+            self.show_popup("Profiling... press F9 again to stop")
+        return True
+
+    def quiz(self, instance):
+        self.level_popup.open()
+
+    # the quiz runs as a QuizSession (see session.py): Clock ends it at the
+    # time limit even if no answer comes in, and its callbacks drive the popup
+    def start_quiz(self, level, quiz_popup):
+        quiz_popup.dismiss()
+
+        choices = self.CHOICES if self.choices_toggle.state == "down" else 0
+        result = self.deck.quiz_session(level, schedule=Clock.schedule_once, scheduled=True, choices=choices,
+                                        on_question=self.show_quiz, on_finish=self.end_quiz)
+        if isinstance(result, str):
+            self.show_popup(result)
+        else:
+            self.session = result
+            self.session.start()
+
+    def show_quiz(self, session):
+        number = session.index + 1
+        self.question_label.text = f"Question {number}: {session.question}"
+        self.quiz_answer_input.text = ""
+        options = session.options
+        shown, hidden = (self.choice_answer, self.typed_answer) if options else (self.typed_answer, self.choice_answer)
+        if shown.parent is None:
+            layout = self.quiz_popup.content
+            layout.remove_widget(hidden)
+            layout.add_widget(shown)
+        for index, button in enumerate(self.choice_buttons):
+            button.text = options[index] if options and index < len(options) else ""
+            button.disabled = not button.text
+        self.quiz_popup.title = f"Quiz - Question {number}"
+        self.quiz_popup.open()
+
+    def end_quiz(self, session):
+        self.quiz_popup.dismiss()
+        message = f"Quiz completed! Your score: {session.score}/{len(session)}"
+        if session.reason == "timeout":
+            message = f"Time's up! Your score: {session.score}/{len(session)}"
+        self.show_popup(message)
+
+    def submit_answer(self, instance):
+        self.session.answer(self.quiz_answer_input.text)
+
+    def submit_choice(self, button):
+        self.session.answer(button.text)
+
+
+metrics.register(FlashcardApp, "flashcard_app_handler_seconds",
+                 ("add_flashcard", "update_flashcard", "delete_flashcard", "delete_deck", "add_deck",
+                  "apply_pasted_deck", "view_deck", "upload_deck", "start_quiz", "submit_answer",
+                  "submit_choice"),
+                 label="handler")
+metrics.register(DeckView, "flashcard_app_handler_seconds", ("show", "load_next_page"), label="handler")
+metrics.register(DeckImport, "flashcard_app_handler_seconds", ("_apply",), label="handler")
+metrics.METRICS.set_gauge("flashcard_app_import_seconds", time.perf_counter() - _IMPORT_STARTED)
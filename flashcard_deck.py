@@ -0,0 +1,858 @@
+import random
+import json
+import os
+import re
+import codecs
+import itertools
+import csv
+import io
+import metrics
+from storage import IndexedStore, reservoir_sample, is_binary_deck, write_binary_deck, MappedStore
+from scheduler import Scheduler
+from session import QuizSession, ResponseTimes
+from search import SearchIndex, DuplicateIndex, TagIndex, question_key
+from answers import is_correct_answer, join_answers, DistractorIndex, ANSWER_SEPARATOR
+from render import RenderCache, render_card, write_cards
+
+# The deck engine. Nothing here imports Kivy, so scripts and tests can use
+# FlashcardDeck without starting a windowing stack; the GUI is in flashcard_app.py
+
+
+# matches one complete JSON string literal (quotes included)
+_JSON_STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL)
+_JSON_WHITESPACE = " \t\n\r"
+
+
+# Reads a JSON object of "question": "answer" pairs one entry at a time,
+# so only the current chunk and entry are ever held in memory.
+# A value may also be a list of accepted answers. Entries whose key or value
+# is not a non-empty string (or list of them) are counted in `skipped`
+# instead of failing the whole file.
+class JSONCardStream:
+
+    def __init__(self, file, chunk_size=65536):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.bytes_read = 0
+        self.skipped = 0
+
+    def __iter__(self):
+        self._expect("{")
+        if self._peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key_text = self._read_value()
+            self._expect(":")
+            value_text = self._read_value()
+            card = self._decode_entry(key_text, value_text)
+            if card is None:
+                self.skipped += 1
+            else:
+                yield card
+            if self._peek() == ",":
+                self.pos += 1
+                continue
+            self._expect("}")
+            return
+
+    # Helper functions
+
+    # drop the consumed part of the buffer and pull in one more chunk
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        self.bytes_read += len(chunk)
+        self.buffer = self.buffer[self.pos:] + self.decoder.decode(chunk, final=not chunk)
+        self.pos = 0
+        if not chunk:
+            self.eof = True
+        return True
+
+    # next non-whitespace character, or "" at the end of the file
+    def _peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _JSON_WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self.buffer, self.pos)
+        self.pos += 1
+
+    # returns the raw text of the next value without decoding it
+    def _read_value(self):
+        first = self._peek()
+        if first == "":
+            raise json.JSONDecodeError("Expecting value", self.buffer, self.pos)
+        if first == '"':
+            while True:
+                match = _JSON_STRING.match(self.buffer, self.pos)
+                if match:
+                    self.pos = match.end()
+                    return match.group()
+                if not self._fill():
+                    raise json.JSONDecodeError("Unterminated string", self.buffer, self.pos)
+
+        # numbers, literals and nested values: scan up to the next top level ',' or '}'
+        offset = 0
+        depth = 0
+        in_string = False
+        escaped = False
+        while True:
+            if self.pos + offset >= len(self.buffer):
+                if not self._fill():
+                    raise json.JSONDecodeError("Unterminated value", self.buffer, self.pos)
+                continue
+            char = self.buffer[self.pos + offset]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char in "[{":
+                depth += 1
+            elif char in "]}":
+                if depth == 0:
+                    break
+                depth -= 1
+            elif char == "," and depth == 0:
+                break
+            offset += 1
+        text = self.buffer[self.pos:self.pos + offset]
+        self.pos += offset
+        return text
+
+    @staticmethod
+    def _decode_entry(key_text, value_text):
+        try:
+            return _read_entry(json.loads(key_text), json.loads(value_text))
+        except json.JSONDecodeError:
+            return None
+
+
+# one decoded "question": answer entry of a deck file as a card, or None when
+# it is malformed: the question must be a non-empty string and the answer a
+# non-empty string or list of strings
+def _read_entry(question, answer):
+    if isinstance(answer, list) and all(isinstance(part, str) for part in answer):
+        answer = join_answers(answer)
+    if not isinstance(question, str) or not isinstance(answer, str):
+        return None
+    if question.strip() == "" or answer.strip() == "":
+        return None
+    return question, answer
+
+
+# a decoded JSON object, kept as its (key, value) pairs so that repeated
+# questions reach add_cards in file order, as they do when streaming
+class _JSONPairs(list):
+    pass
+
+
+# Parses pasted cards, one per line. format "text" splits each line on the
+# first separator only, so answers may contain it ("Time?: 10:30"); "csv" and
+# "tsv" read question, answer columns, with any further columns taken as
+# more accepted answers. Blank lines are ignored and bad lines are collected
+# instead of stopping the parse. Returns (cards, errors), errors being
+# (line number, message) pairs.
+def parse_cards(text, separator=":", format="text"):
+    cards = []
+    errors = []
+    if format == "text":
+        for number, line in enumerate(text.splitlines(), 1):
+            question, found, answer = line.partition(separator)
+            question = question.strip()
+            answer = answer.strip()
+            if question and answer:
+                cards.append((question, answer))
+            elif found or question:
+                errors.append((number, f"expected 'question{separator} answer'"))
+        return cards, errors
+
+    if format not in ("csv", "tsv"):
+        raise ValueError(f"Unknown format '{format}'")
+    rows = csv.reader(io.StringIO(text), delimiter="," if format == "csv" else "\t")
+    for row in rows:
+        fields = [field.strip() for field in row]
+        if not any(fields):
+            continue
+        answers = [answer for answer in fields[1:] if answer]
+        if fields[0] and answers:
+            cards.append((fields[0], join_answers(answers) if len(answers) > 1 else answers[0]))
+        else:
+            errors.append((rows.line_num, "expected a question and an answer column"))
+    return cards, errors
+
+
+# Parses a whole deck file without touching any deck, so it can run on a
+# worker thread and the caller can add the cards in one step afterwards.
+# progress(bytes_read, total_bytes) is called and cancelled() checked every
+# batch_size cards. Returns (cards, skipped), or None when cancelled.
+# With on_batch, each batch is handed to it as soon as it is read instead of
+# being kept, and cards comes back empty.
+def read_deck_file(filepath, batch_size=1000, progress=None, cancelled=None, on_batch=None):
+    total_bytes = os.path.getsize(filepath)
+    cards = []
+    batch = []
+    with open(filepath, "rb") as file:
+        reader = JSONCardStream(file)
+        for card in reader:
+            batch.append(card)
+            if len(batch) == batch_size:
+                if cancelled and cancelled():
+                    return None
+                if on_batch:
+                    on_batch(batch)
+                else:
+                    cards.extend(batch)
+                batch = []
+                if progress:
+                    progress(reader.bytes_read, total_bytes)
+    if batch:
+        if on_batch:
+            on_batch(batch)
+        else:
+            cards.extend(batch)
+    if progress:
+        progress(reader.bytes_read, total_bytes)
+    return cards, reader.skipped
+
+
+# Adds an import to a deck a batch at a time, so a large file can go in over
+# several frames, and remembers which questions it added: rollback() takes
+# them out again, so a cancelled or failed import leaves the deck as it was.
+# Duplicates are skipped, as add_deck does by default.
+class StagedImport:
+
+    def __init__(self, deck):
+        self.deck = deck
+        self.added = []
+        self.rejected = 0
+
+    def add(self, cards):
+        new = [question for question in dict.fromkeys(question for question, _ in cards)
+               if question not in self.deck.deck]
+        self.rejected += self.deck.add_cards(cards)["rejected"]
+        self.added.extend(question for question in new if question in self.deck.deck)
+
+    # keeps the added cards; returns the message add_deck would give
+    def commit(self, skipped=0):
+        self.added = []
+        if self.rejected and self.deck.card_count >= self.deck.max_size:
+            return f"Deck size cannot exceed {self.deck.max_size} flashcards."
+        if skipped:
+            return f"Deck added! Skipped {skipped} malformed entries."
+        return "Deck added!"
+
+    def rollback(self):
+        self.deck.delete_cards(self.added)
+        self.added = []
+
+
+    # Class for flashcards and their managemanet
+class FlashcardDeck:
+
+    MAX_DECK_SIZE = 150
+    QUIZ_SIZES = {"beginner": 5, "mid": 10, "pro": 15}
+    QUIZ_TIME_LIMIT = 60
+
+   # initalize flashcard deck as a dictionary - flash cards thhemselves as key,value pairs
+   # max_size is the capacity of this deck, MAX_DECK_SIZE unless given
+   # storage is where the cards live (see storage.py), in memory by default
+   # seed makes quiz sampling reproducible
+    def __init__(self, max_size=MAX_DECK_SIZE, storage=None, seed=None):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.deck = IndexedStore() if storage is None else storage
+        self.random = random.Random(seed)
+        self.scheduler = Scheduler()
+        # stores that save schedules (SQLiteStore) bring back the reviews of
+        # earlier runs, so cards come due across restarts
+        if hasattr(self.deck, "schedules"):
+            for question, card in self.deck.schedules():
+                self.scheduler.restore(question, card)
+        self.response_times = ResponseTimes()
+        self.tags = TagIndex()
+        self._search_index = None
+        self._duplicates = None
+        self._distractors = None
+        self._rendered = None
+
+     # will be called when viewing the cards.   
+     # the text is cached and only the changed cards are rendered again (see render.py),
+     # except for stores with their own page(), which are rendered as they are
+    def __str__(self):
+        if not self.deck:
+            return "No cards to show"
+        if hasattr(self.deck, "page"):
+            return "\n".join([render_card(question, answer) for question, answer in self.deck.items()])
+        return self._renderer().text()
+    
+
+    @property
+    def card_count(self):
+        return len(self.deck)
+
+    # Helper functions
+
+    def _is_deck_full(self):
+        return len(self.deck) >= self.max_size
+    
+
+    def _flashcard_exists(self,question):
+        return question in self.deck
+
+    # the question already in the deck that `question` duplicates, ignoring
+    # case, spacing and punctuation (see search.question_key), or None
+    def _find_duplicate(self, question):
+        return self._key_lookup()(question_key(question))
+
+    # key -> duplicate question or None. Stores with their own find_key
+    # (SQLite, binary and journaled decks) answer from an index on disk, so
+    # the first add to a large deck does not read every question; otherwise
+    # an index is built from the deck on first use, then kept up to date by
+    # the hooks below
+    def _key_lookup(self):
+        if self._duplicates is None and hasattr(self.deck, "find_key"):
+            return self.deck.find_key
+        if self._duplicates is None:
+            self._duplicates = DuplicateIndex(self.deck)
+        return self._duplicates.find
+
+    # key -> duplicate question for the keys that have one; stores with
+    # find_keys look a whole batch up at once
+    def _find_duplicates(self, keys):
+        if self._duplicates is None and hasattr(self.deck, "find_keys"):
+            return self.deck.find_keys(keys)
+        find = self._key_lookup()
+        found = {}
+        for key in keys:
+            question = find(key)
+            if question is not None:
+                found[key] = question
+        return found
+
+    # The render cache keeps cards in the order they were added, updated in
+    # place and deleted, which is the order of the in-memory and SQLite
+    # stores. Stores with page() (binary and journaled decks) order cards by
+    # their file and read pages from it directly, so they are never cached:
+    # a cache would be a second copy of a deck that is meant to stay on disk.
+    def _renderer(self):
+        if self._rendered is None:
+            self._rendered = RenderCache(self.deck.items())
+        return self._rendered
+    
+
+    def _is_valid_card(self, question, answer):
+        return (isinstance(question, str) and isinstance(answer, str)
+                and question.strip() != "" and answer.strip() != "")
+
+
+    # a list of accepted answers as one stored answer; anything else is
+    # returned unchanged for the caller to validate
+    @staticmethod
+    def _answer_text(answer):
+        if isinstance(answer, list) and all(isinstance(part, str) for part in answer):
+            return join_answers(answer)
+        return answer
+
+
+    def _handle_existing_flashcard(self,question):
+        return f"Flashcard with question '{question}' already exists."
+
+    # every change to the cards goes through these so the indexes kept
+    # alongside the deck stay in step with it
+    def _card_added(self, question, answer, key=None):
+        if self._duplicates is not None:
+            self._duplicates.add(question, key)
+        if self._search_index is not None:
+            self._search_index.add(question, answer)
+        if self._distractors is not None:
+            self._distractors.add(answer)
+        if self._rendered is not None:
+            self._rendered.add(question, answer)
+
+    def _card_updated(self, question, old_answer, new_answer):
+        if self._search_index is not None:
+            self._search_index.update(question, old_answer, new_answer)
+        if self._distractors is not None:
+            self._distractors.remove(old_answer)
+            self._distractors.add(new_answer)
+        if self._rendered is not None:
+            self._rendered.update(question, new_answer)
+
+    def _card_removed(self, question, answer):
+        self.scheduler.forget(question)
+        self.response_times.forget(question)
+        self.tags.remove(question)
+        if self._duplicates is not None:
+            self._duplicates.remove(question)
+        if self._search_index is not None:
+            self._search_index.remove(question, answer)
+        if self._distractors is not None:
+            self._distractors.remove(answer)
+        if self._rendered is not None:
+            self._rendered.remove(question)
+
+    # _card_removed for many cards, except that the search index drops them
+    # all in one pass (see SearchIndex.remove_many)
+    def _cards_removed(self, cards):
+        search_index, self._search_index = self._search_index, None
+        for question, answer in cards:
+            self._card_removed(question, answer)
+        self._search_index = search_index
+        if search_index is not None:
+            search_index.remove_many(cards)
+
+    def _deck_cleared(self):
+        self.scheduler.clear()
+        self.response_times.clear()
+        self.tags.clear()
+        if self._duplicates is not None:
+            self._duplicates.clear()
+        if self._search_index is not None:
+            self._search_index.clear()
+        if self._distractors is not None:
+            self._distractors.clear()
+        if self._rendered is not None:
+            self._rendered.clear()
+        
+    
+
+    # Main functions 
+
+    # new_answer can be a list of accepted answers, as in add_flashcard
+    def update_flashcard(self,question,new_answer):
+        new_answer = self._answer_text(new_answer)
+        if not isinstance(question, str) or not isinstance(new_answer, str):
+            return "Invalid question and answer pairing"
+        if self._flashcard_exists(question):
+            if (question.isspace() or new_answer.strip() == ""): 
+                return "Invalid question and answer pairing"
+            old_answer = self.deck[question]
+            self.deck[question] = new_answer
+            self._card_updated(question, old_answer, new_answer)
+            return f"Flashcard '{question}' updated!"
+        else:
+            return f"Flashcard '{question}' does not exist"
+                
+
+    # will add a single card
+    # answer can be a list of accepted answers
+    def add_flashcard(self,question,answer):
+        answer = self._answer_text(answer)
+        if not isinstance(question, str) or not isinstance(answer, str):
+            return "Invalid question and answer pairing"
+        existing = self._find_duplicate(question)
+        if existing is not None:
+            return self._handle_existing_flashcard(existing)
+        if self._is_deck_full():
+            return "Deck size reached"
+        if (question.isspace() or answer.isspace()): 
+            return "Invalid question and answer pairing"
+        if  (question == "" or answer == ""): 
+            return "No question or answer entered"
+        self.deck[question] = answer
+        self._card_added(question, answer)
+        return f"Flashcard {question} added"
+    
+
+    # will add an entire deck
+    # policy decides what happens to cards that duplicate one in the deck (see add_cards)
+    def add_deck(self,new_flashcards, policy="skip"):
+        counts = self.add_cards(new_flashcards, policy)
+        if counts["rejected"] and self._is_deck_full():
+            return f"Deck size cannot exceed {self.max_size} flashcards."
+        return "Deck added!"
+
+    # bulk insert: the remaining room is computed once and the admitted cards
+    # are written in one update. Takes a dict or an iterable of (question, answer)
+    # pairs. A card whose question duplicates one in the deck or earlier in
+    # the batch (see _find_duplicate) is a collision, handled by policy:
+    #   "skip"      - keep the existing card
+    #   "overwrite" - give the existing card the new answer
+    #   "keep-both" - add it anyway, unless the question text is identical
+    # Returns how many cards were added, updated, skipped as duplicates or
+    # rejected (blank, or no room left), and the (question, existing question)
+    # collisions
+    def add_cards(self, new_flashcards, policy="skip"):
+        if policy not in ("skip", "overwrite", "keep-both"):
+            raise ValueError(f"Unknown duplicate policy '{policy}'")
+        if hasattr(new_flashcards, "items"):
+            new_flashcards = new_flashcards.items()
+        counts = {"added": 0, "updated": 0, "duplicate": 0, "rejected": 0, "collisions": []}
+        room = self.max_size - len(self.deck)
+        cards = []
+        for question, answer in new_flashcards:
+            answer = self._answer_text(answer)
+            if not self._is_valid_card(question, answer):
+                counts["rejected"] += 1
+                continue
+            cards.append((question, answer, question_key(question)))
+        found = self._find_duplicates([key for _, _, key in cards])
+        admitted = {}
+        admitted_keys = {}
+        keys = []
+        updates = {}
+        for question, answer, key in cards:
+            existing = found.get(key) or admitted_keys.get(key)
+            if existing is not None:
+                counts["collisions"].append((question, existing))
+                if policy == "overwrite":
+                    if existing in admitted:
+                        admitted[existing] = answer
+                    else:
+                        updates[existing] = answer
+                    continue
+                if policy == "skip" or question in admitted or question in self.deck:
+                    counts["duplicate"] += 1
+                    continue
+            if len(admitted) >= room:
+                counts["rejected"] += 1
+                continue
+            admitted[question] = answer
+            admitted_keys.setdefault(key, question)
+            keys.append(key)
+
+        self.deck.update(admitted)
+        for (question, answer), key in zip(admitted.items(), keys):
+            self._card_added(question, answer, key)
+        for question, answer in updates.items():
+            old_answer = self.deck[question]
+            self.deck[question] = answer
+            self._card_updated(question, old_answer, answer)
+        counts["added"] = len(admitted)
+        counts["updated"] = len(updates)
+        return counts
+    
+   
+
+    
+
+
+    # upload a .json file containing the cards, or a binary deck (see export_deck)
+    # stream=True parses the file entry by entry and adds cards in batches of
+    # batch_size; progress(bytes_read, total_bytes) is called after every batch
+    # Either way the file must be one object; malformed entries are skipped
+    # and counted, and a repeated question is a duplicate handled by policy
+    def upload_deck(self, filepath, stream=False, batch_size=1000, progress=None, policy="skip"):
+        if is_binary_deck(filepath):
+            return self._binary_upload(filepath, policy)
+        if stream:
+            return self._stream_upload(filepath, batch_size, progress, policy)
+        try:
+            with open(filepath, 'r', encoding="utf-8") as file:
+                data = json.load(file, object_pairs_hook=_JSONPairs)
+        except FileNotFoundError:
+            return "File not found. Please check the file path and try again."
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return "Invalid JSON format. Please check the file content."
+        if isinstance(data, dict):
+            data = data.items()
+        elif not isinstance(data, _JSONPairs):
+            return "Invalid JSON format. Please check the file content."
+        cards = [_read_entry(question, answer) for question, answer in data]
+        result = self.add_deck([card for card in cards if card is not None], policy)
+        skipped = cards.count(None)
+        if result == "Deck added!" and skipped:
+            return f"Deck added! Skipped {skipped} malformed entries."
+        return result
+
+    def _stream_upload(self, filepath, batch_size, progress, policy):
+        try:
+            total_bytes = os.path.getsize(filepath)
+            with open(filepath, "rb") as file:
+                reader = JSONCardStream(file)
+                batch = []
+                for card in reader:
+                    batch.append(card)
+                    if len(batch) >= batch_size:
+                        result = self.add_deck(batch, policy)
+                        if result != "Deck added!":
+                            return result
+                        batch = []
+                        if progress:
+                            progress(reader.bytes_read, total_bytes)
+                result = self.add_deck(batch, policy)
+                if progress:
+                    progress(reader.bytes_read, total_bytes)
+        except FileNotFoundError:
+            return "File not found. Please check the file path and try again."
+        except json.JSONDecodeError:
+            return "Invalid JSON format. Please check the file content."
+        if result == "Deck added!" and reader.skipped:
+            return f"Deck added! Skipped {reader.skipped} malformed entries."
+        return result
+
+    def _binary_upload(self, filepath, policy):
+        try:
+            with MappedStore(filepath) as cards:
+                return self.add_deck(cards, policy)
+        except ValueError as error:
+            return f"Invalid deck file: {error}"
+
+    # saves the deck as a binary deck file, which opens again without being
+    # parsed: FlashcardDeck(storage=MappedStore(filepath)) maps it and reads
+    # only the cards a quiz or a page asks for
+    def export_deck(self, filepath):
+        try:
+            count = write_binary_deck(filepath, self.deck.items())
+        except OSError as error:
+            return f"Could not export the deck: {error.strerror}"
+        return f"Deck exported! {count} cards written."
+
+    # saves the deck as text, one "Q: ... - A: ..." line per card, written a
+    # chunk at a time from the render cache (or card by card from stores
+    # with page())
+    def export_text(self, filepath):
+        temporary = f"{filepath}.tmp"
+        try:
+            with open(temporary, "w", encoding="utf-8") as file:
+                if hasattr(self.deck, "page"):
+                    count = write_cards(file, self.deck.items())
+                else:
+                    count = self._renderer().write(file)
+            os.replace(temporary, filepath)
+        except OSError as error:
+            return f"Could not export the deck: {error.strerror}"
+        return f"Deck exported! {count} cards written."
+
+    # deletes card by question
+    def delete_card(self,question):
+        if question in self.deck:
+            answer = self.deck[question]
+            del self.deck[question]
+            self._card_removed(question, answer)
+            return f"Flashcard '{question}' deleted"
+        if question.isspace() or question == "":
+            return "Invalid question format"
+        else:
+            return f"Flashcard '{question}' not found in deck"
+    
+    
+    # deletes many cards at once, for undoing an import; stores with
+    # delete_many (SQLiteStore) do it in one transaction instead of one per
+    # card. Returns how many were deleted
+    def delete_cards(self, questions):
+        if hasattr(self.deck, "delete_many"):
+            deleted = self.deck.delete_many(questions)
+        else:
+            deleted = []
+            for question in dict.fromkeys(questions):
+                if question in self.deck:
+                    deleted.append((question, self.deck[question]))
+                    del self.deck[question]
+        self._cards_removed(deleted)
+        return len(deleted)
+
+    # delete an entire deck
+    def delete_deck(self):
+        if self.card_count == 0:
+            return "Deck empty!"
+        self.deck.clear()
+        self._deck_cleared()
+        return "Deck deleted!"
+    
+    # releases the storage backend, if it holds anything open
+    def close(self):
+        if hasattr(self.deck, "close"):
+            self.deck.close()
+
+    # Size of deck
+    def deck_size(self):
+        return len(self.deck) 
+
+
+    # Prints all flashcards in the deck
+    def view_deck(self):
+        return str(self)
+
+    # the lines of the cards from offset up to offset + limit, as view_deck
+    # shows them
+    def render_page(self, offset, limit):
+        if hasattr(self.deck, "page"):
+            cards = self.deck.page(offset, limit)
+            return "\n".join([render_card(question, answer) for question, answer in cards])
+        return self._renderer().page(offset, limit)
+
+    # finds cards by question; mode is "exact" (ignoring case and spacing),
+    # "prefix" (questions starting with the query) or "text" (cards whose
+    # question or answer contain every word of the query).
+    # The index is built on the first search and kept up to date after that
+    def search(self, query, mode="text", limit=50):
+        if self._search_index is None:
+            self._search_index = SearchIndex(self.deck.items())
+        if mode == "exact":
+            questions = self._search_index.exact(query)[:limit]
+        elif mode == "prefix":
+            questions = self._search_index.prefix(query, limit)
+        elif mode == "text":
+            questions = self._search_index.text(query, limit)
+        else:
+            raise ValueError(f"Unknown search mode '{mode}'")
+        return [(question, self.deck[question]) for question in questions]
+
+    # labels a card for filtering with select() and collection quizzes;
+    # tags are compared ignoring case and spacing, and go with the card when
+    # it is deleted
+    def tag_card(self, question, tags):
+        if question not in self.deck:
+            return f"Flashcard '{question}' not found in deck"
+        if isinstance(tags, str):
+            tags = [tags]
+        if not all(isinstance(tag, str) and tag.strip() for tag in tags):
+            return "Invalid tag"
+        self.tags.add(question, tags)
+        return f"Flashcard '{question}' tagged"
+
+    # takes the given tags, or all of them, off a card
+    def untag_card(self, question, tags=None):
+        if isinstance(tags, str):
+            tags = [tags]
+        self.tags.remove(question, tags)
+        return f"Flashcard '{question}' untagged"
+
+    # the questions, in tagging order, tagged with every tag in tags, at
+    # least one of any_tags and none of exclude; mastered=True or False keeps only the cards whose
+    # review interval has (or has not) reached Scheduler.MASTERED_INTERVAL.
+    # Work follows the smallest tag involved; only a filter with neither tags
+    # nor any_tags starts from every card in the deck
+    def select(self, tags=(), any_tags=(), exclude=(), mastered=None):
+        questions = self.tags.matching(tags, any_tags)
+        if questions is None:
+            questions = list(self.deck)
+        for tag in exclude:
+            excluded = self.tags.cards(tag)
+            questions = [question for question in questions if question not in excluded]
+        if mastered is not None:
+            reviewed = self.scheduler.mastered
+            questions = [question for question in questions if (question in reviewed) == bool(mastered)]
+        return questions
+
+    # k random cards; stores with their own sample() avoid reading the whole
+    # deck, anything else is streamed once through a reservoir
+    def sample(self, k):
+        if hasattr(self.deck, "sample"):
+            return self.deck.sample(k, self.random)
+        return reservoir_sample(self.deck.items(), k, self.random)
+
+    # the cards from offset up to offset + limit, in deck order; stores with
+    # their own page() read just that slice
+    def page(self, offset, limit):
+        if hasattr(self.deck, "page"):
+            return self.deck.page(offset, limit)
+        return list(itertools.islice(self.deck.items(), offset, offset + limit))
+
+    # yields the deck page_size cards at a time, so a view only ever
+    # holds the pages it has shown. Each page is read with page() from where
+    # the last one ended, not from a live iterator, so cards can be added or
+    # deleted between pages
+    def iter_pages(self, page_size=50):
+        offset = 0
+        while True:
+            page = self.page(offset, page_size)
+            if not page:
+                return
+            yield page
+            offset += len(page)
+    
+    
+    # returns the quiz details as a dictionary on what questions to display
+
+    # scheduled=True asks the cards that are due for review first and fills
+    # the rest of the quiz with random cards
+    # choices=n makes it multiple choice: "choices" holds n options for each
+    # question in random order, the card's answer and n - 1 wrong ones drawn
+    # from other cards' answers of the same kind (see answers.DistractorIndex)
+    def quiz(self, level, shuffle=True, scheduled=False, choices=0):
+        time_limit = self.QUIZ_TIME_LIMIT
+        num_questions = self.QUIZ_SIZES.get(level, self.QUIZ_SIZES["pro"])
+
+        if self.card_count < num_questions:
+            return f"error: Not enough flashcards for {level} level quiz."
+
+        # Shuffle the questions for user  and dont for the tests 
+        if scheduled:
+            questions = self.due_cards(num_questions)
+            if len(questions) < num_questions:
+                asked = {question for question, _ in questions}
+                extra = self.sample(min(num_questions + len(asked), self.card_count))
+                questions += [card for card in extra if card[0] not in asked][:num_questions - len(questions)]
+        elif shuffle:
+            questions = self.sample(num_questions)
+        else:
+            questions = self.page(0, num_questions)
+
+        result = {
+            "questions": questions,
+            "time_limit": time_limit
+        }
+        if choices:
+            result["choices"] = [self._choices(answer, choices) for _, answer in questions]
+        return result
+
+    def _choices(self, answer, n):
+        if self._distractors is None:
+            self._distractors = DistractorIndex(self.deck.values())
+        options = [answer.split(ANSWER_SEPARATOR)[0].strip()]
+        options += self._distractors.distractors(answer, n - 1, self.random)
+        self.random.shuffle(options)
+        return options
+    
+    # a QuizSession over a new quiz (see session.py), or the quiz's error
+    # message; schedule(callback, timeout) is used to end the session at its
+    # time limit, e.g. Clock.schedule_once. Call start() on it to begin
+    def quiz_session(self, level, schedule=None, scheduled=False, shuffle=True, choices=0, **options):
+        result = self.quiz(level, shuffle, scheduled, choices)
+        if isinstance(result, str):
+            return result
+        return QuizSession(self, result["questions"], result["time_limit"], schedule,
+                           choices=result.get("choices"), **options)
+
+    # Returns a boolean value if true if the user_answer is correct else false
+    # the result is recorded for the spaced repetition schedule of the card.
+    # Answers are compared normalized (case, spacing, punctuation, unicode
+    # forms) against every accepted answer of the card; max_edits also
+    # accepts small typos (see answers.is_correct_answer)
+    def check_answer(self, current_question_index, user_answer, questions, max_edits=0):
+        question, correct_answer = questions[current_question_index]
+        is_correct = is_correct_answer(user_answer, correct_answer, max_edits)
+        self.record_review(question, is_correct)
+        return is_correct
+
+    # grades a whole quiz at once, user_answers[i] answering questions[i]
+    def check_answers(self, user_answers, questions, max_edits=0):
+        return [self.check_answer(index, user_answer, questions, max_edits)
+                for index, user_answer in enumerate(user_answers)]
+
+    def record_review(self, question, correct, now=None):
+        if question in self.deck:
+            card = self.scheduler.record(question, correct, now)
+            if hasattr(self.deck, "save_schedule"):
+                self.deck.save_schedule(question, card)
+
+    # up to n (question, answer) cards due for review, most overdue first
+    def due_cards(self, n, now=None):
+        return [(question, self.deck[question]) for question in self.scheduler.due(n, now)]
+
+
+metrics.register(FlashcardDeck, "flashcard_deck_operation_seconds",
+                 ("add_flashcard", "update_flashcard", "add_deck", "add_cards", "upload_deck",
+                  "export_deck", "export_text", "delete_card", "delete_cards", "delete_deck", "view_deck",
+                  "render_page", "search", "page", "sample", "quiz", "quiz_session", "check_answer",
+                  "check_answers", "select"))
@@ -0,0 +1,159 @@
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from accounts import DeckRegistry
+
+# Load test for server.py. Opens --sessions keep-alive connections at once;
+# each one repeatedly fetches a quiz and grades all its answers in a single
+# batched /check call, like a learner going through quizzes. Prints request
+# count, requests per second and p50/p99 latency. Each user's deck is seeded
+# with --cards cards first, written straight into the spawned server's
+# directory, so decks of realistic size are ready in seconds.
+#
+#   python loadtest.py --sessions 2000 --rounds 5
+#   python loadtest.py --port 8080 --no-spawn     # against a running server
+
+
+class Client:
+
+    def __init__(self, reader, writer, latencies):
+        self.reader = reader
+        self.writer = writer
+        self.latencies = latencies
+
+    async def request(self, method, path, data=None):
+        body = json.dumps(data).encode() if data is not None else b""
+        start = time.perf_counter()
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+                          f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        payload = await self.reader.readexactly(length)
+        self.latencies.append(time.perf_counter() - start)
+        if status != 200:
+            raise RuntimeError(f"{method} {path} returned {status}")
+        return json.loads(payload)
+
+
+async def connect(port, latencies):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    return Client(reader, writer, latencies)
+
+
+# fills each user's deck before the server opens it, one bulk add per deck
+def seed_directory(directory, users, cards):
+    registry = DeckRegistry(directory, max_size=max(cards, 1))
+    try:
+        for user in range(users):
+            with registry.deck(f"user{user}") as deck:
+                deck.add_cards((f"Question {i}", f"Answer {i}") for i in range(cards))
+    finally:
+        registry.close()
+
+
+# the same over HTTP, for a server that is already running: a card per
+# request, one connection per user
+async def seed(port, users, cards):
+    async def seed_user(user):
+        client = await connect(port, [])
+        for i in range(cards):
+            await client.request("POST", f"/user{user}/default/cards",
+                                 {"question": f"Question {i}", "answer": f"Answer {i}"})
+        client.writer.close()
+
+    await asyncio.gather(*(seed_user(user) for user in range(users)))
+
+
+async def session(port, user, rounds, level, latencies, errors):
+    try:
+        client = await connect(port, latencies)
+        for round_number in range(rounds):
+            quiz = await client.request("GET", f"/user{user}/default/quiz?level={level}")
+            answers = [{"question": question, "answer": answer if index % 3 else "wrong"}
+                       for index, (question, answer) in enumerate(quiz["questions"])]
+            await client.request("POST", f"/user{user}/default/check", {"answers": answers})
+        client.writer.close()
+    except (OSError, RuntimeError, asyncio.IncompleteReadError, ValueError) as error:
+        errors.append(error)
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def run(options):
+    if options.no_spawn:
+        await seed(options.port, options.users, options.cards)
+    latencies = []
+    errors = []
+    start = time.perf_counter()
+    await asyncio.gather(*(session(options.port, number % options.users, options.rounds, options.level,
+                                   latencies, errors)
+                           for number in range(options.sessions)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"sessions {options.sessions}  requests {len(latencies)}  errors {len(errors)}  "
+          f"time {elapsed:.2f} s  {len(latencies) / elapsed:.0f} req/s")
+    if latencies:
+        print(f"latency p50 {percentile(latencies, 0.50) * 1000:.2f} ms  "
+              f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms  max {latencies[-1] * 1000:.2f} ms")
+    if errors:
+        print(f"first error: {errors[0]!r}")
+    return 1 if errors else 0
+
+
+def wait_for_port(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Server did not start on port {port}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the flashcard HTTP server.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--no-spawn", action="store_true", help="use a server that is already running")
+    parser.add_argument("--sessions", type=int, default=1000, help="concurrent quiz sessions")
+    parser.add_argument("--rounds", type=int, default=5, help="quizzes per session")
+    parser.add_argument("--users", type=int, default=20, help="distinct users the sessions share")
+    parser.add_argument("--cards", type=int, default=5000, help="cards seeded into each user's deck")
+    parser.add_argument("--level", choices=["beginner", "mid", "pro"], default="beginner")
+    options = parser.parse_args(argv)
+
+    if options.no_spawn:
+        return asyncio.run(run(options))
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        seed_directory(directory, options.users, options.cards)
+        print(f"seeded {options.users} decks of {options.cards} cards in {time.perf_counter() - start:.2f} s")
+        server = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py"),
+                                   "--port", str(options.port), "--directory", directory,
+                                   "--max-size", str(max(options.cards, 1))])
+        try:
+            wait_for_port(options.port)
+            return asyncio.run(run(options))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+import os
+import time
+import bisect
+import cProfile
+import functools
+import threading
+
+# Optional timing of the deck engine, the GUI handlers and the HTTP routes.
+# Classes list the methods worth timing with register(); nothing is wrapped
+# until enable() is called, so while metrics are off the methods are the
+# original functions and cost nothing extra. enable() replaces each one on
+# its class with a wrapper that records its duration in a histogram (and
+# counts the exceptions it raises); disable() puts the originals back.
+#
+# Objects that keep bound methods around (Kivy bindings, the server's route
+# table) keep whichever version existed when they were made, so the GUI and
+# the server enable metrics before building themselves: set
+# FLASHCARD_METRICS=<file> for the GUI, or pass --metrics to server.py.
+#
+# METRICS.render() gives everything in the Prometheus text format and
+# METRICS.write(path) saves it to a file. start_profile()/stop_profile()
+# capture a cProfile of whatever runs in between.
+
+# histogram bucket bounds in seconds, 10 us to 10 s
+BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+           0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "total")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+
+# Counters, gauges and histograms keyed by (metric name, label value); each
+# metric has at most one label, whose name is given when it is first used.
+# Histograms are created under a lock but observed without one: the timing
+# wrappers keep a reference to theirs, so recording a call is a bisect and
+# three additions. Under heavy threading an update can occasionally be lost,
+# which a latency histogram can live with.
+class Metrics:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.labels = {}
+
+    # zeroes every metric; histograms are cleared in place, since the timing
+    # wrappers hold on to them
+    def reset(self):
+        with self._lock:
+            for histogram in self.histograms.values():
+                histogram.__init__()
+            self.counters = {}
+            self.gauges = {}
+
+    def histogram(self, name, label=None, value=None):
+        histogram = self.histograms.get((name, value))
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault((name, value), Histogram())
+                self.labels.setdefault(name, label)
+        return histogram
+
+    def observe(self, name, seconds, label=None, value=None):
+        self.histogram(name, label, value).observe(seconds)
+
+    def increment(self, name, amount=1, label=None, value=None):
+        with self._lock:
+            self.counters[(name, value)] = self.counters.get((name, value), 0) + amount
+            self.labels.setdefault(name, label)
+
+    def set_gauge(self, name, amount, label=None, value=None):
+        with self._lock:
+            self.gauges[(name, value)] = amount
+            self.labels.setdefault(name, label)
+
+    # everything in the Prometheus text exposition format
+    def render(self):
+        lines = []
+        with self._lock:
+            for kind, values in (("counter", self.counters), ("gauge", self.gauges)):
+                for name in sorted({name for name, _ in values}):
+                    lines.append(f"# TYPE {name} {kind}")
+                    for (metric, value), amount in sorted(values.items(), key=_sort_key):
+                        if metric == name:
+                            lines.append(f"{name}{self._labels(name, value)} {amount:g}")
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append(f"# TYPE {name} histogram")
+                for (metric, value), histogram in sorted(self.histograms.items(), key=_sort_key):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS + ("+Inf",), histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{self._labels(name, value, le=bound)} {cumulative}")
+                    lines.append(f"{name}_sum{self._labels(name, value)} {histogram.total:.9g}")
+                    lines.append(f"{name}_count{self._labels(name, value)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    # saves render() to path, replacing the file in one step
+    def write(self, path):
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as file:
+            file.write(self.render())
+        os.replace(temporary, path)
+
+    # Helper functions
+
+    def _labels(self, name, value, le=None):
+        pairs = []
+        if value is not None:
+            pairs.append(f'{self.labels[name]}="{_escape(value)}"')
+        if le is not None:
+            pairs.append(f'le="{le}"')
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _sort_key(item):
+    name, value = item[0]
+    return name, "" if value is None else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+METRICS = Metrics()
+
+_registered = []
+_originals = {}
+_enabled = False
+
+
+# records the duration of cls.<name> for each name in a histogram called
+# metric, labelled label=<name>, once metrics are enabled
+def register(cls, metric, names, label="operation"):
+    for name in names:
+        _registered.append((cls, name, metric, label))
+        if _enabled:
+            _wrap(cls, name, metric, label)
+
+
+def enable():
+    global _enabled
+    if not _enabled:
+        _enabled = True
+        for entry in _registered:
+            _wrap(*entry)
+
+
+def disable():
+    global _enabled
+    _enabled = False
+    for (cls, name), function in _originals.items():
+        setattr(cls, name, function)
+    _originals.clear()
+
+
+def enabled():
+    return _enabled
+
+
+def _wrap(cls, name, metric, label):
+    function = cls.__dict__[name]
+    errors = metric.replace("_seconds", "") + "_errors_total"
+    observe = METRICS.histogram(metric, label, name).observe
+    clock = time.perf_counter
+
+    @functools.wraps(function)
+    def timed(*args, **kwargs):
+        start = clock()
+        try:
+            return function(*args, **kwargs)
+        except Exception:
+            METRICS.increment(errors, label=label, value=name)
+            raise
+        finally:
+            observe(clock() - start)
+
+    _originals[(cls, name)] = function
+    setattr(cls, name, timed)
+
+
+# On-demand cProfile capture of the calling thread
+
+_profiler = None
+
+
+def profiling():
+    return _profiler is not None
+
+
+def start_profile():
+    global _profiler
+    if _profiler is None:
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+
+# stops the capture and saves it to path (read it with pstats or snakeviz);
+# returns the profile, or None if none was running
+def stop_profile(path=None):
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is None:
+        return None
+    profiler.disable()
+    if path:
+        profiler.dump_stats(path)
+    return profiler
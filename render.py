@@ -0,0 +1,142 @@
+import bisect
+import itertools
+
+# The deck as text, for view_deck and text exports. Rendering a million cards
+# from scratch on every view is the slow part, so the text is cached in
+# chunks and kept up to date card by card through the deck's hooks.
+
+# cards per chunk: a change re-renders at most this many lines
+CHUNK_SIZE = 512
+
+
+# how one card is shown
+def render_card(question, answer):
+    return f"Q: {question} - A: {answer}"
+
+
+# writes cards to an open text file, one line each; returns how many
+def write_cards(file, cards):
+    cards = iter(cards)
+    count = 0
+    for batch in iter(lambda: list(itertools.islice(cards, CHUNK_SIZE)), []):
+        file.write("\n".join([render_card(question, answer) for question, answer in batch]))
+        file.write("\n")
+        count += len(batch)
+    return count
+
+
+class _Chunk:
+    __slots__ = ("cards", "text")
+
+    def __init__(self):
+        self.cards = {}
+        self.text = None
+
+    def render(self):
+        if self.text is None:
+            self.text = "\n".join([render_card(question, answer)
+                                   for question, answer in self.cards.items()])
+        return self.text
+
+
+# The deck's cards in deck order, split into chunks of up to CHUNK_SIZE that
+# each cache their rendered text until one of their cards changes. New cards
+# go at the end, updates keep their place and deletions leave the rest in
+# order, the same as the stores themselves. Every change bumps generation;
+# text() keeps the whole text for the generation it was built at, so viewing
+# an unchanged deck again is free, and after a few edits it re-renders only
+# their chunks before one join.
+class RenderCache:
+
+    def __init__(self, cards=()):
+        self.generation = 0
+        self._chunks = []
+        self._where = {}
+        self._starts = None
+        self._text = None
+        self._text_generation = None
+        for question, answer in cards:
+            self.add(question, answer)
+
+    def __len__(self):
+        return len(self._where)
+
+    def add(self, question, answer):
+        if question in self._where:
+            self.update(question, answer)
+            return
+        if not self._chunks or len(self._chunks[-1].cards) >= CHUNK_SIZE:
+            self._chunks.append(_Chunk())
+        chunk = self._chunks[-1]
+        chunk.cards[question] = answer
+        chunk.text = None
+        self._where[question] = chunk
+        self._starts = None
+        self.generation += 1
+
+    def update(self, question, answer):
+        chunk = self._where[question]
+        chunk.cards[question] = answer
+        chunk.text = None
+        self.generation += 1
+
+    def remove(self, question):
+        chunk = self._where.pop(question, None)
+        if chunk is None:
+            return
+        del chunk.cards[question]
+        chunk.text = None
+        if not chunk.cards:
+            self._chunks.remove(chunk)
+        self._starts = None
+        self.generation += 1
+
+    def clear(self):
+        self._chunks.clear()
+        self._where.clear()
+        self._starts = None
+        self.generation += 1
+
+    # every card, one line each
+    def text(self):
+        if self._text_generation != self.generation:
+            self._text = "\n".join([chunk.render() for chunk in self._chunks])
+            self._text_generation = self.generation
+        return self._text
+
+    # the text a chunk at a time, for writing out without building the whole
+    def chunks(self):
+        for chunk in list(self._chunks):
+            yield chunk.render()
+
+    # the lines of the cards from offset up to offset + limit; the chunk
+    # holding offset is found by bisecting the chunks' first positions
+    def page(self, offset, limit):
+        if self._starts is None:
+            self._starts = list(itertools.accumulate(
+                (len(chunk.cards) for chunk in self._chunks), initial=0))
+        if offset < 0:
+            raise ValueError("offset must not be negative")
+        number = bisect.bisect_right(self._starts, offset) - 1
+        skip = offset - self._starts[number]
+        parts = []
+        while limit > 0 and number < len(self._chunks):
+            chunk = self._chunks[number]
+            if skip == 0 and len(chunk.cards) <= limit:
+                parts.append(chunk.render())
+                limit -= len(chunk.cards)
+            else:
+                cards = itertools.islice(chunk.cards.items(), skip, skip + limit)
+                lines = [render_card(question, answer) for question, answer in cards]
+                parts.extend(lines)
+                limit -= len(lines)
+            skip = 0
+            number += 1
+        return "\n".join(parts)
+
+    # writes every card to an open text file, one line each; returns how many
+    def write(self, file):
+        for text in self.chunks():
+            file.write(text)
+            file.write("\n")
+        return len(self)
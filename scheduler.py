@@ -0,0 +1,128 @@
+import heapq
+import time
+
+DAY = 86400
+
+
+# Review state of one card, updated with the SM-2 rules
+class CardSchedule:
+    __slots__ = ("repetitions", "interval", "ease", "due", "lapses", "history")
+
+    def __init__(self):
+        self.repetitions = 0
+        self.interval = 0.0
+        self.ease = 2.5
+        self.due = 0.0
+        self.lapses = 0
+        self.history = []
+
+
+# Spaced repetition for a deck. Each reviewed card gets an SM-2 schedule, and
+# a heap keyed by due time answers "next n due cards" in O(n log N) without
+# scanning the deck. Rescheduling pushes a fresh heap entry and leaves the old
+# one behind; stale entries are skipped when popped and the heap is rebuilt
+# once they outnumber the live ones. Cards whose interval has reached
+# MASTERED_INTERVAL days are kept in the mastered set, for filtering.
+class Scheduler:
+
+    MIN_EASE = 1.3
+    MASTERED_INTERVAL = 21
+
+    def __init__(self):
+        self.cards = {}
+        self.mastered = set()
+        self._heap = []
+        self._stale = 0
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __contains__(self, question):
+        return question in self.cards
+
+    # records one answer; quality is 0-5 as in SM-2 (3 and up is a pass),
+    # defaulting to 4 for a correct answer and 1 for a wrong one
+    def record(self, question, correct, now=None, quality=None):
+        now = time.time() if now is None else now
+        if quality is None:
+            quality = 4 if correct else 1
+        card = self.cards.get(question)
+        if card is None:
+            card = self.cards[question] = CardSchedule()
+        else:
+            self._stale += 1
+
+        if quality >= 3:
+            if card.repetitions == 0:
+                card.interval = 1
+            elif card.repetitions == 1:
+                card.interval = 6
+            else:
+                card.interval = round(card.interval * card.ease)
+            card.repetitions += 1
+        else:
+            card.repetitions = 0
+            card.interval = 1
+            card.lapses += 1
+        card.ease = max(self.MIN_EASE, card.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+        card.due = now + card.interval * DAY
+        card.history.append((now, quality))
+        if card.interval >= self.MASTERED_INTERVAL:
+            self.mastered.add(question)
+        else:
+            self.mastered.discard(question)
+
+        heapq.heappush(self._heap, (card.due, question))
+        self._compact_if_stale()
+        return card
+
+    # up to n questions whose review is due at `now`, most overdue first
+    def due(self, n, now=None):
+        now = time.time() if now is None else now
+        found = {}
+        while self._heap and len(found) < n:
+            due, question = self._heap[0]
+            if due > now:
+                break
+            heapq.heappop(self._heap)
+            # a card rescheduled to the same time leaves an identical stale entry
+            if question not in found and self._is_current(due, question):
+                found[question] = due
+            else:
+                self._stale -= 1
+        for question, due in found.items():
+            heapq.heappush(self._heap, (due, question))
+        return list(found)
+
+    # puts back a schedule saved earlier (see SQLiteStore.schedules)
+    def restore(self, question, card):
+        if question in self.cards:
+            self._stale += 1
+        self.cards[question] = card
+        if card.interval >= self.MASTERED_INTERVAL:
+            self.mastered.add(question)
+        heapq.heappush(self._heap, (card.due, question))
+
+    def forget(self, question):
+        self.mastered.discard(question)
+        if self.cards.pop(question, None) is not None:
+            self._stale += 1
+            self._compact_if_stale()
+
+    def clear(self):
+        self.cards.clear()
+        self.mastered.clear()
+        self._heap.clear()
+        self._stale = 0
+
+    # Helper functions
+
+    def _is_current(self, due, question):
+        card = self.cards.get(question)
+        return card is not None and card.due == due
+
+    def _compact_if_stale(self):
+        if self._stale > len(self.cards):
+            self._heap = [(card.due, question) for question, card in self.cards.items()]
+            heapq.heapify(self._heap)
+            self._stale = 0
@@ -0,0 +1,271 @@
+import re
+import heapq
+import bisect
+import unicodedata
+
+_TOKEN = re.compile(r"\w+")
+_SYMBOL_SPACING = re.compile(r" ?([^\w\s]) ?")
+
+
+# case and whitespace insensitive form of a question, used as the lookup key
+def fold(text):
+    return " ".join(text.casefold().split())
+
+
+# the key two questions are duplicates under: NFKC, casefolded, whitespace
+# collapsed and punctuation removed, so "What is 2+2?" and "what is 2 + 2"
+# share a key. Symbols are kept ("2+2", "5 < 3", "C++" and "x^2" keep their
+# meaning), as is punctuation between two digits ("2*2", "3.5", "1-2"), and
+# spaces around symbols do not count. Questions with nothing left keep their
+# own text as key.
+def question_key(question):
+    key = " ".join(unicodedata.normalize("NFKC", question).casefold().split()).rstrip("?.!: ")
+    # most questions are only letters, digits and spaces once the final "?"
+    # is gone, which is much cheaper to check than to look at every character
+    if not key.replace(" ", "").isalnum():
+        key = _SYMBOL_SPACING.sub(r"\1", " ".join(strip_punctuation(key).split()))
+    return key or question
+
+
+# removes punctuation except where it is part of a number: between two
+# digits ("3.5", "1/2", "1-2") or a minus sign in front of one ("-3"), so
+# numbers are never fused into other numbers
+def strip_punctuation(text):
+    kept = []
+    last = len(text) - 1
+    for position, char in enumerate(text):
+        if not unicodedata.category(char).startswith("P"):
+            kept.append(char)
+        elif position < last and text[position + 1].isdigit():
+            before = text[position - 1] if position else " "
+            if before.isdigit() or (char == "-" and before.isspace()):
+                kept.append(char)
+    return "".join(kept)
+
+
+def tokenize(text):
+    return set(_TOKEN.findall(text.casefold()))
+
+
+# Lookup structures for searching a deck:
+#   exact  - folded question -> questions
+#   prefix - questions sorted by folded form, searched with bisect
+#   text   - inverted index of word -> questions, over questions and answers
+# FlashcardDeck keeps it in step with every add, update and delete. New
+# prefix keys wait in a pending list and are merged in one sort on the next
+# prefix query, so bulk adds do not pay a list insert per card.
+class SearchIndex:
+
+    def __init__(self, cards=()):
+        self._exact = {}
+        self._sorted = []
+        self._pending = []
+        self._postings = {}
+        for question, answer in cards:
+            self.add(question, answer)
+
+    def add(self, question, answer):
+        key = fold(question)
+        self._exact.setdefault(key, []).append(question)
+        self._pending.append((key, question))
+        for token in tokenize(question) | tokenize(answer):
+            self._postings.setdefault(token, set()).add(question)
+
+    def remove(self, question, answer):
+        if not self._remove_card(question, answer):
+            return
+        self._merge_pending()
+        position = bisect.bisect_left(self._sorted, (fold(question), question))
+        del self._sorted[position]
+
+    # removes many cards with one pass over the sorted keys instead of a
+    # list delete per card
+    def remove_many(self, cards):
+        removed = {question for question, answer in cards if self._remove_card(question, answer)}
+        if removed:
+            self._merge_pending()
+            self._sorted = [entry for entry in self._sorted if entry[1] not in removed]
+
+    # only the answer tokens can change
+    def update(self, question, old_answer, new_answer):
+        question_tokens = tokenize(question)
+        old_tokens = tokenize(old_answer) - question_tokens
+        new_tokens = tokenize(new_answer) - question_tokens
+        self._remove_tokens(question, old_tokens - new_tokens)
+        for token in new_tokens - old_tokens:
+            self._postings.setdefault(token, set()).add(question)
+
+    def clear(self):
+        self._exact.clear()
+        self._sorted.clear()
+        self._pending.clear()
+        self._postings.clear()
+
+    def exact(self, query):
+        return list(self._exact.get(fold(query), ()))
+
+    def prefix(self, query, limit=50):
+        self._merge_pending()
+        key = fold(query)
+        found = []
+        position = bisect.bisect_left(self._sorted, (key,))
+        while position < len(self._sorted) and len(found) < limit:
+            folded, question = self._sorted[position]
+            if not folded.startswith(key):
+                break
+            found.append(question)
+            position += 1
+        return found
+
+    # questions whose card contains every word of the query
+    def text(self, query, limit=50):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        postings = sorted((self._postings.get(token, set()) for token in tokens), key=len)
+        matches = postings[0].intersection(*postings[1:])
+        return heapq.nsmallest(limit, matches)
+
+    # Helper functions
+
+    def _merge_pending(self):
+        if self._pending:
+            self._sorted += self._pending
+            self._sorted.sort()
+            self._pending = []
+
+    # takes the card out of the exact and text indexes; False if it was not in
+    def _remove_card(self, question, answer):
+        key = fold(question)
+        matches = self._exact.get(key)
+        if matches is None or question not in matches:
+            return False
+        matches.remove(question)
+        if not matches:
+            del self._exact[key]
+        self._remove_tokens(question, tokenize(question) | tokenize(answer))
+        return True
+
+    def _remove_tokens(self, question, tokens):
+        for token in tokens:
+            questions = self._postings.get(token)
+            if questions is not None:
+                questions.discard(question)
+                if not questions:
+                    del self._postings[token]
+
+
+# question_key -> question(s) in the deck with that key, for O(1) duplicate
+# checks. A key normally maps to one question; when decks are merged with
+# keep-both it maps to a tuple of them.
+class DuplicateIndex:
+
+    def __init__(self, questions=()):
+        self._questions = {}
+        for question in questions:
+            self.add(question)
+
+    # the first question in the deck with this key, or None
+    def find(self, key):
+        found = self._questions.get(key)
+        if isinstance(found, tuple):
+            return found[0]
+        return found
+
+    # every question in the deck with this key
+    def find_all(self, key):
+        found = self._questions.get(key, ())
+        return found if isinstance(found, tuple) else (found,)
+
+    def add(self, question, key=None):
+        key = question_key(question) if key is None else key
+        found = self._questions.get(key)
+        if found is None:
+            self._questions[key] = question
+        elif isinstance(found, tuple):
+            self._questions[key] = found + (question,)
+        else:
+            self._questions[key] = (found, question)
+
+    def remove(self, question):
+        key = question_key(question)
+        found = self._questions.get(key)
+        if found == question:
+            del self._questions[key]
+        elif isinstance(found, tuple) and question in found:
+            rest = tuple(other for other in found if other != question)
+            self._questions[key] = rest if len(rest) > 1 else rest[0]
+
+    def clear(self):
+        self._questions.clear()
+
+
+
+# Tags on cards, for filtered queries: tag -> questions and question -> tags.
+# A tag's questions are the keys of a dict, so they keep the order they were
+# tagged in and filters give the same answer in every process. Tags are
+# compared folded, so "Chemistry" and " chemistry" are one tag. matching()
+# walks the smallest tag involved and checks the others by lookup, so a
+# filter costs about the size of its rarest tag, never a pass over the deck.
+class TagIndex:
+
+    def __init__(self):
+        self._cards = {}
+        self._tags = {}
+
+    def __len__(self):
+        return len(self._cards)
+
+    def add(self, question, tags):
+        found = self._tags.setdefault(question, set())
+        for tag in map(fold, tags):
+            found.add(tag)
+            self._cards.setdefault(tag, {})[question] = None
+
+    # takes the given tags off a card, or all of them with tags=None (the
+    # card was deleted)
+    def remove(self, question, tags=None):
+        found = self._tags.get(question)
+        if found is None:
+            return
+        for tag in list(found) if tags is None else set(map(fold, tags)) & found:
+            found.discard(tag)
+            questions = self._cards[tag]
+            del questions[question]
+            if not questions:
+                del self._cards[tag]
+        if not found:
+            del self._tags[question]
+
+    def clear(self):
+        self._cards.clear()
+        self._tags.clear()
+
+    def tags(self, question):
+        return sorted(self._tags.get(question, ()))
+
+    # every tag with how many cards have it
+    def counts(self):
+        return {tag: len(questions) for tag, questions in self._cards.items()}
+
+    # the questions with this tag, as dict keys; do not modify
+    def cards(self, tag):
+        return self._cards.get(fold(tag), {})
+
+    # questions tagged with every tag in all_of and at least one in any_of,
+    # in tagging order; None if neither is given
+    def matching(self, all_of=(), any_of=()):
+        found = None
+        if all_of:
+            smallest, *others = sorted((self.cards(tag) for tag in all_of), key=len)
+            found = [question for question in smallest
+                     if all(question in questions for questions in others)]
+        if any_of:
+            either = {}
+            for tag in any_of:
+                either.update(self.cards(tag))
+            if found is None:
+                found = list(either)
+            else:
+                found = [question for question in found if question in either]
+        return found
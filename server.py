@@ -0,0 +1,220 @@
+import sys
+import json
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+import metrics
+from accounts import DeckRegistry
+
+# Local HTTP/1.1 JSON API over the deck engine, one asyncio task per
+# connection with keep-alive. Decks belong to users and are served through a
+# DeckRegistry; every route is /<user>/<deck>/<action>:
+#
+#   POST   /alice/default/cards    {"question": ..., "answer": ...}   add
+#   PUT    /alice/default/cards    {"question": ..., "answer": ...}   update
+#   DELETE /alice/default/cards    {"question": ...}                  delete
+#   GET    /alice/default/search?q=capital&mode=text&limit=10
+#   GET    /alice/default/quiz?level=beginner
+#   POST   /alice/default/check    {"answers": [{"question": ..., "answer": ...}, ...]}
+#   GET    /metrics                (Prometheus text format, see metrics.py)
+#
+# /check grades any number of answers in one call against the deck's cards.
+#
+# Connections are read and written on the event loop, but the deck work of a
+# request runs on a pool of worker threads, so one slow request (a quiz over
+# a large deck, a long /check) does not hold up every other connection. The
+# registry's per-deck locks keep each deck to one thread at a time, so
+# requests for different decks run side by side.
+#
+#   python server.py --directory decks --port 8080 --metrics
+
+MAX_BODY = 1 << 20
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class FlashcardServer:
+
+    # workers is how many requests do deck work at once, as ThreadPoolExecutor
+    # picks by default
+    def __init__(self, registry, workers=None):
+        self.registry = registry
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="deck")
+        self.routes = {
+            ("POST", "cards"): self.add_card,
+            ("PUT", "cards"): self.update_card,
+            ("DELETE", "cards"): self.delete_card,
+            ("GET", "search"): self.search,
+            ("GET", "quiz"): self.quiz,
+            ("POST", "check"): self.check,
+        }
+
+    async def start(self, host="127.0.0.1", port=8080):
+        return await asyncio.start_server(self.handle_connection, host, port, backlog=4096)
+
+    # waits for the requests still running on the workers
+    def close(self):
+        self.executor.shutdown()
+
+    # serves requests on one connection until the client closes it or asks to
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                keep_alive = await self.handle_request(request_line, reader, writer)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle_request(self, request_line, reader, writer):
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        keep_alive = headers.get("connection", "").lower() != "close"
+
+        try:
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+            length = int(headers.get("content-length", 0))
+            if length > MAX_BODY:
+                keep_alive = False
+                raise HTTPError(413, "Request body too large")
+            body = await reader.readexactly(length) if length else b""
+            if method == "GET" and target == "/metrics":
+                return self.respond(writer, 200, metrics.METRICS.render().encode(), keep_alive,
+                                    "text/plain; version=0.0.4")
+            loop = asyncio.get_running_loop()
+            status, result = 200, await loop.run_in_executor(self.executor, self.dispatch, method, target, body)
+        except HTTPError as error:
+            status, result = error.status, {"error": str(error)}
+        except ValueError:
+            status, result = 400, {"error": "Malformed request"}
+            keep_alive = False
+        except Exception as error:
+            print(f"Error handling {request_line!r}: {error!r}", file=sys.stderr)
+            status, result = 500, {"error": "Internal server error"}
+
+        return self.respond(writer, status, json.dumps(result).encode(), keep_alive)
+
+    def respond(self, writer, status, payload, keep_alive, content_type="application/json"):
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + payload)
+        return keep_alive
+
+    def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        parts = url.path.strip("/").split("/")
+        if len(parts) != 3:
+            raise HTTPError(404, "Routes are /<user>/<deck>/<action>")
+        user, name, action = parts
+        handler = self.routes.get((method, action))
+        if handler is None:
+            if any(route_action == action for _, route_action in self.routes):
+                raise HTTPError(405, f"{method} not allowed on {action}")
+            raise HTTPError(404, f"Unknown action '{action}'")
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            data = json.loads(body) if body else {}
+        except json.JSONDecodeError:
+            raise HTTPError(400, "Body is not valid JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+        try:
+            with self.registry.deck(user, name) as deck:
+                return handler(deck, params, data)
+        except (KeyError, TypeError, ValueError) as error:
+            raise HTTPError(400, f"Bad request: {error}")
+
+    # Route handlers
+
+    def add_card(self, deck, params, data):
+        return {"result": deck.add_flashcard(data["question"], data["answer"])}
+
+    def update_card(self, deck, params, data):
+        return {"result": deck.update_flashcard(data["question"], data["answer"])}
+
+    def delete_card(self, deck, params, data):
+        return {"result": deck.delete_card(data["question"])}
+
+    def search(self, deck, params, data):
+        cards = deck.search(params.get("q", ""), params.get("mode", "text"), int(params.get("limit", 50)))
+        return {"cards": cards}
+
+    def quiz(self, deck, params, data):
+        result = deck.quiz(params.get("level", "beginner"), scheduled=params.get("scheduled") == "1")
+        if isinstance(result, str):
+            raise HTTPError(400, result)
+        return result
+
+    # answers to questions that are not in the deck grade as None
+    def check(self, deck, params, data):
+        questions = []
+        answers = []
+        for item in data["answers"]:
+            question = item["question"]
+            questions.append((question, deck.deck[question] if question in deck.deck else None))
+            answers.append(item["answer"])
+        max_edits = int(params.get("max_edits", 0))
+        return {"results": [deck.check_answer(index, answer, questions, max_edits)
+                            if questions[index][1] is not None else None
+                            for index, answer in enumerate(answers)]}
+
+
+metrics.register(FlashcardServer, "flashcard_http_request_seconds",
+                 ("add_card", "update_card", "delete_card", "search", "quiz", "check"), label="route")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve flashcard decks over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--directory", default="decks", help="where user decks are stored")
+    parser.add_argument("--max-open", type=int, default=64, help="decks kept open at once")
+    parser.add_argument("--max-size", type=int, default=100000, help="capacity of each deck")
+    parser.add_argument("--workers", type=int, default=None, help="requests doing deck work at once")
+    parser.add_argument("--metrics", action="store_true", help="time every route and deck operation")
+    options = parser.parse_args(argv)
+
+    if options.metrics:
+        metrics.enable()
+
+    registry = DeckRegistry(options.directory, options.max_open, options.max_size)
+    flashcard_server = FlashcardServer(registry, options.workers)
+
+    async def serve():
+        server = await flashcard_server.start(options.host, options.port)
+        print(f"Serving decks from {options.directory} on http://{options.host}:{options.port}", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        flashcard_server.close()
+        registry.close()
+
+
+if __name__ == "__main__":
+    main()
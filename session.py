@@ -0,0 +1,230 @@
+import heapq
+import itertools
+import time
+
+# Quiz sessions, independent of any GUI. A session walks through a quiz's
+# questions, grades answers through the deck and times everything against
+# time.monotonic, so the limit holds however the wall clock moves. The
+# deadline is not polled: when the session starts it asks for a callback at
+# the deadline through a schedule_once(callback, timeout) function and ends
+# itself when that fires, whether or not the user is still typing. In the GUI
+# that function is Kivy's Clock.schedule_once; headless code can use
+# Timers.schedule_once below or asyncio's loop.call_later.
+
+
+# Response times of one card across every session
+class ResponseStats:
+    __slots__ = ("count", "total", "fastest", "slowest")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.fastest = float("inf")
+        self.slowest = 0.0
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+# Per-card response time statistics for a deck, kept beside its Scheduler
+class ResponseTimes:
+
+    def __init__(self):
+        self.cards = {}
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __contains__(self, question):
+        return question in self.cards
+
+    def record(self, question, seconds):
+        stats = self.cards.get(question)
+        if stats is None:
+            stats = self.cards[question] = ResponseStats()
+        stats.count += 1
+        stats.total += seconds
+        stats.fastest = min(stats.fastest, seconds)
+        stats.slowest = max(stats.slowest, seconds)
+
+    def get(self, question):
+        return self.cards.get(question)
+
+    # the n cards with the slowest mean response time
+    def slowest(self, n):
+        return heapq.nlargest(n, self.cards.items(), key=lambda item: item[1].mean)
+
+    def forget(self, question):
+        self.cards.pop(question, None)
+
+    def clear(self):
+        self.cards.clear()
+
+
+class _TimerEvent:
+    __slots__ = ("callback", "scheduled", "cancelled")
+
+    def __init__(self, callback, scheduled):
+        self.callback = callback
+        self.scheduled = scheduled
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+# schedule_once for sessions without an event loop: one heap of deadlines
+# for any number of sessions, fired by run(). Callbacks get the time since
+# they were scheduled, like Kivy's Clock
+class Timers:
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._heap = []
+        self._order = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule_once(self, callback, timeout=0):
+        now = self.clock()
+        event = _TimerEvent(callback, now)
+        heapq.heappush(self._heap, (now + timeout, next(self._order), event))
+        return event
+
+    # when the next callback is due, or None
+    def next_deadline(self):
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    # fires every callback that is due; returns how many ran
+    def run(self, now=None):
+        now = self.clock() if now is None else now
+        fired = 0
+        while self._heap and self._heap[0][0] <= now:
+            _, _, event = heapq.heappop(self._heap)
+            if not event.cancelled:
+                event.callback(now - event.scheduled)
+                fired += 1
+        return fired
+
+
+# One run through a quiz (see FlashcardDeck.quiz_session). Callbacks, all
+# optional, are called with the session:
+#   on_question(session)  a new question is up (session.question)
+#   on_answer(session, correct)
+#   on_finish(session)    session.reason is "completed", "timeout" or "cancelled"
+# Each graded answer records how long the question was up in
+# deck.response_times. choices, from a multiple choice quiz, gives the
+# options for each question; the chosen option is answered like typed text.
+class QuizSession:
+
+    def __init__(self, deck, questions, time_limit, schedule=None, clock=time.monotonic,
+                 max_edits=0, on_question=None, on_answer=None, on_finish=None, choices=None):
+        self.deck = deck
+        self.questions = questions
+        self.choices = choices
+        self.time_limit = time_limit
+        self.schedule = schedule
+        self.clock = clock
+        self.max_edits = max_edits
+        self.on_question = on_question
+        self.on_answer = on_answer
+        self.on_finish = on_finish
+        self.index = 0
+        self.score = 0
+        self.results = []
+        self.reason = None
+        self.started = None
+        self.deadline = None
+        self._asked = None
+        self._timer = None
+
+    def __len__(self):
+        return len(self.questions)
+
+    @property
+    def finished(self):
+        return self.reason is not None
+
+    # the question being asked, or None once the session is over
+    @property
+    def question(self):
+        if self.finished or self.started is None:
+            return None
+        return self.questions[self.index][0]
+
+    # the options for the current question of a multiple choice quiz, else None
+    @property
+    def options(self):
+        if self.choices is None or self.question is None:
+            return None
+        return self.choices[self.index]
+
+    # seconds left before the session times out
+    def remaining(self):
+        if self.deadline is None:
+            return self.time_limit
+        return max(0.0, self.deadline - self.clock())
+
+    def start(self):
+        if self.started is not None:
+            raise RuntimeError("Quiz session already started")
+        self.started = self._asked = self.clock()
+        self.deadline = self.started + self.time_limit
+        if self.schedule is not None:
+            self._timer = self.schedule(self._expire, self.time_limit)
+        if not self.questions:
+            self._finish("completed")
+        elif self.on_question:
+            self.on_question(self)
+        return self
+
+    # grades an answer to the current question and moves on to the next;
+    # returns whether it was correct, or None if the session is already over
+    # (an answer arriving after the deadline ends the session instead)
+    def answer(self, user_answer):
+        if self.finished or self.started is None:
+            return None
+        now = self.clock()
+        if now >= self.deadline:
+            self._finish("timeout")
+            return None
+        correct = self.deck.check_answer(self.index, user_answer, self.questions, self.max_edits)
+        question = self.questions[self.index][0]
+        elapsed = now - self._asked
+        self.deck.response_times.record(question, elapsed)
+        self.results.append((question, correct, elapsed))
+        if correct:
+            self.score += 1
+        if self.on_answer:
+            self.on_answer(self, correct)
+        self.index += 1
+        self._asked = now
+        if self.index >= len(self.questions):
+            self._finish("completed")
+        elif self.on_question:
+            self.on_question(self)
+        return correct
+
+    # ends the session early, e.g. when the user closes the quiz
+    def cancel(self):
+        if not self.finished:
+            self._finish("cancelled")
+
+    # Helper functions
+
+    # called by the timer at the deadline, with whatever the scheduler passes
+    def _expire(self, *args):
+        if not self.finished:
+            self._finish("timeout")
+
+    def _finish(self, reason):
+        self.reason = reason
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self.on_finish:
+            self.on_finish(self)
@@ -0,0 +1,1055 @@
+import os
+import sys
+import json
+import mmap
+import time
+import zlib
+import struct
+import sqlite3
+import math
+import random
+import itertools
+from array import array
+from collections.abc import MutableMapping, ItemsView, ValuesView
+from search import DuplicateIndex, question_key
+from scheduler import CardSchedule
+
+
+# Storage backends for FlashcardDeck. A backend is any MutableMapping of
+# question -> answer. Backends may also provide sample(k, rng), returning k
+# distinct (question, answer) pairs in random order without a full scan, and
+# find_key(key), returning a question whose search.question_key is key (or
+# None) without reading every question, with find_keys(keys) doing the same
+# for a batch as a dict of the keys found; FlashcardDeck uses them to check
+# for duplicates instead of building an index of the whole deck. Backends
+# that keep the spaced repetition schedules as well provide schedules() and
+# save_schedule(question, card), and drop a card's schedule with the card.
+
+
+_END = object()
+
+
+# k random items from an iterable of unknown length in one pass, holding only
+# k of them (reservoir sampling, Li's "Algorithm L": skips ahead geometrically
+# instead of drawing a random number per item)
+def reservoir_sample(iterable, k, rng=random):
+    iterator = iter(iterable)
+    reservoir = []
+    for item in iterator:
+        reservoir.append(item)
+        if len(reservoir) == k:
+            break
+    if len(reservoir) < k or k == 0:
+        rng.shuffle(reservoir)
+        return reservoir
+
+    weight = math.exp(math.log(rng.random()) / k)
+    while True:
+        skip = math.floor(math.log(rng.random()) / math.log(1 - weight))
+        item = next(itertools.islice(iterator, skip, None), _END)
+        if item is _END:
+            break
+        reservoir[rng.randrange(k)] = item
+        weight *= math.exp(math.log(rng.random()) / k)
+    rng.shuffle(reservoir)
+    return reservoir
+
+
+# The default in-memory store: a dict plus a list of its keys, kept in sync by
+# swap-remove so deletion stays O(1). The list gives sample() random access,
+# so drawing k cards costs O(k) however big the deck is. Iteration follows the
+# dict, so cards are still listed in the order they were added.
+class IndexedStore(MutableMapping):
+
+    def __init__(self, cards=()):
+        self._cards = {}
+        self._keys = []
+        self._positions = {}
+        self.update(cards)
+
+    def __getitem__(self, question):
+        return self._cards[question]
+
+    def __contains__(self, question):
+        return question in self._cards
+
+    def __setitem__(self, question, answer):
+        if question not in self._cards:
+            self._positions[question] = len(self._keys)
+            self._keys.append(question)
+        self._cards[question] = answer
+
+    def __delitem__(self, question):
+        del self._cards[question]
+        position = self._positions.pop(question)
+        last = self._keys.pop()
+        if position < len(self._keys):
+            self._keys[position] = last
+            self._positions[last] = position
+
+    def __len__(self):
+        return len(self._cards)
+
+    def __iter__(self):
+        return iter(self._cards)
+
+    def items(self):
+        return self._cards.items()
+
+    def values(self):
+        return self._cards.values()
+
+    def update(self, cards=(), **kwargs):
+        if not hasattr(cards, "items"):
+            cards = dict(cards)
+        new = [question for question in cards if question not in self._cards]
+        self._positions.update(zip(new, range(len(self._keys), len(self._keys) + len(new))))
+        self._keys += new
+        self._cards.update(cards)
+        if kwargs:
+            self.update(kwargs)
+
+    def clear(self):
+        self._cards.clear()
+        self._keys.clear()
+        self._positions.clear()
+
+    def sample(self, k, rng=random):
+        return [(question, self._cards[question]) for question in rng.sample(self._keys, k)]
+
+
+# Cards kept in a SQLite database so the deck survives restarts.
+# Nothing is read up front: lookups, counts and iteration go to the database
+# on demand, so opening a deck with a million cards costs the same as an
+# empty one. Bulk writes through update() run in one transaction per batch.
+class SQLiteStore(MutableMapping):
+
+    # statements are module constants so sqlite3's statement cache hands back
+    # the same prepared statement on every call
+    _CREATE = ("CREATE TABLE IF NOT EXISTS cards ("
+               "id INTEGER PRIMARY KEY, question TEXT NOT NULL UNIQUE, answer TEXT NOT NULL, qkey TEXT)")
+    _CREATE_KEY_INDEX = "CREATE INDEX IF NOT EXISTS cards_qkey ON cards (qkey)"
+    _CREATE_REVIEWS = ("CREATE TABLE IF NOT EXISTS reviews ("
+                       "question TEXT PRIMARY KEY, repetitions INTEGER, interval REAL, ease REAL, "
+                       "due REAL, lapses INTEGER, history TEXT)")
+    _SAVE_SCHEDULE = "INSERT OR REPLACE INTO reviews VALUES (?, ?, ?, ?, ?, ?, ?)"
+    _DELETE_SCHEDULE = "DELETE FROM reviews WHERE question = ?"
+    _SELECT = "SELECT answer FROM cards WHERE question = ?"
+    _EXISTS = "SELECT 1 FROM cards WHERE question = ?"
+    _INSERT = "INSERT INTO cards (question, answer, qkey) VALUES (?, ?, ?)"
+    _UPDATE = "UPDATE cards SET answer = ? WHERE question = ?"
+    _UPSERT = ("INSERT INTO cards (question, answer, qkey) VALUES (?, ?, ?) "
+               "ON CONFLICT(question) DO UPDATE SET answer = excluded.answer")
+    _FIND_KEY = "SELECT question FROM cards WHERE qkey = ? ORDER BY id LIMIT 1"
+    _DELETE = "DELETE FROM cards WHERE question = ?"
+    _COUNT = "SELECT COUNT(*) FROM cards"
+    _MAX_ID = "SELECT MAX(id) FROM cards"
+    _BY_ID = "SELECT question, answer FROM cards WHERE id = ?"
+
+    # shared=True lets other threads use the connection; the caller must then
+    # make sure only one thread uses it at a time (see accounts.DeckRegistry)
+    def __init__(self, path, batch_size=5000, shared=False):
+        self.path = path
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(path, check_same_thread=not shared)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.create_function("question_key", 1, question_key, deterministic=True)
+        with self.connection:
+            self.connection.execute(self._CREATE)
+            # databases from before the qkey column get it filled in once
+            columns = [row[1] for row in self.connection.execute("PRAGMA table_info(cards)")]
+            if "qkey" not in columns:
+                self.connection.execute("ALTER TABLE cards ADD COLUMN qkey TEXT")
+                self.connection.execute("UPDATE cards SET qkey = question_key(question)")
+            self.connection.execute(self._CREATE_KEY_INDEX)
+            self.connection.execute(self._CREATE_REVIEWS)
+        self._count = None
+
+    def __getitem__(self, question):
+        row = self.connection.execute(self._SELECT, (question,)).fetchone()
+        if row is None:
+            raise KeyError(question)
+        return row[0]
+
+    def __contains__(self, question):
+        return self.connection.execute(self._EXISTS, (question,)).fetchone() is not None
+
+    def __setitem__(self, question, answer):
+        with self.connection:
+            if self.connection.execute(self._UPDATE, (answer, question)).rowcount == 0:
+                self.connection.execute(self._INSERT, (question, answer, question_key(question)))
+                if self._count is not None:
+                    self._count += 1
+
+    def __delitem__(self, question):
+        with self.connection:
+            if self.connection.execute(self._DELETE, (question,)).rowcount == 0:
+                raise KeyError(question)
+            self.connection.execute(self._DELETE_SCHEDULE, (question,))
+        if self._count is not None:
+            self._count -= 1
+
+    def __len__(self):
+        if self._count is None:
+            self._count = self.connection.execute(self._COUNT).fetchone()[0]
+        return self._count
+
+    def __iter__(self):
+        for question, _ in self._rows():
+            yield question
+
+    def items(self):
+        return _SQLiteItems(self)
+
+    def values(self):
+        return _SQLiteValues(self)
+
+    # writes the cards in transactions of batch_size rows
+    def update(self, cards=(), **kwargs):
+        if hasattr(cards, "items"):
+            cards = cards.items()
+        batch = []
+        for card in cards:
+            batch.append(card)
+            if len(batch) >= self.batch_size:
+                self._write_batch(batch)
+                batch = []
+        if batch:
+            self._write_batch(batch)
+        if kwargs:
+            self._write_batch(list(kwargs.items()))
+
+    def clear(self):
+        with self.connection:
+            self.connection.execute("DELETE FROM cards")
+            self.connection.execute("DELETE FROM reviews")
+        self._count = 0
+
+    def close(self):
+        self.connection.close()
+
+    # the first question stored under this duplicate key, from the qkey index
+    def find_key(self, key):
+        row = self.connection.execute(self._FIND_KEY, (key,)).fetchone()
+        return None if row is None else row[0]
+
+    # every saved spaced repetition schedule, as (question, CardSchedule)
+    def schedules(self):
+        for question, repetitions, interval, ease, due, lapses, history in \
+                self.connection.execute("SELECT * FROM reviews"):
+            card = CardSchedule()
+            card.repetitions, card.interval, card.ease, card.due, card.lapses = \
+                repetitions, interval, ease, due, lapses
+            card.history = [tuple(review) for review in json.loads(history)]
+            yield question, card
+
+    def save_schedule(self, question, card):
+        with self.connection:
+            self.connection.execute(self._SAVE_SCHEDULE, (
+                question, card.repetitions, card.interval, card.ease, card.due, card.lapses,
+                json.dumps(card.history)))
+
+    # looked up 500 keys per query; rows come newest first so the oldest
+    # question under a key is the one kept
+    def find_keys(self, keys):
+        found = {}
+        keys = list(dict.fromkeys(keys))
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self.connection.execute(
+                f"SELECT qkey, question FROM cards WHERE qkey IN ({','.join('?' * len(chunk))}) "
+                "ORDER BY id DESC", chunk)
+            found.update(rows)
+        return found
+
+    # deletes many questions in one transaction, 500 per statement; returns
+    # the (question, answer) pairs that were deleted
+    def delete_many(self, questions):
+        deleted = []
+        questions = list(dict.fromkeys(questions))
+        with self.connection:
+            for start in range(0, len(questions), 500):
+                chunk = questions[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                deleted.extend(self.connection.execute(
+                    f"SELECT question, answer FROM cards WHERE question IN ({marks})", chunk))
+                self.connection.execute(f"DELETE FROM cards WHERE question IN ({marks})", chunk)
+                self.connection.execute(f"DELETE FROM reviews WHERE question IN ({marks})", chunk)
+        self._count = None
+        return deleted
+
+    # draws ids up to MAX(id) and reads each through the primary key,
+    # drawing again for ids left free by deletions, so a quiz reads k rows
+    # however big the deck is. Once most ids are free it streams the table
+    # through a reservoir instead
+    def sample(self, k, rng=random):
+        count = len(self)
+        if k > count:
+            raise ValueError("Sample larger than population")
+        top = self.connection.execute(self._MAX_ID).fetchone()[0] or 0
+        if count * 2 < top:
+            return reservoir_sample(self._rows(), k, rng)
+        chosen = {}
+        while len(chosen) < k:
+            row_id = rng.randint(1, top)
+            if row_id not in chosen:
+                row = self.connection.execute(self._BY_ID, (row_id,)).fetchone()
+                if row is not None:
+                    chosen[row_id] = row
+        return list(chosen.values())
+
+    # Helper functions
+
+    def _write_batch(self, batch):
+        with self.connection:
+            self.connection.executemany(self._UPSERT, [(question, answer, question_key(question))
+                                                       for question, answer in batch])
+        self._count = None
+
+    # streams (question, answer) rows in insertion order without loading them all
+    def _rows(self):
+        cursor = self.connection.execute("SELECT question, answer FROM cards ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(self.batch_size)
+            if not rows:
+                return
+            yield from rows
+
+
+class _SQLiteItems(ItemsView):
+    def __iter__(self):
+        return self._mapping._rows()
+
+
+class _SQLiteValues(ValuesView):
+    def __iter__(self):
+        for _, answer in self._mapping._rows():
+            yield answer
+
+
+# In-memory cards without a Python object per string. Questions and answers
+# are UTF-8 encoded back to back in one bytearray (the arena); each card is a
+# slot holding four offsets into it plus the question's hash, and an
+# open-addressing table of slot numbers answers lookups. On short cards this
+# takes a little over half the memory of a dict of str objects (see
+# `python benchmark.py memory`). Strings are only decoded when a card is read.
+#
+# Deleted slots and replaced answers leave garbage behind; once it outweighs
+# the live data everything is rewritten in order, so iteration keeps the
+# insertion order a dict would have.
+class CompactStore(MutableMapping):
+
+    _EMPTY = -1
+    _DELETED = -2
+    _MIN_TABLE = 8
+
+    def __init__(self, cards=()):
+        self._reset()
+        self.update(cards)
+
+    def __getitem__(self, question):
+        _, slot = self._probe(question, hash(question))
+        if slot < 0:
+            raise KeyError(question)
+        return self._answer(slot)
+
+    def __contains__(self, question):
+        return self._probe(question, hash(question))[1] >= 0
+
+    def __setitem__(self, question, answer):
+        question_hash = hash(question)
+        index, slot = self._probe(question, question_hash)
+        answer_bytes = answer.encode()
+        if slot >= 0:
+            base = slot * 4
+            self._garbage += self._offsets[base + 3] - self._offsets[base + 2]
+            start = len(self._arena)
+            self._arena += answer_bytes
+            self._offsets[base + 2] = start
+            self._offsets[base + 3] = len(self._arena)
+            if self._garbage > len(self._arena) // 2:
+                self._compact()
+            return
+
+        question_bytes = question.encode()
+        start = len(self._arena)
+        middle = start + len(question_bytes)
+        self._arena += question_bytes
+        self._arena += answer_bytes
+        self._offsets.extend((start, middle, middle, len(self._arena)))
+        self._hashes.append(question_hash)
+        if self._table[index] == self._EMPTY:
+            self._used += 1
+        self._table[index] = len(self._hashes) - 1
+        self._live += 1
+        if self._used * 2 > len(self._table):
+            self._rebuild_table()
+
+    def __delitem__(self, question):
+        index, slot = self._probe(question, hash(question))
+        if slot < 0:
+            raise KeyError(question)
+        base = slot * 4
+        self._table[index] = self._DELETED
+        self._garbage += (self._offsets[base + 1] - self._offsets[base]
+                          + self._offsets[base + 3] - self._offsets[base + 2])
+        self._offsets[base] = -1
+        self._live -= 1
+        if len(self._hashes) - self._live > max(self._live, self._MIN_TABLE):
+            self._compact()
+
+    def __len__(self):
+        return self._live
+
+    def __iter__(self):
+        for slot in range(len(self._hashes)):
+            if self._offsets[slot * 4] >= 0:
+                yield self._question(slot)
+
+    def items(self):
+        return _CompactItems(self)
+
+    def clear(self):
+        self._reset()
+
+    # dead slots are never more than half of all slots (see _compact), so
+    # rejection sampling needs fewer than 2k draws on average
+    def sample(self, k, rng=random):
+        if k > self._live:
+            raise ValueError("Sample larger than population")
+        chosen = {}
+        while len(chosen) < k:
+            slot = rng.randrange(len(self._hashes))
+            if slot not in chosen and self._offsets[slot * 4] >= 0:
+                chosen[slot] = (self._question(slot), self._answer(slot))
+        return list(chosen.values())
+
+    # bytes held by the arena, offsets, hashes and table
+    def nbytes(self):
+        return (len(self._arena) + self._offsets.itemsize * len(self._offsets)
+                + self._hashes.itemsize * len(self._hashes)
+                + self._table.itemsize * len(self._table))
+
+    # Helper functions
+
+    def _reset(self):
+        self._arena = bytearray()
+        self._offsets = array("q")
+        self._hashes = array("q")
+        self._table = array("q", [self._EMPTY]) * self._MIN_TABLE
+        self._live = 0
+        self._used = 0
+        self._garbage = 0
+
+    def _question(self, slot):
+        base = slot * 4
+        return self._arena[self._offsets[base]:self._offsets[base + 1]].decode()
+
+    def _answer(self, slot):
+        base = slot * 4
+        return self._arena[self._offsets[base + 2]:self._offsets[base + 3]].decode()
+
+    # linear probing; returns (table index, slot) when the question is stored,
+    # otherwise (table index to insert at, -1)
+    def _probe(self, question, question_hash):
+        table = self._table
+        mask = len(table) - 1
+        index = question_hash & mask
+        free = -1
+        key = None
+        while True:
+            slot = table[index]
+            if slot == self._EMPTY:
+                return (index if free < 0 else free), -1
+            if slot == self._DELETED:
+                if free < 0:
+                    free = index
+            elif self._hashes[slot] == question_hash:
+                if key is None:
+                    key = question.encode()
+                base = slot * 4
+                if self._arena[self._offsets[base]:self._offsets[base + 1]] == key:
+                    return index, slot
+            index = (index + 1) & mask
+
+    # sizes the table for the live cards (at most half full) and drops tombstones
+    def _rebuild_table(self):
+        size = self._MIN_TABLE
+        while size < self._live * 4:
+            size *= 2
+        table = array("q", [self._EMPTY]) * size
+        mask = size - 1
+        for slot, question_hash in enumerate(self._hashes):
+            if self._offsets[slot * 4] < 0:
+                continue
+            index = question_hash & mask
+            while table[index] != self._EMPTY:
+                index = (index + 1) & mask
+            table[index] = slot
+        self._table = table
+        self._used = self._live
+
+    # rewrites the live cards in order, dropping dead slots and stale bytes
+    def _compact(self):
+        arena = bytearray()
+        offsets = array("q")
+        hashes = array("q")
+        for slot, question_hash in enumerate(self._hashes):
+            base = slot * 4
+            if self._offsets[base] < 0:
+                continue
+            question = self._arena[self._offsets[base]:self._offsets[base + 1]]
+            answer = self._arena[self._offsets[base + 2]:self._offsets[base + 3]]
+            start = len(arena)
+            middle = start + len(question)
+            arena += question
+            arena += answer
+            offsets.extend((start, middle, middle, len(arena)))
+            hashes.append(question_hash)
+        self._arena = arena
+        self._offsets = offsets
+        self._hashes = hashes
+        self._garbage = 0
+        self._rebuild_table()
+
+
+class _CompactItems(ItemsView):
+    def __iter__(self):
+        store = self._mapping
+        for slot in range(len(store._hashes)):
+            if store._offsets[slot * 4] >= 0:
+                yield store._question(slot), store._answer(slot)
+
+
+# Binary deck files, read through mmap so a deck of any size opens without
+# being parsed. Layout (little-endian):
+#
+#   header    magic, version, flags, CRC-32 of everything after the header,
+#             card count, then the file offsets of the three sections below
+#   strings   every question and answer UTF-8 encoded back to back
+#   offsets   count * 2 + 1 uint64; card i is strings[o[2i]:o[2i+1]] (question)
+#             and strings[o[2i+1]:o[2i+2]] (answer)
+#   table     open-addressing hash table of uint32 card number + 1 (0 is
+#             empty), keyed by the CRC-32 of the question's bytes
+#   keys      (version 2) a second table of the same size, keyed by the CRC-32
+#             of the question's search.question_key, for duplicate checks
+#
+# The checksum is written when the file is and only checked on request,
+# since checking it reads the whole file.
+
+BINARY_MAGIC = b"FLSHDECK"
+BINARY_VERSION = 2
+_HEADER = struct.Struct("<8sHHIQQQQQ")
+_FLAG_CHECKSUM = 1
+
+
+def is_binary_deck(path):
+    try:
+        with open(path, "rb") as file:
+            return file.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+    except OSError:
+        return False
+
+
+def _little_endian(values):
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+# writes cards (a mapping or (question, answer) pairs with distinct
+# questions) as a binary deck; returns the number of cards written. The file
+# is written beside path and renamed over it, so a deck that is open through
+# MappedStore can be saved back to its own file
+def write_binary_deck(path, cards, checksum=True):
+    temporary = f"{path}.tmp"
+    try:
+        count = _write_binary_deck(temporary, cards, checksum)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+    return count
+
+
+def _write_binary_deck(path, cards, checksum):
+    if hasattr(cards, "items"):
+        cards = cards.items()
+    offsets = array("Q")
+    hashes = array("I")
+    key_hashes = array("I")
+    crc = 0
+    with open(path, "wb") as file:
+        file.write(bytes(_HEADER.size))
+        position = _HEADER.size
+        strings_start = position
+        chunk = []
+        chunk_bytes = 0
+        for question, answer in cards:
+            question_bytes = question.encode()
+            answer_bytes = answer.encode()
+            offsets.append(position - strings_start)
+            position += len(question_bytes)
+            offsets.append(position - strings_start)
+            position += len(answer_bytes)
+            hashes.append(zlib.crc32(question_bytes))
+            key_hashes.append(zlib.crc32(question_key(question).encode()))
+            chunk.append(question_bytes)
+            chunk.append(answer_bytes)
+            chunk_bytes += len(question_bytes) + len(answer_bytes)
+            if chunk_bytes >= 1 << 20:
+                data = b"".join(chunk)
+                crc = zlib.crc32(data, crc)
+                file.write(data)
+                chunk = []
+                chunk_bytes = 0
+        offsets.append(position - strings_start)
+        padding = b"\0" * (-position % 8)
+        data = b"".join(chunk) + padding
+        crc = zlib.crc32(data, crc)
+        file.write(data)
+        position += len(padding)
+
+        count = len(hashes)
+        size = 8
+        while size < count * 2:
+            size *= 2
+        offsets_start = position
+        table_start = offsets_start + 8 * len(offsets)
+        for section in (offsets, _hash_table(hashes, size), _hash_table(key_hashes, size)):
+            section = _little_endian(section)
+            data = section.tobytes()
+            crc = zlib.crc32(data, crc)
+            file.write(data)
+
+        file.seek(0)
+        file.write(_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, _FLAG_CHECKSUM if checksum else 0,
+                                crc if checksum else 0, count, strings_start, offsets_start,
+                                table_start, size))
+        file.flush()
+        os.fsync(file.fileno())
+    return count
+
+
+# open-addressing table of card number + 1 by hash, with linear probing
+def _hash_table(hashes, size):
+    table = array("I", bytes(4 * size))
+    mask = size - 1
+    for number, card_hash in enumerate(hashes):
+        index = card_hash & mask
+        while table[index]:
+            index = (index + 1) & mask
+        table[index] = number + 1
+    return table
+
+
+# A deck backed by a binary deck file (see write_binary_deck), opened with
+# mmap: opening costs the same at any size, lookups go through the file's hash
+# table and only the cards that are read get decoded. The file itself is never
+# written to; changes are kept in memory on top of it (new cards, replaced
+# answers, deleted questions) until the deck is written out again.
+class MappedStore(MutableMapping):
+
+    def __init__(self, path, verify=False):
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"'{path}' is not a binary deck file")
+        try:
+            self._open(path, verify)
+        except ValueError:
+            self.close()
+            raise
+        self._added = IndexedStore()
+        self._added_keys = DuplicateIndex()
+        self._replaced = {}
+        self._deleted = set()
+
+    def __getitem__(self, question):
+        if question in self._added:
+            return self._added[question]
+        if question in self._replaced:
+            return self._replaced[question]
+        number = self._find(question)
+        if number < 0:
+            raise KeyError(question)
+        return self._answer(number)
+
+    def __contains__(self, question):
+        return question in self._added or self._find(question) >= 0
+
+    def __setitem__(self, question, answer):
+        if question not in self._added and self._find(question, deleted=True) >= 0:
+            self._deleted.discard(question)
+            self._replaced[question] = answer
+        else:
+            if question not in self._added:
+                self._added_keys.add(question)
+            self._added[question] = answer
+
+    def __delitem__(self, question):
+        if question in self._added:
+            del self._added[question]
+            self._added_keys.remove(question)
+        elif self._find(question) >= 0:
+            self._deleted.add(question)
+            self._replaced.pop(question, None)
+        else:
+            raise KeyError(question)
+
+    def __len__(self):
+        return self._visible - len(self._deleted) + len(self._added)
+
+    def __iter__(self):
+        for question, _ in self.items():
+            yield question
+
+    def items(self):
+        return _MappedItems(self)
+
+    def clear(self):
+        self._visible = 0
+        self._added.clear()
+        self._added_keys.clear()
+        self._replaced.clear()
+        self._deleted.clear()
+
+    # draws card numbers across the file and the added cards, skipping
+    # deleted ones; falls back to one reservoir pass once most are deleted
+    def sample(self, k, rng=random):
+        if k > len(self):
+            raise ValueError("Sample larger than population")
+        if len(self._deleted) * 2 > self._visible:
+            return reservoir_sample(self.items(), k, rng)
+        added = self._added._keys
+        chosen = {}
+        while len(chosen) < k:
+            number = rng.randrange(self._visible + len(added))
+            if number in chosen:
+                continue
+            if number >= self._visible:
+                question = added[number - self._visible]
+                chosen[number] = (question, self._added[question])
+                continue
+            card = self._card(number)
+            if card[0] not in self._deleted:
+                chosen[number] = card
+        return list(chosen.values())
+
+    # a slice of the deck in order; with nothing deleted it is read straight
+    # from the offset table instead of walking every card before it
+    def page(self, offset, limit):
+        if self._deleted:
+            return list(itertools.islice(self.items(), offset, offset + limit))
+        cards = [self._card(number) for number in range(offset, min(offset + limit, self._visible))]
+        if len(cards) < limit:
+            start = max(0, offset - self._visible)
+            cards += itertools.islice(self._added.items(), start, start + limit - len(cards))
+        return cards
+
+    # the first question in the deck under this duplicate key: the file's
+    # key table is probed (version 1 files have none, so their questions
+    # are indexed in memory on first use), then the added cards
+    def find_key(self, key):
+        if self._visible:
+            if self._keys is not None:
+                candidates = self._key_candidates(key)
+            else:
+                if self._key_index is None:
+                    self._key_index = DuplicateIndex(self._question(number) for number in range(self._count))
+                candidates = self._key_index.find_all(key)
+            for question in candidates:
+                if self._find(question) >= 0:
+                    return question
+        return self._added_keys.find(key)
+
+    def find_keys(self, keys):
+        found = {}
+        for key in keys:
+            question = self.find_key(key)
+            if question is not None:
+                found[key] = question
+        return found
+
+    # recomputes the checksum over the whole file
+    def verify(self):
+        if not self._flags & _FLAG_CHECKSUM:
+            return True
+        return zlib.crc32(self._map[_HEADER.size:]) == self._checksum
+
+    def close(self):
+        for view in ("_offsets", "_table", "_keys"):
+            if isinstance(getattr(self, view, None), memoryview):
+                getattr(self, view).release()
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Helper functions
+
+    def _open(self, path, verify):
+        if len(self._map) < _HEADER.size:
+            raise ValueError(f"'{path}' is not a binary deck file")
+        (magic, version, self._flags, self._checksum, self._count, self._strings_start,
+         offsets_start, table_start, table_size) = _HEADER.unpack_from(self._map)
+        if magic != BINARY_MAGIC:
+            raise ValueError(f"'{path}' is not a binary deck file")
+        if version not in (1, BINARY_VERSION):
+            raise ValueError(f"'{path}' is binary deck version {version}, expected {BINARY_VERSION}")
+        tables = 2 if version >= 2 else 1
+        if table_start + 4 * table_size * tables > len(self._map) or table_size & (table_size - 1):
+            raise ValueError(f"'{path}' is truncated or corrupt")
+        if verify and not self.verify():
+            raise ValueError(f"'{path}' failed its checksum")
+        view = memoryview(self._map)
+        self._offsets = view[offsets_start:table_start].cast("Q")
+        self._table = view[table_start:table_start + 4 * table_size].cast("I")
+        self._keys = self._key_index = None
+        if tables == 2:
+            self._keys = view[table_start + 4 * table_size:table_start + 8 * table_size].cast("I")
+        view.release()
+        if sys.byteorder == "big":
+            self._offsets = _little_endian(array("Q", self._offsets))
+            self._table = _little_endian(array("I", self._table))
+            if self._keys is not None:
+                self._keys = _little_endian(array("I", self._keys))
+        self._mask = table_size - 1
+        self._visible = self._count
+
+    # the card number of question in the file, or -1; deleted cards count as
+    # missing unless deleted is set
+    def _find(self, question, deleted=False):
+        if not self._visible or (question in self._deleted and not deleted):
+            return -1
+        key = question.encode()
+        table = self._table
+        offsets = self._offsets
+        start = self._strings_start
+        index = zlib.crc32(key) & self._mask
+        while True:
+            entry = table[index]
+            if not entry:
+                return -1
+            number = entry - 1
+            base = number * 2
+            if (offsets[base + 1] - offsets[base] == len(key)
+                    and self._map[start + offsets[base]:start + offsets[base + 1]] == key):
+                return number if number < self._visible else -1
+            index = (index + 1) & self._mask
+
+    # questions in the file whose duplicate key is key, from the key table
+    def _key_candidates(self, key):
+        table = self._keys
+        index = zlib.crc32(key.encode()) & self._mask
+        while table[index]:
+            question = self._question(table[index] - 1)
+            if question_key(question) == key:
+                yield question
+            index = (index + 1) & self._mask
+
+    def _question(self, number):
+        base = number * 2
+        start = self._strings_start
+        return self._map[start + self._offsets[base]:start + self._offsets[base + 1]].decode()
+
+    def _answer(self, number):
+        base = number * 2
+        start = self._strings_start
+        return self._map[start + self._offsets[base + 1]:start + self._offsets[base + 2]].decode()
+
+    def _card(self, number):
+        question = self._question(number)
+        answer = self._replaced.get(question)
+        return question, self._answer(number) if answer is None else answer
+
+
+class _MappedItems(ItemsView):
+    def __iter__(self):
+        store = self._mapping
+        for number in range(store._visible):
+            card = store._card(number)
+            if card[0] not in store._deleted:
+                yield card
+        yield from store._added.items()
+
+
+# Cards on top of a binary deck snapshot (see MappedStore) with every change
+# appended to a journal beside it (<path>.log), so an edit costs one small
+# write however big the deck is. Opening maps the snapshot and replays the
+# journal over it. Once the journal holds more records than the deck has
+# cards (and at least compact_after), the cards are written out as a new
+# snapshot and the journal starts over, which keeps replay short and the
+# cost of compaction spread thin over the edits that caused it.
+#
+# Records carry their length and CRC-32. The journal is fsynced after
+# sync_every records or sync_interval seconds, whichever comes first, and on
+# sync() and close(), so a crash loses at most the edits since the last
+# fsync. A record torn by a crash fails its checksum and is cut off, with
+# anything after it, on the next open. Snapshots are only ever replaced by
+# rename, and replaying a journal over the snapshot it was compacted into
+# gives the same cards again, so a crash in the middle of compaction is
+# harmless too.
+class JournalStore(MutableMapping):
+
+    _SET = 1
+    _DELETE = 2
+    _CLEAR = 3
+    _RECORD = struct.Struct("<II")
+
+    def __init__(self, path, sync_every=64, sync_interval=1.0, compact_after=10000):
+        self.path = path
+        self.journal_path = f"{path}.log"
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.compact_after = compact_after
+        if not os.path.exists(path):
+            write_binary_deck(path, ())
+        self._cards = MappedStore(path)
+        self._records = self._replay()
+        self._journal = open(self.journal_path, "ab")
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def __getitem__(self, question):
+        return self._cards[question]
+
+    def __contains__(self, question):
+        return question in self._cards
+
+    def __setitem__(self, question, answer):
+        self._append(self._record(self._SET, question, answer))
+        self._cards[question] = answer
+        self._written(1)
+
+    def __delitem__(self, question):
+        if question not in self._cards:
+            raise KeyError(question)
+        self._append(self._record(self._DELETE, question))
+        del self._cards[question]
+        self._written(1)
+
+    def __len__(self):
+        return len(self._cards)
+
+    def __iter__(self):
+        return iter(self._cards)
+
+    def items(self):
+        return self._cards.items()
+
+    # a bulk insert is journaled as one write and one fsync
+    def update(self, cards=(), **kwargs):
+        if hasattr(cards, "items"):
+            cards = cards.items()
+        cards = list(cards) + list(kwargs.items())
+        self._append(b"".join(self._record(self._SET, question, answer) for question, answer in cards))
+        for question, answer in cards:
+            self._cards[question] = answer
+        self._written(len(cards), sync=True)
+
+    def clear(self):
+        self._append(self._record(self._CLEAR, ""))
+        self._cards.clear()
+        self._written(1, sync=True)
+        self.compact()
+
+    def sample(self, k, rng=random):
+        return self._cards.sample(k, rng)
+
+    def page(self, offset, limit):
+        return self._cards.page(offset, limit)
+
+    def find_key(self, key):
+        return self._cards.find_key(key)
+
+    def find_keys(self, keys):
+        return self._cards.find_keys(keys)
+
+    # forces journaled edits to disk
+    def sync(self):
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    # writes the cards as a new snapshot and empties the journal
+    def compact(self):
+        self.sync()
+        write_binary_deck(self.path, self._cards.items())
+        self._cards.close()
+        self._cards = MappedStore(self.path)
+        self._journal.truncate(0)
+        self.sync()
+        self._records = 0
+
+    def close(self):
+        if not self._journal.closed:
+            self.sync()
+            self._journal.close()
+            self._cards.close()
+
+    # Helper functions
+
+    def _record(self, operation, question, answer=""):
+        question_bytes = question.encode()
+        payload = (bytes((operation,)) + len(question_bytes).to_bytes(4, "little")
+                   + question_bytes + answer.encode())
+        return self._RECORD.pack(len(payload), zlib.crc32(payload)) + payload
+
+    def _append(self, records):
+        self._journal.write(records)
+
+    def _written(self, count, sync=False):
+        self._records += count
+        self._unsynced += count
+        if (sync or self._unsynced >= self.sync_every
+                or time.monotonic() - self._last_sync >= self.sync_interval):
+            self.sync()
+        if self._records > max(self.compact_after, len(self._cards)):
+            self.compact()
+
+    # applies the journal to the snapshot, truncating it at the first record
+    # that is incomplete or fails its checksum; returns the records applied
+    def _replay(self):
+        try:
+            with open(self.journal_path, "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            return 0
+        position = 0
+        records = 0
+        header = self._RECORD.size
+        while position + header <= len(data):
+            length, checksum = self._RECORD.unpack_from(data, position)
+            payload = data[position + header:position + header + length]
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                break
+            self._apply(payload)
+            position += header + length
+            records += 1
+        if position < len(data):
+            with open(self.journal_path, "r+b") as file:
+                file.truncate(position)
+                os.fsync(file.fileno())
+        return records
+
+    def _apply(self, payload):
+        operation = payload[0]
+        if operation == self._CLEAR:
+            self._cards.clear()
+            return
+        end = 5 + int.from_bytes(payload[1:5], "little")
+        question = payload[5:end].decode()
+        if operation == self._SET:
+            self._cards[question] = payload[end:].decode()
+        else:
+            self._cards.pop(question, None)
@@ -1,130 +1,1000 @@
-from pytest_mock import mocker
-from project import FlashcardDeck
-import pytest
-
-@pytest.fixture()
-def deck():
-    return FlashcardDeck()
-
-# tests add_flashcard
-
-def test_add_flashcard(deck):
-    result_valid = deck.add_flashcard("What is 2 + 2?", "4")
-    assert result_valid == "Flashcard What is 2 + 2? added"
-    assert deck.card_count == 1
-
-    result_noflashcards = deck.add_flashcard("","")
-    assert result_noflashcards == "No question or answer entered"
-    
-    result_invalid_flashcards = deck.add_flashcard(" "," ")
-    assert result_invalid_flashcards == "Invalid question and answer pairing"
-    
-
-# tests update_flashcard
-def test_update_flashcard(deck):
-    deck.add_flashcard("What is the capital of France?", "Paris") 
-    result_valid = deck.update_flashcard("What is the capital of France?", "Lyon")
-    assert result_valid == "Flashcard 'What is the capital of France?' updated!"
-    assert deck.deck["What is the capital of France?"] == "Lyon"
-
-    result_noexist = deck.update_flashcard("What is the capital of Spain?", "Madrid")
-    assert result_noexist == "Flashcard 'What is the capital of Spain?' does not exist"
-
-
-def test_delete_flashcard(deck):
-    deck.add_flashcard("What is the capital of France?", "Paris") 
-    result_valid = deck.delete_card("What is the capital of France?")
-    assert result_valid == "Flashcard 'What is the capital of France?' deleted"
-    assert deck.card_count == 0
-
-    result_noexist = deck.delete_card("What is the capital of India?")
-    assert result_noexist == "Flashcard 'What is the capital of India?' not found in deck"
-
-    result_invalid0 = deck.delete_card("")
-    assert result_invalid0 == "Invalid question format"
-
-    result_invalid1 = deck.delete_card(" ")
-    assert result_invalid1 == "Invalid question format"
-
-def test_delete_deck(deck):
-    deck.add_flashcard("What is the capital of France?", "Paris") 
-    deck.add_flashcard("What is 2+2?", "4")
-
-    result = deck.delete_deck()
-    assert result == "Deck deleted!"
-    assert deck.card_count == 0
-
-def test_delete_deck_invalid(deck):
-    result = deck.delete_deck()
-    assert result == "Deck empty!"
-
-def test_deck_size(deck):
-    assert deck.deck_size() == 0
-    deck.add_flashcard("What is the capital of France?", "Paris") 
-    deck.add_flashcard("What is 2+2?", "4")
-    assert deck.deck_size() == 2
-
-def test_view_deck(deck):
-
-    result = deck.view_deck()
-    assert result == "No cards to show"
-
-    deck.add_flashcard("What is the capital of France?", "Paris") 
-    result_valid = deck.view_deck()
-    assert result_valid == "Q: What is the capital of France? - A: Paris"
-
-def test_quiz_beginner(deck):
-    
-    result_invalid = deck.quiz('beginner')
-    assert result_invalid == "error: Not enough flashcards for beginner level quiz."
-
-    deck.add_flashcard("What is 2+2?", "4")
-    deck.add_flashcard("What is the capital of France?", "Paris")
-    deck.add_flashcard("What is the square root of 16?", "4")
-    deck.add_flashcard("Who wrote '1984'?", "George Orwell")
-    deck.add_flashcard("What is the capital of Spain?", "Madrid")
-    
-    quiz = deck.quiz('beginner', shuffle=False)
-    assert len(quiz['questions']) == 5
-
-def test_quiz_pro_level(deck):
-    
-    for i in range(1, 16):
-        deck.add_flashcard(f"Question {i}", f"Answer {i}")
-        
-    quiz = deck.quiz('pro', shuffle=False)
-    assert len(quiz['questions']) == 15
-
-def test_check_answer(deck):
-    
-    questions = [
-        ("What is 2+2?", "4"),
-        ("What is the capital of France?", "Paris")
-    ]
-    
-    result_correct = deck.check_answer(0, "4", questions)
-    assert result_correct is True
-
-    result_incorrect = deck.check_answer(1, "London", questions)
-    assert result_incorrect is False
-
-def test_upload_deck(deck,mocker):
-    mock_open = mocker.patch("builtins.open", mocker.mock_open(read_data='{"Q1": "A1", "Q2": "A2"}'))
-    mock_json_load = mocker.patch("json.load", return_value={"Q1": "A1", "Q2": "A2"})
-    
-    
-    result = deck.upload_deck("mocked_file.json")
-    
-    assert result == "Deck added!"
-    assert deck.card_count == 2
- 
-def test_add_deck_valid(deck):
-    new_flashcards ={    "What is 2 + 2?": "4",
-    "What is the capital of France?": "Paris",
-    "What is the largest planet?": "Jupiter"
-    }
-    result_valid = deck.add_deck(new_flashcards)
-    assert result_valid ==  "Deck added!"
-    assert deck.card_count == 3
-
-
+from pytest_mock import mocker
+from project import FlashcardDeck, JSONCardStream, read_deck_file, parse_cards, StagedImport
+from storage import SQLiteStore, CompactStore, IndexedStore, MappedStore, JournalStore, reservoir_sample, \
+    write_binary_deck
+import random
+from scheduler import Scheduler, DAY
+from search import SearchIndex, question_key
+from answers import normalize_answer, within_edits, is_correct_answer, answer_kind, DistractorIndex
+import pytest
+import json
+import cli
+import threading
+import sqlite3
+import asyncio
+from accounts import DeckRegistry
+from collection import Collection
+from session import QuizSession, Timers
+import metrics
+import render
+from server import FlashcardServer
+
+@pytest.fixture()
+def deck():
+    return FlashcardDeck()
+
+# tests add_flashcard
+
+def test_add_flashcard(deck):
+    result_valid = deck.add_flashcard("What is 2 + 2?", "4")
+    assert result_valid == "Flashcard What is 2 + 2? added"
+    assert deck.card_count == 1
+
+    result_noflashcards = deck.add_flashcard("","")
+    assert result_noflashcards == "No question or answer entered"
+    
+    result_invalid_flashcards = deck.add_flashcard(" "," ")
+    assert result_invalid_flashcards == "Invalid question and answer pairing"
+    
+
+# tests update_flashcard
+def test_update_flashcard(deck):
+    deck.add_flashcard("What is the capital of France?", "Paris") 
+    result_valid = deck.update_flashcard("What is the capital of France?", "Lyon")
+    assert result_valid == "Flashcard 'What is the capital of France?' updated!"
+    assert deck.deck["What is the capital of France?"] == "Lyon"
+
+    result_noexist = deck.update_flashcard("What is the capital of Spain?", "Madrid")
+    assert result_noexist == "Flashcard 'What is the capital of Spain?' does not exist"
+
+    assert deck.update_flashcard("What is the capital of France?", ["Paris", "Lutetia"]) == \
+        "Flashcard 'What is the capital of France?' updated!"
+    assert deck.deck["What is the capital of France?"] == "Paris | Lutetia"
+    assert deck.update_flashcard("What is the capital of France?", 42) == "Invalid question and answer pairing"
+    assert deck.update_flashcard("What is the capital of France?", "") == "Invalid question and answer pairing"
+    assert deck.add_flashcard("What is 1+1?", {"answer": 2}) == "Invalid question and answer pairing"
+    assert deck.add_flashcard(["What is 1+1?"], "2") == "Invalid question and answer pairing"
+
+def test_delete_flashcard(deck):
+    deck.add_flashcard("What is the capital of France?", "Paris") 
+    result_valid = deck.delete_card("What is the capital of France?")
+    assert result_valid == "Flashcard 'What is the capital of France?' deleted"
+    assert deck.card_count == 0
+
+    result_noexist = deck.delete_card("What is the capital of India?")
+    assert result_noexist == "Flashcard 'What is the capital of India?' not found in deck"
+
+    result_invalid0 = deck.delete_card("")
+    assert result_invalid0 == "Invalid question format"
+
+    result_invalid1 = deck.delete_card(" ")
+    assert result_invalid1 == "Invalid question format"
+
+def test_delete_deck(deck):
+    deck.add_flashcard("What is the capital of France?", "Paris") 
+    deck.add_flashcard("What is 2+2?", "4")
+
+    result = deck.delete_deck()
+    assert result == "Deck deleted!"
+    assert deck.card_count == 0
+
+def test_delete_deck_invalid(deck):
+    result = deck.delete_deck()
+    assert result == "Deck empty!"
+
+def test_deck_size(deck):
+    assert deck.deck_size() == 0
+    deck.add_flashcard("What is the capital of France?", "Paris") 
+    deck.add_flashcard("What is 2+2?", "4")
+    assert deck.deck_size() == 2
+
+def test_view_deck(deck):
+
+    result = deck.view_deck()
+    assert result == "No cards to show"
+
+    deck.add_flashcard("What is the capital of France?", "Paris") 
+    result_valid = deck.view_deck()
+    assert result_valid == "Q: What is the capital of France? - A: Paris"
+
+def test_quiz_beginner(deck):
+    
+    result_invalid = deck.quiz('beginner')
+    assert result_invalid == "error: Not enough flashcards for beginner level quiz."
+
+    deck.add_flashcard("What is 2+2?", "4")
+    deck.add_flashcard("What is the capital of France?", "Paris")
+    deck.add_flashcard("What is the square root of 16?", "4")
+    deck.add_flashcard("Who wrote '1984'?", "George Orwell")
+    deck.add_flashcard("What is the capital of Spain?", "Madrid")
+    
+    quiz = deck.quiz('beginner', shuffle=False)
+    assert len(quiz['questions']) == 5
+
+def test_quiz_pro_level(deck):
+    
+    for i in range(1, 16):
+        deck.add_flashcard(f"Question {i}", f"Answer {i}")
+        
+    quiz = deck.quiz('pro', shuffle=False)
+    assert len(quiz['questions']) == 15
+
+def test_check_answer(deck):
+    
+    questions = [
+        ("What is 2+2?", "4"),
+        ("What is the capital of France?", "Paris")
+    ]
+    
+    result_correct = deck.check_answer(0, "4", questions)
+    assert result_correct is True
+
+    result_incorrect = deck.check_answer(1, "London", questions)
+    assert result_incorrect is False
+
+def test_upload_deck(deck,mocker):
+    mock_open = mocker.patch("builtins.open", mocker.mock_open(read_data='{"Q1": "A1", "Q2": "A2"}'))
+    mock_json_load = mocker.patch("json.load", return_value={"Q1": "A1", "Q2": "A2"})
+    
+    
+    result = deck.upload_deck("mocked_file.json")
+    
+    assert result == "Deck added!"
+    assert deck.card_count == 2
+ 
+def test_upload_deck_shapes(tmp_path):
+    filepath = tmp_path / "deck.json"
+    for text in ('["ab", "cd"]', '[1, 2]', '"Q"', '5'):
+        filepath.write_text(text)
+        deck = FlashcardDeck()
+        assert deck.upload_deck(str(filepath)) == "Invalid JSON format. Please check the file content."
+        assert deck.card_count == 0
+
+    filepath.write_text('{"Q": 5, "Q1": "A1", "Q2": {}, "Q1": "Again", "Q3": ["A3", "B3"], "": "A"}')
+    for stream in (False, True):
+        deck = FlashcardDeck()
+        assert deck.upload_deck(str(filepath), stream=stream) == "Deck added! Skipped 3 malformed entries."
+        assert list(deck.deck.items()) == [("Q1", "A1"), ("Q3", "A3 | B3")]
+        deck = FlashcardDeck()
+        deck.upload_deck(str(filepath), stream=stream, policy="overwrite")
+        assert deck.deck["Q1"] == "Again"
+
+def test_add_deck_valid(deck):
+    new_flashcards ={    "What is 2 + 2?": "4",
+    "What is the capital of France?": "Paris",
+    "What is the largest planet?": "Jupiter"
+    }
+    result_valid = deck.add_deck(new_flashcards)
+    assert result_valid ==  "Deck added!"
+    assert deck.card_count == 3
+
+
+
+def test_upload_deck_stream(deck, tmp_path):
+    filepath = tmp_path / "deck.json"
+    filepath.write_text('{"Q1": "A1", "Q2": 5, "Q3": "A3", "Q4": "", "Q5": {"a": [1, "}"]}, "Q6": "A6"}')
+    calls = []
+
+    result = deck.upload_deck(str(filepath), stream=True, batch_size=2, progress=lambda done, total: calls.append((done, total)))
+
+    assert result == "Deck added! Skipped 3 malformed entries."
+    assert deck.card_count == 3
+    assert deck.deck["Q6"] == "A6"
+    assert calls[-1][0] == calls[-1][1]
+
+def test_upload_deck_stream_small_chunks(deck, tmp_path):
+    filepath = tmp_path / "deck.json"
+    filepath.write_text('{"Capital of \\u00c9ire?": "Dublin", "Temp?": "0°C"}', encoding="utf-8")
+
+    with open(filepath, "rb") as file:
+        cards = list(JSONCardStream(file, chunk_size=3))
+
+    assert cards == [("Capital of Éire?", "Dublin"), ("Temp?", "0°C")]
+
+def test_upload_deck_stream_invalid(deck, tmp_path):
+    filepath = tmp_path / "deck.json"
+    filepath.write_text('["Q1", "A1"]')
+    assert deck.upload_deck(str(filepath), stream=True) == "Invalid JSON format. Please check the file content."
+    assert deck.upload_deck(str(tmp_path / "missing.json"), stream=True) == "File not found. Please check the file path and try again."
+
+def test_add_cards_counts():
+    deck = FlashcardDeck(max_size=3)
+    deck.add_flashcard("Q1", "A1")
+
+    counts = deck.add_cards({"Q1": "A1", "Q2": "A2", "Q3": " ", "Q4": "A4", "Q5": "A5"})
+    assert counts == {"added": 2, "updated": 0, "duplicate": 1, "rejected": 2, "collisions": [("Q1", "Q1")]}
+    assert deck.card_count == 3
+
+    assert deck.add_flashcard("Q6", "A6") == "Deck size reached"
+    assert deck.add_deck({"Q7": "A7"}) == "Deck size cannot exceed 3 flashcards."
+
+def test_deck_capacity(deck):
+    assert deck.max_size == FlashcardDeck.MAX_DECK_SIZE
+    deck.add_cards((f"Question {i}", f"Answer {i}") for i in range(200))
+    assert deck.card_count == 150
+
+    big_deck = FlashcardDeck(max_size=100000)
+    assert big_deck.add_cards((f"Question {i}", f"Answer {i}") for i in range(100000))["added"] == 100000
+
+    with pytest.raises(ValueError):
+        FlashcardDeck(max_size=0)
+
+def test_sqlite_storage(tmp_path):
+    path = str(tmp_path / "cards.db")
+    deck = FlashcardDeck(storage=SQLiteStore(path))
+    deck.add_flashcard("What is 2+2?", "4")
+    deck.add_deck({"What is the capital of France?": "Paris", "What is the largest planet?": "Jupiter"})
+    deck.update_flashcard("What is 2+2?", "four")
+    deck.delete_card("What is the largest planet?")
+    deck.close()
+
+    reopened = FlashcardDeck(storage=SQLiteStore(path))
+    assert reopened.card_count == 2
+    assert reopened.deck["What is 2+2?"] == "four"
+    assert reopened.view_deck() == "Q: What is 2+2? - A: four\nQ: What is the capital of France? - A: Paris"
+    assert reopened.delete_deck() == "Deck deleted!"
+    assert reopened.card_count == 0
+    reopened.close()
+
+def test_sqlite_schedules(tmp_path):
+    path = str(tmp_path / "cards.db")
+    deck = FlashcardDeck(storage=SQLiteStore(path))
+    deck.add_cards({"What is 2+2?": "4", "Capital of France?": "Paris", "Largest planet?": "Jupiter"})
+    deck.record_review("What is 2+2?", True, now=0)
+    deck.record_review("What is 2+2?", True, now=DAY)
+    deck.record_review("Capital of France?", False, now=0)
+    deck.record_review("Largest planet?", True, now=0)
+    deck.delete_card("Largest planet?")
+    deck.close()
+
+    reopened = FlashcardDeck(storage=SQLiteStore(path))
+    card = reopened.scheduler.cards["What is 2+2?"]
+    assert (card.repetitions, card.interval, card.due) == (2, 6, 7 * DAY)
+    assert card.history == [(0, 4), (DAY, 4)]
+    assert "Largest planet?" not in reopened.scheduler
+    assert reopened.due_cards(5, now=2 * DAY) == [("Capital of France?", "Paris")]
+    assert [question for question, _ in reopened.due_cards(5, now=8 * DAY)] == \
+        ["Capital of France?", "What is 2+2?"]
+    reopened.record_review("Capital of France?", True, now=2 * DAY)
+    reopened.delete_deck()
+    reopened.close()
+    assert len(FlashcardDeck(storage=SQLiteStore(path)).scheduler) == 0
+
+def test_compact_storage():
+    deck = FlashcardDeck(max_size=1000, storage=CompactStore())
+    deck.add_deck({f"Question {i}": f"Answer {i}" for i in range(500)})
+    assert deck.add_flashcard("Température de fusion?", "0°C") == "Flashcard Température de fusion? added"
+    assert deck._flashcard_exists("Question 7")
+
+    for i in range(0, 500, 2):
+        deck.delete_card(f"Question {i}")
+    deck.update_flashcard("Question 1", "One")
+
+    assert deck.card_count == 251
+    assert deck.deck["Question 1"] == "One"
+    assert deck.deck["Température de fusion?"] == "0°C"
+    assert "Question 2" not in deck.deck
+    assert list(deck.deck)[:3] == ["Question 1", "Question 3", "Question 5"]
+    assert dict(deck.deck.items()) == {question: deck.deck[question] for question in deck.deck}
+
+def test_deck_pages(deck):
+    for i in range(12):
+        deck.add_flashcard(f"Question {i}", f"Answer {i}")
+
+    assert deck.page(10, 5) == [("Question 10", "Answer 10"), ("Question 11", "Answer 11")]
+    pages = list(deck.iter_pages(page_size=5))
+    assert [len(page) for page in pages] == [5, 5, 2]
+    assert pages[0][0] == ("Question 0", "Answer 0")
+
+    pages = deck.iter_pages(page_size=5)
+    assert len(next(pages)) == 5
+    deck.add_flashcard("Question 12", "Answer 12")
+    deck.delete_card("Question 0")
+    assert [len(page) for page in pages] == [5, 2]
+
+def test_quiz_seeded():
+    first = FlashcardDeck(seed=42)
+    second = FlashcardDeck(seed=42)
+    for fill in (first, second):
+        fill.add_deck({f"Question {i}": f"Answer {i}" for i in range(100)})
+
+    assert first.quiz('pro') == second.quiz('pro')
+    assert len(set(first.quiz('pro')['questions'])) == 15
+
+def test_binary_deck(deck, tmp_path):
+    path = str(tmp_path / "cards.deck")
+    deck.add_cards({f"Question {i}": f"Answer {i} ü" for i in range(100)})
+    assert deck.export_deck(path) == "Deck exported! 100 cards written."
+
+    mapped = FlashcardDeck(storage=MappedStore(path, verify=True), seed=1)
+    assert mapped.card_count == 100
+    assert mapped.deck["Question 42"] == "Answer 42 ü"
+    assert mapped.page(98, 5) == [("Question 98", "Answer 98 ü"), ("Question 99", "Answer 99 ü")]
+    assert len(mapped.quiz('pro')["questions"]) == 15
+    mapped.update_flashcard("Question 1", "New")
+    mapped.delete_card("Question 2")
+    mapped.add_flashcard("Extra", "Card")
+    assert mapped.card_count == 100
+    assert mapped.page(0, 3) == [("Question 0", "Answer 0 ü"), ("Question 1", "New"), ("Question 3", "Answer 3 ü")]
+    assert mapped.export_deck(path) == "Deck exported! 100 cards written."
+    mapped.close()
+
+    copy = FlashcardDeck()
+    assert copy.upload_deck(path) == "Deck added!"
+    assert copy.card_count == 100 and copy.deck["Extra"] == "Card"
+
+    (tmp_path / "bad.deck").write_bytes(b"FLSHDECK" + bytes(10))
+    assert copy.upload_deck(str(tmp_path / "bad.deck")).startswith("Invalid deck file")
+
+def test_store_duplicate_keys(tmp_path):
+    old = sqlite3.connect(str(tmp_path / "old.db"))
+    old.execute("CREATE TABLE cards (id INTEGER PRIMARY KEY, question TEXT NOT NULL UNIQUE, answer TEXT NOT NULL)")
+    old.execute("INSERT INTO cards (question, answer) VALUES ('What is 2+2?', '4')")
+    old.commit()
+    old.close()
+    deck = FlashcardDeck(storage=SQLiteStore(str(tmp_path / "old.db")))
+    assert deck.deck.find_key(question_key("what is 2 + 2")) == "What is 2+2?"
+    assert deck.add_flashcard("WHAT IS 2+2", "four") == "Flashcard with question 'What is 2+2?' already exists."
+    assert deck.add_flashcard("What is 2-2?", "0") == "Flashcard What is 2-2? added"
+    assert deck.add_cards({"what is 2-2": "zero", "New?": "x"})["collisions"] == [("what is 2-2", "What is 2-2?")]
+    assert deck._duplicates is None
+    deck.close()
+
+    path = str(tmp_path / "cards.deck")
+    write_binary_deck(path, {f"Question {i}?": "A" for i in range(50)})
+    mapped = MappedStore(path)
+    assert mapped.find_key(question_key("question 7")) == "Question 7?"
+    del mapped["Question 7?"]
+    assert mapped.find_key(question_key("question 7")) is None
+    mapped["question 7"] = "B"
+    assert mapped.find_key(question_key("Question 7?")) == "question 7"
+    assert mapped.find_key(question_key("Question 70?")) is None
+    mapped.close()
+
+    # version 1 files have no key table and are indexed in memory instead
+    with open(path, "r+b") as file:
+        file.seek(8)
+        file.write((1).to_bytes(2, "little"))
+    with MappedStore(path) as mapped:
+        assert mapped.find_key(question_key("question 8")) == "Question 8?"
+
+def test_journal_store(tmp_path):
+    path = str(tmp_path / "cards.deck")
+    deck = FlashcardDeck(storage=JournalStore(path, sync_every=1, compact_after=5))
+    deck.add_cards({f"Question {i}": f"Answer {i}" for i in range(3)})
+    deck.update_flashcard("Question 0", "New")
+    deck.delete_card("Question 1")
+    deck.close()
+
+    # a record torn by a crash is dropped, the ones before it are kept
+    with open(path + ".log", "ab") as file:
+        file.write(b"\x40\x00\x00\x00garbage")
+    store = JournalStore(path, sync_every=1, compact_after=5)
+    assert dict(store.items()) == {"Question 0": "New", "Question 2": "Answer 2"}
+    for i in range(10):
+        store[f"Extra {i}"] = "Card"
+    # the journal outgrew the deck and was compacted into the snapshot
+    with MappedStore(path) as snapshot:
+        assert "Extra 0" in snapshot
+    del store["Extra 0"]
+    # not closed, as if the process had died
+    store._journal.flush()
+
+    store = JournalStore(path)
+    assert len(store) == 11 and store["Question 0"] == "New" and "Extra 0" not in store
+    store.clear()
+    store.close()
+    assert len(JournalStore(path)) == 0
+
+def test_indexed_store_delete():
+    store = IndexedStore({f"Question {i}": f"Answer {i}" for i in range(10)})
+    del store["Question 0"]
+    del store["Question 9"]
+    del store["Question 4"]
+
+    assert len(store) == 7
+    assert sorted(store.sample(7, random.Random(1))) == sorted(store.items())
+    assert list(store)[0] == "Question 1"
+
+@pytest.mark.parametrize("store", [CompactStore, dict])
+def test_sample_other_stores(store):
+    deck = FlashcardDeck(max_size=1000, storage=store(), seed=3)
+    deck.add_deck({f"Question {i}": f"Answer {i}" for i in range(300)})
+    for i in range(0, 300, 3):
+        deck.delete_card(f"Question {i}")
+
+    questions = deck.quiz('mid')['questions']
+    assert len(set(questions)) == 10
+    assert all(deck.deck[question] == answer for question, answer in questions)
+
+def test_sqlite_sample(tmp_path):
+    store = SQLiteStore(str(tmp_path / "cards.db"))
+    store.update({f"Question {i}": f"Answer {i}" for i in range(100)})
+    for i in range(0, 100, 3):
+        del store[f"Question {i}"]
+    picked = store.sample(15, random.Random(2))
+    assert len(set(picked)) == 15 and all(store[question] == answer for question, answer in picked)
+    assert sorted(store.sample(len(store), random.Random(3))) == sorted(store.items())
+    for i in range(100):
+        if i % 10:
+            store.pop(f"Question {i}", None)
+    picked = store.sample(5, random.Random(4))
+    assert len(set(picked)) == 5 and set(picked) <= set(store.items())
+    with pytest.raises(ValueError):
+        store.sample(50)
+    store.close()
+
+def test_reservoir_sample():
+    rng = random.Random(7)
+    assert sorted(reservoir_sample(range(5), 10, rng)) == [0, 1, 2, 3, 4]
+    picked = reservoir_sample(range(100000), 15, rng)
+    assert len(set(picked)) == 15
+    assert all(0 <= item < 100000 for item in picked)
+
+def test_scheduler_intervals():
+    scheduler = Scheduler()
+    assert scheduler.record("Q1", True, now=0).interval == 1
+    assert scheduler.record("Q1", True, now=DAY).interval == 6
+    card = scheduler.record("Q1", False, now=7 * DAY)
+    assert card.interval == 1 and card.repetitions == 0 and card.lapses == 1
+    assert len(card.history) == 3
+
+    scheduler.record("Q2", False, now=0)
+    scheduler.record("Q2", False, now=0)
+    assert scheduler.due(5, now=0) == []
+    assert scheduler.due(5, now=8 * DAY) == ["Q2", "Q1"]
+    assert scheduler.due(1, now=8 * DAY) == ["Q2"]
+
+    scheduler.forget("Q2")
+    assert scheduler.due(5, now=8 * DAY) == ["Q1"]
+
+def test_quiz_scheduled(deck):
+    for i in range(20):
+        deck.add_flashcard(f"Question {i}", f"Answer {i}")
+    questions = [("Question 3", "Answer 3"), ("Question 8", "Answer 8")]
+    deck.check_answer(0, "wrong", questions)
+    deck.check_answer(1, "answer 8", questions)
+    assert len(deck.scheduler) == 2
+
+    assert deck.due_cards(5, now=2 * 10**10) == [("Question 3", "Answer 3"), ("Question 8", "Answer 8")]
+    deck.record_review("Question 3", False, now=0)
+    quiz = deck.quiz('beginner', scheduled=True)
+    assert quiz['questions'][0] == ("Question 3", "Answer 3")
+    assert len(set(quiz['questions'])) == 5
+
+    deck.delete_card("Question 3")
+    assert "Question 3" not in deck.scheduler
+
+def test_quiz_session(deck):
+    deck.add_cards({f"Question {i}": f"Answer {i}" for i in range(5)})
+    now = [0.0]
+    timers = Timers(clock=lambda: now[0])
+    events = []
+    session = deck.quiz_session('beginner', schedule=timers.schedule_once, clock=lambda: now[0],
+                                on_question=lambda s: events.append(s.question),
+                                on_finish=lambda s: events.append(s.reason)).start()
+    assert events == [session.questions[0][0]]
+    now[0] = 2.5
+    assert session.answer(session.questions[0][1]) is True
+    now[0] = 3.0
+    assert session.answer("wrong") is False
+    assert session.results[1] == (session.questions[1][0], False, 0.5)
+    assert deck.response_times.get(session.questions[0][0]).mean == 2.5
+    assert session.remaining() == 57.0
+
+    # nobody answers: the timer ends the session at the deadline
+    now[0] = 59.9
+    assert timers.run() == 0
+    now[0] = 60.0
+    assert timers.run() == 1
+    assert session.finished and session.reason == "timeout" and events[-1] == "timeout"
+    assert session.score == 1 and session.answer("late") is None
+
+    session = QuizSession(deck, deck.page(0, 2), 60, timers.schedule_once).start()
+    session.answer("Answer 0")
+    session.answer("Answer 1")
+    assert session.reason == "completed" and session.score == 2
+    assert deck.quiz_session('pro') == "error: Not enough flashcards for pro level quiz."
+
+def test_metrics(deck, tmp_path):
+    original = FlashcardDeck.quiz
+    metrics.METRICS.reset()
+    metrics.enable()
+    try:
+        assert FlashcardDeck.quiz is not original
+        deck.add_flashcard("Q", "A")
+        deck.quiz('beginner')
+        with pytest.raises(ValueError):
+            deck.search("Q", mode="nope")
+    finally:
+        metrics.disable()
+    assert FlashcardDeck.quiz is original
+    deck.quiz('beginner')
+
+    text = metrics.METRICS.render()
+    assert '# TYPE flashcard_deck_operation_seconds histogram' in text
+    assert 'flashcard_deck_operation_seconds_count{operation="quiz"} 1' in text
+    assert 'flashcard_deck_operation_seconds_bucket{operation="add_flashcard",le="+Inf"} 1' in text
+    assert 'flashcard_deck_operation_errors_total{operation="search"} 1' in text
+    metrics.METRICS.write(str(tmp_path / "metrics.prom"))
+    assert (tmp_path / "metrics.prom").read_text() == text
+
+    metrics.start_profile()
+    deck.view_deck()
+    assert metrics.profiling()
+    metrics.stop_profile(str(tmp_path / "run.prof"))
+    assert not metrics.profiling() and (tmp_path / "run.prof").exists()
+
+def test_multiple_choice(deck):
+    assert [answer_kind(a) for a in ("42", "1,000.5", "Marie Curie", "blue whale", "a long answer of words")] == \
+        ["number", "number", "name", "short", "long"]
+    deck.add_cards({f"{n} squared?": str(n * n) for n in range(2, 9)})
+    quiz = deck.quiz('beginner', choices=4)
+    for (question, answer), options in zip(quiz["questions"], quiz["choices"]):
+        assert len(set(options)) == 4 and answer in options
+        assert all(answer_kind(option) == "number" for option in options)
+
+    # the index follows adds, updates and deletes
+    deck.add_cards({"Capital of France?": "Paris | City of Light", "Capital of Italy?": "Rome"})
+    deck.update_flashcard("2 squared?", "Four")
+    deck.delete_card("Capital of Italy?")
+    options = deck.quiz('beginner', choices=8)["choices"][0]
+    assert "Rome" not in options and "4" not in options
+    assert deck._choices("Lima", 3) and set(deck._choices("Lima", 3)) & {"Paris", "Four"}
+
+    session = deck.quiz_session('beginner', choices=3).start()
+    assert len(session.options) == 3
+    assert session.answer(session.questions[0][1].split(" | ")[0]) is True
+
+def test_distractor_index():
+    index = DistractorIndex(["Paris", "paris", "Rome", "Oslo"])
+    assert len(index) == 3
+    index.remove("Paris")
+    assert len(index) == 3
+    index.remove("paris")
+    assert len(index) == 2
+    assert sorted(index.distractors("Bern", 5, random.Random(1))) == ["Oslo", "Rome"]
+    assert index.distractors("rome", 5, random.Random(1)) == ["Oslo"]
+
+def test_search(deck):
+    deck.add_flashcard("What is the capital of France?", "Paris")
+    deck.add_flashcard("What is the capital of Spain?", "Madrid")
+    deck.add_flashcard("Who wrote 'Hamlet'?", "Shakespeare")
+
+    assert deck.search("what is the  CAPITAL of france?", mode="exact") == [("What is the capital of France?", "Paris")]
+    assert [question for question, _ in deck.search("what is", mode="prefix")] == ["What is the capital of France?", "What is the capital of Spain?"]
+    assert deck.search("capital madrid") == [("What is the capital of Spain?", "Madrid")]
+
+    deck.add_deck({"What is 2+2?": "4"})
+    deck.update_flashcard("What is the capital of Spain?", "Barcelona")
+    deck.delete_card("What is the capital of France?")
+
+    assert deck.search("madrid") == []
+    assert deck.search("barcelona") == [("What is the capital of Spain?", "Barcelona")]
+    assert deck.search("what is", mode="prefix") == [("What is 2+2?", "4"), ("What is the capital of Spain?", "Barcelona")]
+    assert deck.search("paris") == []
+
+    deck.delete_deck()
+    assert deck.search("hamlet") == []
+
+def test_search_index_prefix_after_remove():
+    index = SearchIndex((f"Question {i}", f"Answer {i}") for i in range(20))
+    index.remove("Question 1", "Answer 1")
+    index.add("Question 100", "Answer 100")
+    assert index.prefix("question 1") == ["Question 10", "Question 100", "Question 11", "Question 12", "Question 13",
+                                          "Question 14", "Question 15", "Question 16", "Question 17", "Question 18",
+                                          "Question 19"]
+
+def test_check_answer_normalized(deck):
+    questions = [
+        ("Who painted the Mona Lisa?", "Leonardo da Vinci"),
+        ("What is the capital of France?", "Paris | Lutetia"),
+        ("Who wrote 'Hamlet'?", "Shakespeare"),
+        ("What is 2+2?", "4"),
+    ]
+    assert deck.check_answer(0, "  leonardo DA vinci. ", questions) is True
+    assert deck.check_answer(1, "Lutetia", questions) is True
+    assert deck.check_answer(2, "Shakespear", questions) is False
+    assert deck.check_answer(2, "Shakespear", questions, max_edits=2) is True
+    assert deck.check_answer(3, "5", questions, max_edits=2) is False
+    assert deck.check_answers(["leonardo da vinci", "rome", "shakespeare", "4"], questions) == [True, False, True, True]
+
+def test_answer_helpers():
+    assert normalize_answer("ＰＡＲＩＳ!  Ｆrance") == "paris france"
+    assert within_edits("kitten", "sitting", 3) is True
+    assert within_edits("kitten", "sitting", 2) is False
+    assert is_correct_answer("h2o", "H₂O") is True
+
+def test_numeric_answers():
+    for wrong, answer in (("3", "-3"), ("35", "3.5"), ("15", "1.5"), ("12", "1/2"), ("3", "3-4")):
+        assert is_correct_answer(wrong, answer) is False
+        assert is_correct_answer(wrong, answer, max_edits=2) is False
+    assert is_correct_answer(" -3. ", "-3") is True
+    assert is_correct_answer("3.5!", "3.5") is True
+    assert is_correct_answer("1/2", "1/2 | 0.5") is True and is_correct_answer("0.5", "1/2 | 0.5") is True
+    assert normalize_answer("It is -3, not 3.") == "it is -3 not 3"
+
+def test_multiple_answers(deck, tmp_path):
+    deck.add_flashcard("What is H2O commonly known as?", ["Water", "Dihydrogen monoxide"])
+    assert deck.deck["What is H2O commonly known as?"] == "Water | Dihydrogen monoxide"
+
+    filepath = tmp_path / "deck.json"
+    filepath.write_text('{"Capital of France?": ["Paris", "Lutetia"], "Bad": ["Paris", 1]}')
+    assert deck.upload_deck(str(filepath), stream=True) == "Deck added! Skipped 1 malformed entries."
+    assert deck.check_answer(0, "lutetia", [("Capital of France?", deck.deck["Capital of France?"])]) is True
+
+def test_read_deck_file(deck, tmp_path):
+    filepath = tmp_path / "deck.json"
+    filepath.write_text(json.dumps({f"Question {i}": f"Answer {i}" for i in range(25)} | {"Bad": 1}))
+    calls = []
+
+    cards, skipped = read_deck_file(str(filepath), batch_size=10, progress=lambda done, total: calls.append(done))
+    assert len(cards) == 25 and skipped == 1
+    assert len(calls) == 3
+    assert deck.card_count == 0
+
+    assert read_deck_file(str(filepath), batch_size=10, cancelled=lambda: True) is None
+
+    batches = []
+    cards, skipped = read_deck_file(str(filepath), batch_size=10, on_batch=batches.append)
+    assert cards == [] and skipped == 1
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+
+def test_staged_import(tmp_path):
+    deck = FlashcardDeck(max_size=5, storage=SQLiteStore(str(tmp_path / "cards.db")))
+    deck.add_flashcard("Old", "Answer")
+    staged = StagedImport(deck)
+    staged.add([("New 1", "Answer 1"), ("Old", "Changed"), ("New 1", "Again")])
+    staged.add([("New 2", "Answer 2")])
+    assert deck.card_count == 3 and deck.deck["Old"] == "Answer"
+    staged.rollback()
+    assert list(deck.deck.items()) == [("Old", "Answer")]
+    assert deck.search("New", mode="prefix") == []
+
+    staged.add([(f"New {i}", "Answer") for i in range(6)])
+    assert staged.commit(skipped=2) == "Deck size cannot exceed 5 flashcards."
+    staged.rollback()
+    assert deck.card_count == 5
+    staged = StagedImport(deck)
+    staged.add([("Old", "Answer")])
+    assert staged.commit(skipped=2) == "Deck added! Skipped 2 malformed entries."
+    deck.close()
+
+def test_delete_cards(tmp_path):
+    for storage in (None, SQLiteStore(str(tmp_path / "cards.db"))):
+        deck = FlashcardDeck(max_size=2000, storage=storage)
+        deck.add_cards((f"Question {i}", f"Answer {i}") for i in range(1200))
+        deck.record_review("Question 3", True)
+        assert deck.search("Question 1", mode="prefix")
+        assert deck.delete_cards([f"Question {i}" for i in range(1, 1200)] + ["Question 5", "Missing"]) == 1199
+        assert list(deck.deck.items()) == [("Question 0", "Answer 0")]
+        assert deck.search("Question", mode="prefix") == [("Question 0", "Answer 0")]
+        assert deck.search("answer", mode="text") == [("Question 0", "Answer 0")]
+        assert deck.view_deck() == "Q: Question 0 - A: Answer 0"
+        deck.close()
+    assert list(SQLiteStore(str(tmp_path / "cards.db")).schedules()) == []
+
+def write_decks(tmp_path):
+    (tmp_path / "one.json").write_text(json.dumps({f"Question {i}": f"Answer {i}" for i in range(6)}))
+    (tmp_path / "two.json").write_text(json.dumps({"Question 0": "Other", "Question 9": "Answer 9"}))
+    (tmp_path / "bad.json").write_text('{"Question 1": 1}')
+    return [str(tmp_path / name) for name in ("one.json", "two.json", "bad.json")]
+
+def test_cli_validate_and_quiz(tmp_path, capsys):
+    one, two, bad = write_decks(tmp_path)
+
+    assert cli.main(["--jobs", "1", "validate", one, two]) == 0
+    assert cli.main(["--jobs", "1", "validate", one, bad]) == 1
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert records[0] == {"file": one, "status": "ok", "cards": 6, "duplicates": 0, "rejected": 0, "skipped": 0}
+    assert records[-1]["status"] == "error" and records[-1]["skipped"] == 1
+
+    assert cli.main(["--jobs", "1", "validate", str(tmp_path), one]) == 1
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert records[0] == {"file": str(tmp_path), "status": "error", "error": "Could not read file: Is a directory"}
+    assert records[1]["status"] == "ok"
+
+    assert cli.main(["--jobs", "1", "quiz", "--seed", "3", one]) == 0
+    assert cli.main(["--jobs", "1", "quiz", "--seed", "3", one]) == 0
+    first, second = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert len(first["questions"]) == 5
+    assert first == second
+
+def test_cli_merge_and_export(tmp_path, capsys):
+    one, two, _ = write_decks(tmp_path)
+    merged = tmp_path / "merged.json"
+
+    assert cli.main(["--jobs", "2", "merge", "-o", str(merged), "--drop", "Question 5", one, two]) == 0
+    summary = json.loads(capsys.readouterr().out.splitlines()[-1])
+    assert summary["cards"] == 6 and summary["duplicates"] == 1
+    assert "Question 5" not in json.loads(merged.read_text())
+
+    assert cli.main(["--jobs", "1", "export", "--format", "txt", "-o", str(tmp_path / "out"), two]) == 0
+    assert (tmp_path / "out" / "two.txt").read_text() == "Q: Question 0 - A: Other\nQ: Question 9 - A: Answer 9\n"
+
+def test_parse_cards():
+    text = "What time is lunch?: 12:30\n\nhttp?: https://example.com\nno separator here\n: no question\nEmpty answer:  \n"
+    cards, errors = parse_cards(text)
+    assert cards == [("What time is lunch?", "12:30"), ("http?", "https://example.com")]
+    assert [number for number, _ in errors] == [4, 5, 6]
+
+    cards, errors = parse_cards("Q1 = A1\nQ2 = A2 = B2", separator="=")
+    assert cards == [("Q1", "A1"), ("Q2", "A2 = B2")]
+
+def test_parse_cards_csv():
+    cards, errors = parse_cards('"Capital, France?",Paris,Lutetia\nQ2,A2\nonly question\n', format="csv")
+    assert cards == [("Capital, France?", "Paris | Lutetia"), ("Q2", "A2")]
+    assert errors == [(3, "expected a question and an answer column")]
+
+    cards, errors = parse_cards("Q1\tA1\nQ2\t\n", format="tsv")
+    assert cards == [("Q1", "A1")] and len(errors) == 1
+
+def test_normalized_duplicates(deck):
+    deck.add_flashcard("What is 2+2?", "4")
+    assert question_key("what is 2 + 2 ?") == question_key("What is 2+2?")
+    assert deck.add_flashcard("what is 2 + 2 ?", "four") == "Flashcard with question 'What is 2+2?' already exists."
+
+    counts = deck.add_cards({"WHAT IS 2+2": "Four", "Capital of France?": "Paris", "capital of  france": "Lutetia"})
+    assert counts["added"] == 1 and counts["duplicate"] == 2
+    assert counts["collisions"] == [("WHAT IS 2+2", "What is 2+2?"), ("capital of  france", "Capital of France?")]
+
+    deck.delete_card("What is 2+2?")
+    assert deck.add_flashcard("what is 2 + 2 ?", "4") == "Flashcard what is 2 + 2 ? added"
+
+def test_symbols_are_not_duplicates(deck):
+    for first, second in (("What is 2+2?", "What is 2-2?"), ("What is 2+2?", "What is 2*2?"),
+                          ("What is 2+2?", "What is 22?"), ("What is 2*2?", "What is 22?"),
+                          ("Is 5 > 3?", "Is 5 < 3?"), ("What is C++?", "What is C?"),
+                          ("x^2 derivative?", "x2 derivative?"), ("Round 3.5?", "Round 35?"),
+                          ("What is -3 squared?", "What is 3 squared?")):
+        assert question_key(first) != question_key(second)
+        deck.add_flashcard(first, "a")
+        assert deck.add_flashcard(second, "b") == f"Flashcard {second} added"
+        deck.delete_deck()
+    assert question_key("Who's there?") == question_key("whos  there")
+
+def test_duplicate_policies(deck):
+    deck.add_flashcard("What is 2+2?", "4")
+
+    counts = deck.add_cards({"what is 2+2": "four"}, policy="overwrite")
+    assert counts["updated"] == 1 and counts["added"] == 0
+    assert deck.deck["What is 2+2?"] == "four"
+
+    counts = deck.add_cards({"what is 2+2": "IV", "What is 2+2?": "4"}, policy="keep-both")
+    assert counts["added"] == 1 and counts["duplicate"] == 1
+    assert deck.card_count == 2
+
+    deck.delete_card("What is 2+2?")
+    assert deck.add_flashcard("WHAT IS 2+2?", "4") == "Flashcard with question 'what is 2+2' already exists."
+
+    with pytest.raises(ValueError):
+        deck.add_cards({}, policy="merge")
+
+def test_deck_registry(tmp_path):
+    registry = DeckRegistry(str(tmp_path), max_open=2)
+    with registry.deck("alice", "chemistry") as deck:
+        deck.add_flashcard("H2O?", "Water")
+    with registry.deck("alice") as deck:
+        deck.add_flashcard("2+2?", "4")
+    with registry.deck("bob") as deck:
+        deck.add_flashcard("Capital of France?", "Paris")
+
+    assert registry.open_count() == 2
+    assert registry.users() == ["alice", "bob"]
+    assert registry.decks("alice") == ["chemistry", "default"]
+    with registry.deck("alice", "chemistry") as deck:
+        assert deck.deck["H2O?"] == "Water"
+
+    with pytest.raises(ValueError):
+        with registry.deck("../etc"):
+            pass
+    registry.remove_deck("bob")
+    assert registry.decks("bob") == []
+    registry.close()
+
+def test_deck_registry_threads(tmp_path):
+    registry = DeckRegistry(str(tmp_path), max_open=1, max_size=1000)
+
+    def work(user):
+        for i in range(50):
+            with registry.deck(user) as deck:
+                deck.add_flashcard(f"Question {i}", f"Answer {i}")
+
+    threads = [threading.Thread(target=work, args=(f"user{n % 3}",)) for n in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for n in range(3):
+        with registry.deck(f"user{n}") as deck:
+            assert deck.card_count == 50
+    registry.close()
+
+def test_server(tmp_path):
+    registry = DeckRegistry(str(tmp_path), max_size=1000)
+
+    async def request(reader, writer, method, path, data=None):
+        body = json.dumps(data).encode() if data is not None else b""
+        writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+        status = int((await reader.readline()).split()[1])
+        length = 0
+        while (line := await reader.readline()) != b"\r\n":
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":")[1])
+        return status, json.loads(await reader.readexactly(length))
+
+    async def session():
+        server = await FlashcardServer(registry).start("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        assert await request(reader, writer, "POST", "/alice/default/cards",
+                             {"question": "Capital of France?", "answer": "Paris"}) == \
+            (200, {"result": "Flashcard Capital of France? added"})
+        await request(reader, writer, "POST", "/alice/default/cards", {"question": "2+2?", "answer": "4"})
+        assert (await request(reader, writer, "GET", "/alice/default/quiz?level=beginner"))[0] == 400
+        for i in range(3):
+            await request(reader, writer, "POST", "/alice/default/cards", {"question": f"Q{i}", "answer": "A"})
+
+        status, quiz = await request(reader, writer, "GET", "/alice/default/quiz?level=beginner")
+        assert status == 200 and len(quiz["questions"]) == 5
+        status, result = await request(reader, writer, "POST", "/alice/default/check", {"answers": [
+            {"question": "Capital of France?", "answer": "paris"},
+            {"question": "2+2?", "answer": "5"},
+            {"question": "Unknown?", "answer": "x"}]})
+        assert result == {"results": [True, False, None]}
+
+        status, result = await request(reader, writer, "GET", "/alice/default/search?q=france")
+        assert result == {"cards": [["Capital of France?", "Paris"]]}
+        assert (await request(reader, writer, "GET", "/alice/default/nothing"))[0] == 404
+        assert (await request(reader, writer, "GET", "/alice/default/cards"))[0] == 405
+        assert (await request(reader, writer, "POST", "/alice/default/cards", {"question": "Q"}))[0] == 400
+        writer.close()
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(session())
+    registry.close()
+
+def test_server_runs_decks_side_by_side(tmp_path):
+    registry = DeckRegistry(str(tmp_path), max_size=1000)
+    flashcard_server = FlashcardServer(registry)
+    release = threading.Event()
+    flashcard_server.routes[("GET", "wait")] = lambda deck, params, data: {"released": release.wait(5)}
+
+    async def request(port, path):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET {path} HTTP/1.1\r\nConnection: close\r\n\r\n".encode())
+        response = await reader.read()
+        writer.close()
+        return json.loads(response.split(b"\r\n\r\n", 1)[1])
+
+    async def session():
+        server = await flashcard_server.start("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        waiting = asyncio.ensure_future(request(port, "/alice/default/wait"))
+        assert await asyncio.wait_for(request(port, "/bob/default/search?q=x"), 5) == {"cards": []}
+        assert not waiting.done()
+        release.set()
+        assert await waiting == {"released": True}
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(session())
+    flashcard_server.close()
+    registry.close()
+
+def test_render_cache(deck, tmp_path, monkeypatch):
+    monkeypatch.setattr(render, "CHUNK_SIZE", 4)
+    deck.max_size = 100
+    deck.add_cards({f"Question {i}": f"Answer {i}" for i in range(10)})
+    expected = "\n".join(f"Q: Question {i} - A: Answer {i}" for i in range(10))
+    assert deck.view_deck() == expected
+    generation = deck._rendered.generation
+    assert deck.view_deck() is deck.view_deck() and deck._rendered.generation == generation
+
+    deck.update_flashcard("Question 5", "Five")
+    deck.delete_card("Question 2")
+    deck.add_flashcard("Question 10", "Answer 10")
+    assert deck.view_deck() == "\n".join(f"Q: {question} - A: {answer}" for question, answer in deck.deck.items())
+    assert deck.render_page(3, 4) == "Q: Question 4 - A: Answer 4\nQ: Question 5 - A: Five\n" \
+        "Q: Question 6 - A: Answer 6\nQ: Question 7 - A: Answer 7"
+    assert deck.render_page(9, 50) == "Q: Question 10 - A: Answer 10"
+    assert deck.render_page(50, 5) == ""
+
+    for question in ("Question 0", "Question 1", "Question 3"):
+        deck.delete_card(question)
+    assert deck.render_page(0, 2) == "Q: Question 4 - A: Answer 4\nQ: Question 5 - A: Five"
+    assert deck.export_text(str(tmp_path / "deck.txt")) == "Deck exported! 7 cards written."
+    assert (tmp_path / "deck.txt").read_text(encoding="utf-8") == deck.view_deck() + "\n"
+    deck.delete_deck()
+    assert deck.view_deck() == "No cards to show" and deck.render_page(0, 5) == ""
+
+def test_render_mapped_deck(tmp_path, monkeypatch):
+    monkeypatch.setattr(render, "CHUNK_SIZE", 4)
+    path = str(tmp_path / "cards.deck")
+    write_binary_deck(path, {"a": "1", "b": "2", "c": "3"})
+    deck = FlashcardDeck(storage=MappedStore(path))
+    deck.delete_card("a")
+    deck.add_flashcard("a", "one")
+    deck.add_flashcard("d", "4")
+    lines = [f"Q: {question} - A: {answer}" for question, answer in deck.deck.items()]
+    assert lines[0] == "Q: a - A: one"
+    assert deck.view_deck() == "\n".join(lines)
+    assert deck.render_page(1, 2) == "\n".join(lines[1:3])
+    assert deck._rendered is None
+    assert deck.export_text(str(tmp_path / "deck.txt")) == "Deck exported! 4 cards written."
+    assert (tmp_path / "deck.txt").read_text(encoding="utf-8") == "\n".join(lines) + "\n"
+    deck.close()
+
+def test_tags_and_select(deck):
+    deck.max_size = 100
+    deck.add_cards({f"Element {i}?": f"Symbol {i}" for i in range(10)})
+    assert deck.tag_card("Element 0?", ["Chemistry", "basics"]) == "Flashcard 'Element 0?' tagged"
+    for i in range(1, 6):
+        deck.tag_card(f"Element {i}?", " chemistry ")
+    assert deck.tag_card("Missing?", "chemistry") == "Flashcard 'Missing?' not found in deck"
+    assert deck.tag_card("Element 1?", ["  "]) == "Invalid tag"
+    assert deck.tags.tags("Element 0?") == ["basics", "chemistry"]
+    assert deck.tags.counts() == {"chemistry": 6, "basics": 1}
+
+    assert deck.select(tags=["CHEMISTRY"]) == [f"Element {i}?" for i in range(6)]
+    assert deck.select(tags=["chemistry", "basics"]) == ["Element 0?"]
+    assert deck.select(tags=["chemistry"], exclude=["basics"]) == [f"Element {i}?" for i in range(1, 6)]
+    assert deck.select(any_tags=["basics", "unknown"]) == ["Element 0?"]
+    assert len(deck.select(exclude=["chemistry"])) == 4
+
+    for _ in range(4):
+        deck.record_review("Element 1?", True)
+    assert deck.scheduler.cards["Element 1?"].interval >= deck.scheduler.MASTERED_INTERVAL
+    assert deck.select(tags=["chemistry"], mastered=True) == ["Element 1?"]
+    assert "Element 1?" not in deck.select(tags=["chemistry"], mastered=False)
+    deck.record_review("Element 1?", False)
+    assert deck.select(mastered=True) == []
+
+    deck.untag_card("Element 0?", "basics")
+    assert deck.select(tags=["basics"]) == []
+    deck.delete_card("Element 2?")
+    assert deck.tags.counts() == {"chemistry": 5}
+    deck.delete_deck()
+    assert len(deck.tags) == 0
+
+def test_collection(tmp_path):
+    path = tmp_path / "library.json"
+    path.write_text(json.dumps({"decks": {
+        "chemistry": [{"question": f"Element {i}?", "answer": f"Symbol {i}",
+                       "tags": ["elements"] + (["metals"] if i % 2 else [])} for i in range(8)]
+                     + [{"question": "H2O?", "answer": ["Water", "Dihydrogen monoxide"], "tags": "molecules"}],
+        "capitals": {"France?": "Paris", "Japan?": "Tokyo"}}}))
+    library = Collection(max_size=100, seed=3)
+    assert library.upload(str(path)) == "Collection added! 11 cards in 2 decks."
+    assert len(library) == 2 and library.card_count == 11
+    assert library.tag_counts() == {"elements": 8, "metals": 4, "molecules": 1}
+    assert library.deck("chemistry").deck["H2O?"] == "Water | Dihydrogen monoxide"
+    assert library.select(tags=["metals"]) == [("chemistry", f"Element {i}?") for i in (1, 3, 5, 7)]
+    assert library.select(decks=["capitals"], exclude=["metals"]) != []
+
+    assert library.quiz("mid", tags=["elements"]) == "error: Not enough flashcards for mid level quiz."
+    quiz = library.quiz("beginner", any_tags=["elements", "molecules"])
+    assert len(quiz["questions"]) == 5 and set(quiz["decks"]) == {"chemistry"}
+    question, answer = quiz["questions"][0]
+    assert library.check_answer(0, answer, quiz)
+    assert question in library.deck("chemistry").scheduler
+    assert library.quiz("beginner", tags=["elements"], exclude=["metals"]) == \
+        "error: Not enough flashcards for beginner level quiz."
+
+    assert library.add_flashcard("capitals", "Italy?", "Rome", tags=["europe"]) == "Flashcard Italy? added"
+    assert library.select(tags=["europe"]) == [("capitals", "Italy?")]
+    assert library.remove_deck("capitals") == "Deck 'capitals' deleted!"
+    assert library.tag_counts() == {"elements": 8, "metals": 4, "molecules": 1}
+
+    path.write_text(json.dumps({"decks": {"broken": [{"question": "Q?"}]}}))
+    assert library.upload(str(path)) == \
+        "Invalid collection file: cards in deck 'broken' need a question and an answer"
+    path.write_text(json.dumps({"decks": {"broken": [{"question": ["Q?"], "answer": "A"}]}}))
+    assert library.upload(str(path)) == "Invalid collection file: questions in deck 'broken' must be strings"
+    path.write_text(json.dumps({"decks": {"broken": [{"question": "Q1", "answer": [1, 2]}]}}))
+    assert library.upload(str(path)) == "Invalid collection file: answers in deck 'broken' must be strings"
+    path.write_text(json.dumps({"decks": {"broken": {"Q1": [1, 2]}}}))
+    assert library.upload(str(path)) == "Collection added! 0 cards in 1 decks."
+    assert library.upload(str(tmp_path / "missing.json")).startswith("File not found")